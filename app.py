@@ -1,22 +1,51 @@
 import streamlit as st
-from backend.gemini import query_gemini  # Import the Gemini function
-from backend.langchain import craft_prompt  # Import LangChain function
-import base64
+from backend.gemini import cached_response, request_key, stream_gemini  # Import the Gemini functions
+from backend.cache import get_response_cache
+from backend.langchain import DOCUMENT_TITLES, build_context, craft_prompt, get_template_sections, input_subject, validate_templates  # Import LangChain functions
+from backend.batch import INVESTOR_PACK, generate_batch
+from backend.sections import assemble_sections, generate_sections, reuse_stats
+from backend.jobs import CANCELLED, DONE, FINISHED_STATUSES, get_job_queue
+from backend.export import EXPORT_FORMATS, available_formats, encode_document, export_document
+from backend.store import get_document_store
+from backend.search import HEADING_PATTERN, days_ago
+from backend.metrics import metrics, start_metrics_server
+from backend.state import get_shared_state
+from backend.translate import (
+    CANONICAL_LANGUAGE,
+    cached_translation,
+    prompt_language,
+    stream_translated,
+    translate_document,
+    translated_request_key,
+)
+from functools import partial
+import json
+import re
 import time
+import uuid
 
 
 # App Configuration
 st.set_page_config(page_title="🚀 Startup Automation Tool", layout="wide", page_icon="🌟")
 
+# Read the stylesheet once per process rather than on every rerun
+@st.cache_resource
+def read_css(file_name):
+    with open(file_name) as f:
+        return f'<style>{f.read()}</style>'
+
+
 # Load custom CSS
 def load_css(file_name):
-    with open(file_name) as f:
-        st.markdown(f'<style>{f.read()}</style>', unsafe_allow_html=True)
+    st.markdown(read_css(file_name), unsafe_allow_html=True)
 
 
 # Load the CSS file
 load_css("ui/style.css")
 
+# Serve the request metrics to Prometheus when STARTUPDOC_METRICS_PORT is set (once per process)
+st.cache_resource(start_metrics_server)()
+
 # Functions to handle main app and project info
 def show_main_app():
     st.session_state.show_info = False
@@ -27,14 +56,184 @@ def show_project_info():
     st.rerun()
 
 
-# Function to create a downloadable link
-def create_download_link(content, filename):
-    b64 = base64.b64encode(content.encode()).decode()
-    return f'<a href="data:file/txt;base64,{b64}" download="{filename}">📥 Download Document</a>'
+# Numbered sections requested by the templates ("1. **Executive Summary**: ...")
+PROMPT_SECTION_PATTERN = re.compile(r"^\s*\d+\.\s+\*\*", re.MULTILINE)
+
+# Function to estimate generation progress from the sections received so far
+def estimate_progress(content, prompt):
+    expected = len(PROMPT_SECTION_PATTERN.findall(prompt)) or 1
+    received = len(HEADING_PATTERN.findall(content))
+    # Never report completion before the stream has actually finished
+    return min(received / expected, 0.95)
+
+
+# Number of previous documents rendered per page of the history
+HISTORY_PAGE_SIZE = 5
+# How long a session's document list is kept in the shared state after its last document
+SESSION_TTL_SECONDS = 30 * 24 * 3600
+
+
+# Template keys by document display name, used to label metrics
+TEMPLATE_KEYS = {title: key for key, title in DOCUMENT_TITLES.items()}
+
 
-# Initialize Session State for Generated Responses and `show_info`
-if "generated_docs" not in st.session_state:
-    st.session_state["generated_docs"] = []
+# Function to render generated markdown, timed per document type
+def render_markdown(container, content, doc_type):
+    with metrics.span("render", document_type=TEMPLATE_KEYS.get(doc_type, "-")):
+        container.markdown(content, unsafe_allow_html=True)
+
+
+# Function to store a generated document and add its ID to this session's history
+def remember_document(doc_type, content, business_name=None, prompt_hash=None, sections=None):
+    # Storing covers the post-processing of a document: compression, section split and search indexing
+    with metrics.span("post_process", document_type=TEMPLATE_KEYS.get(doc_type, "-")):
+        doc_id = get_document_store().save(
+            doc_type, content, business_name=business_name, prompt_hash=prompt_hash, sections=sections
+        )
+    add_to_history(doc_id)
+    return {"id": doc_id, "type": doc_type, "content": content}
+
+
+# Function to add a stored document to this session's history
+def add_to_history(doc_id):
+    doc_ids = session_document_ids()
+    if doc_id not in doc_ids:
+        doc_ids.append(doc_id)
+        get_shared_state().set(session_documents_key(), json.dumps(doc_ids), ttl=SESSION_TTL_SECONDS)
+
+
+# Function to name this browser session's document list in the shared state
+def session_documents_key():
+    # The session ID travels in the URL, so a reload served by another worker process finds the same list;
+    # it is a bearer secret (whoever has the link sees the history), which the history section points out
+    session_id = st.query_params.get("session")
+    if not session_id:
+        session_id = st.query_params["session"] = uuid.uuid4().hex
+    return f"session:{session_id}:documents"
+
+
+# Function to return this session's document IDs, restored from the shared state on first use
+def session_document_ids():
+    # Only the app page calls this, so the info page neither adds the session parameter nor opens the state
+    if "generated_doc_ids" not in st.session_state:
+        st.session_state["generated_doc_ids"] = json.loads(get_shared_state().get(session_documents_key()) or "[]")
+    return st.session_state["generated_doc_ids"]
+
+
+# Function to render the download buttons of a document; each file is only produced when its button is clicked
+def render_download_button(doc, file_stem, key_prefix="download"):
+    formats = available_formats()
+    columns = st.columns(len(formats) + 1)
+    columns[0].download_button(
+        "📥 TXT",
+        data=partial(encode_document, doc["id"], doc["content"]),
+        file_name=f"{file_stem}.txt",
+        mime="text/plain",
+        key=f"{key_prefix}_{doc['id']}",
+        on_click="ignore",
+    )
+    # Office and PDF files are rendered in the export process pool and cached by content
+    for column, export_format in zip(columns[1:], formats):
+        column.download_button(
+            f"📥 {EXPORT_FORMATS[export_format]['label']}",
+            data=partial(export_document, doc["content"], export_format, doc["type"]),
+            file_name=f"{file_stem}.{export_format}",
+            mime=EXPORT_FORMATS[export_format]["mime"],
+            key=f"{key_prefix}_{export_format}_{doc['id']}",
+            on_click="ignore",
+        )
+
+
+# How often the page polls a background generation job
+JOB_POLL_INTERVAL_SECONDS = 0.3
+# Longest wait for another run storing the document of the same finished job
+JOB_DOCUMENT_LOCK_SECONDS = 10
+
+
+# Functions to remember (and forget) the generation job this session is following
+def set_active_job(job_id):
+    st.session_state["active_job"] = job_id
+    # Keep the job ID in the URL so a page refresh reattaches to the same job
+    st.query_params["job"] = job_id
+
+def clear_active_job():
+    st.session_state.pop("active_job", None)
+    if "job" in st.query_params:
+        del st.query_params["job"]
+
+
+# Function to store the document of a finished job once, however many runs (tabs, reloads, shared links) see it finish
+def remember_job_document(job, doc_type):
+    shared_state = get_shared_state()
+    doc_key = f"job:{job['id']}:doc"
+    # Runs of other worker processes may see the job finish at the same time
+    token = shared_state.acquire(f"job:{job['id']}:store", JOB_DOCUMENT_LOCK_SECONDS)
+    try:
+        doc_id = shared_state.get(doc_key)
+        if doc_id is None:
+            doc = remember_document(
+                doc_type, job["content"], business_name=job["meta"].get("business_name"), prompt_hash=job["key"]
+            )
+            shared_state.set(doc_key, doc["id"], ttl=SESSION_TTL_SECONDS)
+            return doc
+    finally:
+        if token is not None:
+            shared_state.release(f"job:{job['id']}:store", token)
+    add_to_history(doc_id)
+    return {"id": doc_id, "type": doc_type, "content": job["content"]}
+
+
+# Function to follow a background generation job, rendering its output until it finishes
+def follow_job(job_id):
+    job = get_job_queue().get(job_id)
+    if job is None:
+        clear_active_job()
+        return
+
+    doc_type = job["meta"].get("type", "Document")
+    st.markdown("### 📄 Generated Document")
+    st.markdown(f"### {doc_type}", unsafe_allow_html=True)
+    if job["status"] not in FINISHED_STATUSES and st.button("🛑 Cancel Generation", key=f"cancel_{job_id}"):
+        get_job_queue().cancel(job_id)
+    progress = st.progress(0, text="⚙️ Waiting for the first tokens...")
+    document_placeholder = st.empty()
+
+    # Widget interactions rerun the script; the job keeps running and the next run picks it up again
+    while True:
+        job = get_job_queue().get(job_id)
+        if job["content"]:
+            render_markdown(document_placeholder, job["content"], doc_type)
+        if job["status"] in FINISHED_STATUSES:
+            break
+        progress.progress(
+            estimate_progress(job["content"], job["meta"].get("prompt", "")),
+            text=f"⚙️ Generating your document... {len(job['content'].encode()):,} bytes received",
+        )
+        time.sleep(JOB_POLL_INTERVAL_SECONDS)
+    clear_active_job()
+
+    if job["status"] == DONE:
+        progress.progress(1.0, text="✅ Document generated")
+        st.caption(
+            f"⏱️ Time to first token: {job['first_token'] - job['started']:.2f}s · "
+            f"Total latency: {job['finished'] - job['started']:.2f}s · "
+            f"Queued for: {job['started'] - job['created']:.2f}s"
+        )
+        doc = remember_job_document(job, doc_type)
+        render_download_button(doc, doc_type.replace(' ', '_'))
+    elif job["status"] == CANCELLED:
+        progress.empty()
+        st.warning("🛑 Generation cancelled.")
+    else:
+        progress.empty()
+        st.error(f"❌ Failed to generate the document: {job['error']}")
+
+
+# Initialize Session State for `show_info`
+# Session state only holds document IDs (see `session_document_ids`); the documents themselves live in the document store
+# Latest sectioned version of each document type, which the next sectioned generation builds on
+if "section_sources" not in st.session_state:
+    st.session_state["section_sources"] = {}
 
 # Initialize the show_info attribute if it doesn't exist
 if "show_info" not in st.session_state:
@@ -88,6 +287,9 @@ if st.session_state.show_info:
         show_main_app()
 
 else:
+    # Check every prompt template once per process, before the first generation rather than mid-generation
+    st.cache_resource(validate_templates)()
+
     # App Header
     st.markdown(
     """
@@ -98,24 +300,27 @@ else:
     )
 
     # Define the mapping of document names to keys for templates
-    doc_templates = {
-        "business_plan": "Business Plan 🏢",
-        "funding_proposal": "Funding Proposal 💼",
-        "pitch_deck": "Pitch Deck 🎯",
-        "investor_materials": "Investor Materials 📈",
-        "technical_documentation": "Technical Documentation 📘",
-        "project_proposal": "Project Proposal 🏗️",
-        "investment_memorandum": "Investment Memorandum 💡",
-        "shareholder_update": "Shareholder Update 📊",
-    }
-
-    # Dropdown for Document Type with Emojis
-    st.markdown("### 📑 Select the Document Type")
-    doc_type = st.selectbox(
-        "",
-        list(doc_templates.values()),  # Use the values from doc_templates dictionary
-        index=0,
-    )
+    doc_templates = DOCUMENT_TITLES
+
+    generation_mode = st.radio("⚙️ Generation Mode", ["Single Document", "Document Pack"], horizontal=True, index=0)
+
+    if generation_mode == "Single Document":
+        # Dropdown for Document Type with Emojis
+        st.markdown("### 📑 Select the Document Type")
+        doc_type = st.selectbox(
+            "",
+            list(doc_templates.values()),  # Use the values from doc_templates dictionary
+            index=0,
+        )
+        selected_doc_types = [doc_type]
+    else:
+        # Several documents generated in parallel from one set of inputs
+        st.markdown("### 📦 Select the Documents for Your Pack")
+        selected_doc_types = st.multiselect(
+            "",
+            list(doc_templates.values()),
+            default=[doc_templates[key] for key in INVESTOR_PACK],
+        )
 
 
     # Function to get the corresponding template key based on the selected document type
@@ -192,7 +397,12 @@ else:
         ],
     }
 
-    fields_to_render = fields.get(doc_type, [])
+    # Render each input once, even when several selected documents ask for it
+    fields_to_render = []
+    for selected_doc_type in selected_doc_types:
+        for field in fields.get(selected_doc_type, []):
+            if field["key"] not in [rendered["key"] for rendered in fields_to_render]:
+                fields_to_render.append(field)
 
     # Collect User Inputs
     st.markdown("### 📝 Provide Your Details")
@@ -226,68 +436,258 @@ else:
     # AI Settings
     st.markdown("### 🎨 Customization")
     response_language = st.selectbox("🌐 Response Language", ["English", "Hindi", "Spanish"], index=0)
+    translate_response = response_language != CANONICAL_LANGUAGE and st.checkbox(
+        f"⚡ Translate from {CANONICAL_LANGUAGE}",
+        value=True,
+        help=f"Generates the document once in {CANONICAL_LANGUAGE} (or reuses it if it was generated before) and "
+             "translates it section by section, which costs far less than generating it again in another language.",
+    )
     response_tone = st.radio(
     "🗣️ Response Tone",
     ["Formal", "Neutral", "Casual", "Professional", "Friendly", "Inspirational", "Serious"],
     horizontal=True,
     index=0  # Default to Formal
     )
+    generation_strategy = st.radio(
+        "✂️ Generation Strategy",
+        ["Single-shot", "Sectioned"],
+        horizontal=True,
+        index=0,
+        help="Sectioned mode writes a short outline, then generates every section of the document in parallel.",
+    )
 
 
+    # Generate Document Pack Button
+    if generation_mode == "Document Pack":
+        if st.button("✨ Generate Document Pack"):
+            if not selected_doc_types:
+                st.error("⚠️ Please select at least one document.")
+            elif all(user_inputs.values()):  # Validate all required inputs
+                with st.spinner(f"⚙️ Generating {len(selected_doc_types)} documents in parallel..."):
+                    batch = generate_batch(
+                        user_inputs,
+                        [get_template_key(selected_doc_type) for selected_doc_type in selected_doc_types],
+                        language=response_language,
+                        tone=response_tone.lower(),
+                        translate=translate_response,
+                    )
+
+                st.markdown("### 📦 Generated Document Pack")
+                st.caption(
+                    f"⏱️ Pack generated in {batch['wall_time']:.2f}s "
+                    f"(sum of individual latencies: {sum(result['latency'] for result in batch['results']):.2f}s)"
+                )
+                for result in batch["results"]:
+                    with st.expander(f"📑 {result['title']} · {result['latency']:.2f}s", expanded=True):
+                        if result["content"]:
+                            doc = remember_document(
+                                result["title"], result["content"],
+                                business_name=input_subject(user_inputs), prompt_hash=result["prompt_hash"],
+                            )
+                            render_markdown(st, result["content"], result["title"])
+                            render_download_button(doc, result['title'].replace(' ', '_'))
+                        else:
+                            st.error(f"❌ Failed to generate this document: {result['error']}")
+            else:
+                st.error("⚠️ Please fill in all the required fields.")
+
     # Generate Document Button
-    if st.button("✨ Generate Document"):
+    elif st.button("✨ Generate Document"):
         if all(user_inputs.values()):  # Validate all required inputs
             doc_key = get_template_key(doc_type)
             
             # Build context and prompt
-            context = "\n".join([f"{key.replace('_', ' ').title()}: {value}" for key, value in user_inputs.items()])
+            context = build_context(user_inputs)
+            # When translating, the templates are filled in the canonical language and the translation
+            # pass produces the requested one
             prompt = craft_prompt(
                 query=doc_type,
                 document_type=doc_key,
-                language=response_language,
+                language=prompt_language(response_language, translate_response),
                 tone=response_tone.lower(),
             )
-
-            # Spinner, Countdown, and Progress Bar
-            countdown_time = 20  # Simulated countdown time in seconds
-            with st.spinner("⚙️ Generating your document... Please wait!"):
-                progress = st.progress(0)
-                
-                for i in range(1, 101):
-                    time.sleep(countdown_time / 100)  # Simulate the time taken to generate
-                    progress.progress(i)
-
-                # Query Gemini AI
-                doc_content = query_gemini(context, prompt)
-
-
-            # Save and Display Results
-
-            if doc_content:
-                st.session_state["generated_docs"].append({"type": doc_type, "content": doc_content})
+            if translate_response:
+                prompt_hash = translated_request_key(context, prompt, response_language)
+            else:
+                prompt_hash = request_key(context, prompt)
+
+            cached_content = None
+            if generation_strategy == "Single-shot":
+                if translate_response:
+                    cached_content = cached_translation(context, prompt, response_language)
+                else:
+                    cached_content = cached_response(context, prompt)
+            if generation_strategy == "Single-shot" and cached_content is None:
+                # Stream the document in a background job so reruns and refreshes do not lose it
+                if translate_response:
+                    generate, args = stream_translated, (context, prompt, response_language)
+                else:
+                    generate, args = stream_gemini, (context, prompt)
+                set_active_job(get_job_queue().submit(
+                    generate, *args,
+                    key=prompt_hash,
+                    meta={"type": doc_type, "prompt": prompt, "business_name": input_subject(user_inputs)},
+                ))
+            else:
                 st.markdown("### 📄 Generated Document")
                 st.markdown(f"### {doc_type}", unsafe_allow_html=True)
-                st.markdown(doc_content, unsafe_allow_html=True)
-                download_link = create_download_link(doc_content, f"{doc_type.replace(' ', '_')}.txt")
-                st.markdown(download_link, unsafe_allow_html=True)
-            else:
-                st.error("❌ Failed to generate the document. Please try again.")
+                progress = st.progress(0, text="⚙️ Waiting for the first tokens...")
+                document_placeholder = st.empty()
+
+                doc_content = ""
+                time_to_first_token = None
+                start_time = time.perf_counter()
+                section_results = []
+                if cached_content is not None:
+                    # Identical request answered before: skip the model entirely
+                    doc_content = cached_content
+                    time_to_first_token = time.perf_counter() - start_time
+                    render_markdown(document_placeholder, doc_content, doc_type)
+                else:
+                    # Sections arrive in document order as soon as each one is complete; sections whose
+                    # inputs did not change since the previous version are reused instead of regenerated
+                    sections_total = len(get_template_sections(doc_key)["sections"])
+                    previous_id = st.session_state["section_sources"].get(doc_type)
+                    previous_sections = get_document_store().get_sections(previous_id) if previous_id else None
+                    for result in generate_sections(
+                        user_inputs, doc_type, doc_key, prompt_language(response_language, translate_response),
+                        response_tone.lower(), previous=previous_sections,
+                    ):
+                        section_results.append(result)
+                        if result["error"]:
+                            st.error(f"❌ {result['title']} failed: {result['error']}")
+                        if result["number"] and result["content"] and time_to_first_token is None:
+                            time_to_first_token = time.perf_counter() - start_time
+                        doc_content = assemble_sections(section_results)
+                        render_markdown(document_placeholder, doc_content, doc_type)
+                        progress.progress(
+                            min((len(section_results) - 1) / sections_total, 0.95),
+                            text=f"⚙️ {len(section_results) - 1} of {sections_total} sections generated",
+                        )
+                    if translate_response and doc_content:
+                        # The sections stay in the canonical language, so the next version reuses them
+                        # whatever language it is read in
+                        progress.progress(0.95, text=f"🌐 Translating into {response_language}...")
+                        translation_start = time.perf_counter()
+                        try:
+                            doc_content = translate_document(doc_content, response_language)
+                        except Exception as e:
+                            st.error(f"❌ Translation into {response_language} failed: {e}")
+                            doc_content = ""
+                        render_markdown(document_placeholder, doc_content, doc_type)
+                        st.caption(
+                            f"🌐 Translated from {CANONICAL_LANGUAGE} in {time.perf_counter() - translation_start:.2f}s"
+                        )
+                total_latency = time.perf_counter() - start_time
+
+                # Save and Display Results
+
+                if doc_content:
+                    if cached_content is not None:
+                        progress.progress(1.0, text="⚡ Served from cache")
+                        cache_stats = get_response_cache().stats()
+                        st.caption(
+                            f"⚡ Cached response returned in {total_latency * 1000:.1f} ms · "
+                            f"Cache hits: {cache_stats['hits']} · Misses: {cache_stats['misses']}"
+                        )
+                    else:
+                        progress.progress(1.0, text="✅ Document generated")
+                        st.caption(
+                            f"⏱️ Time to first token: {time_to_first_token:.2f}s · Total latency: {total_latency:.2f}s"
+                        )
+                    if section_results:
+                        reuse = reuse_stats(section_results)
+                        if reuse["sections_reused"]:
+                            st.caption(
+                                f"♻️ Reused {reuse['sections_reused']} sections ({reuse['tokens_reused']:,} tokens) "
+                                f"from the previous version · Regenerated {reuse['sections_generated']} "
+                                f"({reuse['tokens_generated']:,} tokens)"
+                            )
+                        # Per-section latency and token usage of the sectioned generation
+                        st.table([
+                            {
+                                "Section": result["title"],
+                                "Latency (s)": round(result["latency"], 2),
+                                "Input Tokens": result["prompt_tokens"],
+                                "Output Tokens": result["output_tokens"],
+                                "Cached": result["cached"],
+                                "Reused": result["reused"],
+                            }
+                            for result in section_results
+                        ])
+                    doc = remember_document(
+                        doc_type, doc_content,
+                        business_name=input_subject(user_inputs), prompt_hash=prompt_hash,
+                        sections=section_results or None,
+                    )
+                    if section_results:
+                        st.session_state["section_sources"][doc_type] = doc["id"]
+                    render_download_button(doc, doc_type.replace(' ', '_'))
+                else:
+                    progress.empty()
+                    st.error("❌ Failed to generate the document. Please try again.")
         else:
             st.error("⚠️ Please fill in all the required fields.")
 
+    # Reattach to the background generation job this session (or URL) is following
+    active_job_id = st.session_state.get("active_job") or st.query_params.get("job")
+    if active_job_id:
+        follow_job(active_job_id)
+
 
 
+    # Search Previously Generated Documents (every stored document, section by section)
+    st.markdown("### 🔎 Search Documents")
+    search_query = st.text_input("Search", placeholder="e.g. FinTech pitch deck market analysis", label_visibility="collapsed")
+    search_columns = st.columns(3)
+    search_mode = search_columns[0].radio("Match", ["Keywords", "Similar Text"], horizontal=True)
+    search_type = search_columns[1].selectbox("Document Type", ["All"] + list(doc_templates.values()))
+    search_period = search_columns[2].selectbox("Generated", ["Any time", "Last 7 days", "Last 30 days", "Last 365 days"])
+    if search_query:
+        search_filters = {
+            "doc_type": None if search_type == "All" else search_type,
+            "since": None if search_period == "Any time" else days_ago(int(search_period.split()[1])),
+        }
+        sections = get_document_store().sections
+        search = sections.search if search_mode == "Keywords" else sections.similar
+        search_results = search(search_query, limit=10, **search_filters)
+        if not search_results:
+            st.info("No matching sections found.")
+        for result in search_results:
+            business = f" · {result['business_name']}" if result["business_name"] else ""
+            created = time.strftime("%Y-%m-%d", time.localtime(result["created"]))
+            with st.expander(f"📄 {result['title']} — {result['type']}{business} · {created}"):
+                st.markdown(result["content"], unsafe_allow_html=True)
+
     # Display Previously Generated Documents
 
-    if st.session_state["generated_docs"]:
+    if session_document_ids():
         st.markdown("<h3 style='color:#b3ac29;'>📂 Previous Documents</h3>", unsafe_allow_html=True)
-        for i, doc in enumerate(st.session_state["generated_docs"]):
+        st.caption(
+            "🔗 The `session` parameter in this page's link restores this history, so anyone you share "
+            "the link with can read these documents."
+        )
+        if st.button("🔒 Start a new session", help="Forget this history and give the page a new link"):
+            # Revokes the old link as well: its document list is deleted from the shared state
+            get_shared_state().delete(session_documents_key())
+            st.query_params["session"] = uuid.uuid4().hex
+            st.session_state["generated_doc_ids"] = []
+            st.rerun()
+        generated_doc_ids = session_document_ids()
+
+        # Only the current page of the history is rendered, newest documents first
+        pages = (len(generated_doc_ids) + HISTORY_PAGE_SIZE - 1) // HISTORY_PAGE_SIZE
+        page = st.number_input("Page", min_value=1, max_value=pages, value=1, key="history_page") if pages > 1 else 1
+        newest = len(generated_doc_ids) - (page - 1) * HISTORY_PAGE_SIZE
+        for i in range(newest - 1, max(newest - HISTORY_PAGE_SIZE, 0) - 1, -1):
+            doc = get_document_store().get(generated_doc_ids[i])
+            if doc is None:
+                continue
             with st.expander(f"📑 {doc['type']} - Document {i + 1}"):
                 st.markdown(doc["content"], unsafe_allow_html=True)
 
-                # Generate and display the download link for each previously generated document
-                previous_download_link = create_download_link(doc["content"], f"{doc['type'].replace(' ', '_')}_Document_{i + 1}.txt")
-                st.markdown(previous_download_link, unsafe_allow_html=True)
+                # Display the download button for each previously generated document
+                render_download_button(doc, f"{doc['type'].replace(' ', '_')}_Document_{i + 1}", key_prefix="history_download")
 
 # Footer Section
 st.markdown("---")
@@ -0,0 +1,164 @@
+"""
+Async HTTP API for document generation, without Streamlit.
+
+Endpoints:
+    GET  /health             Liveness check.
+    GET  /stats              Model client metrics, token usage and model routing statistics.
+    GET  /metrics            Request metrics in the Prometheus text format.
+    POST /documents          Generate one document; JSON job (see `parse_job`) with one document type.
+    POST /documents/stream   Same, streaming the document text as it is generated.
+    POST /batch              Generate several document types for the same inputs concurrently.
+    POST /export             Render a markdown document to DOCX, PDF or PPTX; JSON {"content", "format", "title"}.
+
+Model calls are blocking, so they run in the worker thread pool; throttling, retries, request
+coalescing and caching are shared with every other request of the process.
+
+Run from the repository root (or `uvicorn backend.api:app --workers 4`):
+    python -m backend.api --port 8000 --workers 4
+"""
+import argparse
+import os
+from contextlib import asynccontextmanager
+
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
+from starlette.routing import Route
+
+from backend.batch import generate_batch, job_request, parse_job, stream_job
+from backend.export import EXPORT_FORMATS, export_document
+from backend.gemini import backend_stats, generate_gemini_response, token_usage
+from backend.langchain import DOCUMENT_TITLES, validate_templates
+from backend.metrics import metrics
+from backend.router import model_router
+from backend.translate import translate_document
+
+API_HOST = os.environ.get("STARTUPDOC_API_HOST", "127.0.0.1")
+API_PORT = int(os.environ.get("STARTUPDOC_API_PORT", 8000))
+API_WORKERS = int(os.environ.get("STARTUPDOC_API_WORKERS", 1))
+
+
+def _error(status_code, message):
+    return JSONResponse({"error": message}, status_code=status_code)
+
+
+# Function to read and validate the job in a request body
+async def _read_job(request, single=True):
+    try:
+        job = parse_job(await request.json())
+    except ValueError as e:  # Malformed JSON raises a ValueError subclass too
+        return None, _error(400, str(e))
+    if single and len(job["document_types"]) != 1:
+        return None, _error(400, "Exactly one document type per request; use /batch for several")
+    return job, None
+
+
+async def health(request):
+    return JSONResponse({"status": "ok"})
+
+
+async def stats(request):
+    return JSONResponse({"backend": backend_stats(), "token_usage": token_usage(), "routing": model_router.stats()})
+
+
+async def prometheus_metrics(request):
+    return PlainTextResponse(metrics.prometheus(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+async def generate_document(request):
+    job, error = await _read_job(request)
+    if error:
+        return error
+    document_type = job["document_types"][0]
+    context, prompt = job_request(job, document_type)
+    try:
+        response = await run_in_threadpool(generate_gemini_response, context, prompt)
+        if job["translate"]:
+            # Token counts stay those of the canonical document; the translation is reported under its own type
+            response["content"] = await run_in_threadpool(translate_document, response["content"], job["language"])
+    except Exception as e:
+        return _error(502, f"Generation failed: {e}")
+    return JSONResponse({"document_type": document_type, "title": DOCUMENT_TITLES[document_type], **response})
+
+
+async def stream_document(request):
+    job, error = await _read_job(request)
+    if error:
+        return error
+    chunks = stream_job(job, job["document_types"][0])
+    # Wait for the first chunk before answering, so a failed request still gets an error status
+    try:
+        first = await run_in_threadpool(next, chunks, "")
+    except Exception as e:
+        return _error(502, f"Generation failed: {e}")
+
+    def body():
+        yield first
+        yield from chunks
+
+    # Starlette iterates synchronous bodies in the thread pool
+    return StreamingResponse(body(), media_type="text/markdown; charset=utf-8")
+
+
+async def generate_documents(request):
+    job, error = await _read_job(request, single=False)
+    if error:
+        return error
+    batch = await run_in_threadpool(
+        generate_batch, job["inputs"], job["document_types"], job["language"], job["tone"], translate=job["translate"]
+    )
+    return JSONResponse(batch)
+
+
+async def export(request):
+    try:
+        body = await request.json()
+    except ValueError as e:
+        return _error(400, str(e))
+    if not isinstance(body, dict) or not isinstance(body.get("content"), str):
+        return _error(400, "A JSON object with the markdown 'content' is required")
+    export_format = body.get("format")
+    if export_format not in EXPORT_FORMATS:
+        return _error(400, f"'format' must be one of {list(EXPORT_FORMATS)}")
+    if not isinstance(body.get("title"), (str, type(None))):
+        return _error(400, "'title' must be a string")
+    try:
+        # Rendering happens in the export process pool; the thread only waits for it
+        data = await run_in_threadpool(export_document, body["content"], export_format, body.get("title"))
+    except ImportError as e:
+        return _error(501, f"Export to {export_format} is not available: {e}")
+    return Response(data, media_type=EXPORT_FORMATS[export_format]["mime"])
+
+
+@asynccontextmanager
+async def lifespan(app):
+    # Every worker checks the templates before serving, instead of failing its first requests
+    validate_templates()
+    yield
+
+
+app = Starlette(lifespan=lifespan, routes=[
+    Route("/health", health),
+    Route("/stats", stats),
+    Route("/metrics", prometheus_metrics),
+    Route("/documents", generate_document, methods=["POST"]),
+    Route("/documents/stream", stream_document, methods=["POST"]),
+    Route("/batch", generate_documents, methods=["POST"]),
+    Route("/export", export, methods=["POST"]),
+])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--host", default=API_HOST)
+    parser.add_argument("--port", type=int, default=API_PORT)
+    parser.add_argument("--workers", type=int, default=API_WORKERS, help="uvicorn worker processes")
+    args = parser.parse_args(argv)
+
+    import uvicorn
+
+    uvicorn.run("backend.api:app", host=args.host, port=args.port, workers=args.workers)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from backend.gemini import generate_gemini, request_key, stream_gemini
+from backend.langchain import DOCUMENT_TITLES, build_context, craft_prompt
+from backend.translate import prompt_language, stream_translated, translate_document, translated_request_key
+
+
+# Upper bound on concurrent Gemini requests issued by a single batch
+MAX_BATCH_WORKERS = 4
+
+# Documents investors usually ask for together
+INVESTOR_PACK = ["business_plan", "pitch_deck", "funding_proposal", "investor_materials"]
+
+# Settings used when a job does not specify them (the app's defaults)
+DEFAULT_LANGUAGE = "English"
+DEFAULT_TONE = "formal"
+
+
+# Function to validate a generation job submitted outside the app (CLI input file or API request)
+def parse_job(spec):
+    """
+    Validate a generation job and fill in its defaults.
+
+    Args:
+        spec (dict): "inputs" (form inputs, see `fields` in app.py), "document_type" (a template key)
+            or "document_types" (a list of them), and optionally "language", "tone" and "translate"
+            (generate in CANONICAL_LANGUAGE and translate into "language", see backend/translate.py).
+
+    Returns:
+        dict: inputs, document_types, language, tone and translate.
+
+    Raises:
+        ValueError: If the job is malformed (e.g. a setting of the wrong type) or names unknown document types.
+    """
+    if not isinstance(spec, dict):
+        raise ValueError(f"A job must be a mapping, got {type(spec).__name__}")
+    inputs = spec.get("inputs")
+    if not isinstance(inputs, dict) or not inputs:
+        raise ValueError("A job needs a non-empty 'inputs' mapping")
+    document_types = spec.get("document_types") or [spec.get("document_type")]
+    if isinstance(document_types, str):
+        document_types = [document_types]
+    if not isinstance(document_types, list) or not all(isinstance(name, str) for name in document_types):
+        raise ValueError(f"Document types must be strings, got {document_types!r}")
+    unknown = [document_type for document_type in document_types if document_type not in DOCUMENT_TITLES]
+    if unknown:
+        raise ValueError(f"Unknown document types: {unknown} (expected some of {list(DOCUMENT_TITLES)})")
+    for name, default in (("language", DEFAULT_LANGUAGE), ("tone", DEFAULT_TONE)):
+        if not isinstance(spec.get(name, default), str):
+            raise ValueError(f"'{name}' must be a string, got {spec[name]!r}")
+    translate = spec.get("translate", False)
+    if not isinstance(translate, bool):  # The string "false" must not turn translation on
+        raise ValueError(f"'translate' must be true or false, got {translate!r}")
+    return {
+        "inputs": {key: value if isinstance(value, str) else str(value) for key, value in inputs.items()},
+        "document_types": document_types,
+        "language": spec.get("language", DEFAULT_LANGUAGE),
+        "tone": spec.get("tone", DEFAULT_TONE).lower(),
+        "translate": translate,
+    }
+
+
+# Function to build the context and prompt of one document of a job
+def job_request(job, document_type):
+    """
+    Build the model request for one document of a parsed job, exactly as the app does.
+
+    Args:
+        job (dict): Job returned by `parse_job`.
+        document_type (str): One of the job's document types.
+
+    Returns:
+        tuple: (context, prompt) for `generate_gemini_response` or `stream_gemini`; translated jobs
+        get a prompt in CANONICAL_LANGUAGE (see `stream_job`).
+    """
+    prompt = craft_prompt(
+        query=DOCUMENT_TITLES[document_type],
+        document_type=document_type,
+        language=prompt_language(job["language"], job["translate"]),
+        tone=job["tone"],
+    )
+    return build_context(job["inputs"]), prompt
+
+
+# Function to stream one document of a job, translating it when the job asks for it
+def stream_job(job, document_type):
+    """
+    Stream the text of one document of a parsed job.
+
+    Args:
+        job (dict): Job returned by `parse_job`.
+        document_type (str): One of the job's document types.
+
+    Returns:
+        iterator: Text chunks of the document in the job's language.
+    """
+    context, prompt = job_request(job, document_type)
+    if job["translate"]:
+        return stream_translated(context, prompt, job["language"])
+    return stream_gemini(context, prompt)
+
+
+def _generate_one(document_type, context, language, tone, translate=False):
+    prompt = craft_prompt(
+        query=DOCUMENT_TITLES[document_type],
+        document_type=document_type,
+        language=prompt_language(language, translate),
+        tone=tone,
+    )
+    start_time = time.perf_counter()
+    try:
+        content, error = generate_gemini(context, prompt), None
+        if translate:
+            content = translate_document(content, language)
+    except Exception as e:  # Report the failure for this document without failing the whole batch
+        content, error = None, str(e)
+    return {
+        "document_type": document_type,
+        "title": DOCUMENT_TITLES[document_type],
+        "content": content,
+        "prompt_hash": translated_request_key(context, prompt, language) if translate else request_key(context, prompt),
+        "error": error,
+        "latency": time.perf_counter() - start_time,
+    }
+
+
+def generate_batch(user_inputs, document_types, language, tone, max_workers=MAX_BATCH_WORKERS, translate=False):
+    """
+    Generate several documents for the same user inputs concurrently.
+
+    Args:
+        user_inputs (dict): Form inputs shared by every document.
+        document_types (list): Template keys (see DOCUMENT_TITLES) to generate.
+        language (str): Language for the responses.
+        tone (str): The tone of the responses.
+        max_workers (int, optional): Maximum number of requests in flight at once.
+        translate (bool, optional): Generate the documents in CANONICAL_LANGUAGE and translate them
+            into `language`, which reuses documents already generated in any language.
+
+    Returns:
+        dict: "results" (one dict per document, in request order, with content, prompt_hash, error and latency)
+        and "wall_time" (seconds for the whole batch).
+    """
+    unknown = [document_type for document_type in document_types if document_type not in DOCUMENT_TITLES]
+    if unknown:
+        raise ValueError(f"Unknown document types: {unknown}")
+
+    context = build_context(user_inputs)
+    start_time = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(document_types)))) as executor:
+        futures = [
+            executor.submit(_generate_one, document_type, context, language, tone, translate)
+            for document_type in document_types
+        ]
+        results = [future.result() for future in futures]
+    return {"results": results, "wall_time": time.perf_counter() - start_time}
@@ -0,0 +1,403 @@
+import functools
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from backend.models import ContextCachingBackend
+from backend.ratelimit import SingleFlight, estimate_tokens
+from backend.state import get_shared_state
+
+logger = logging.getLogger(__name__)
+
+# Cache configuration (an empty STARTUPDOC_CACHE_PATH disables the on-disk tier)
+CACHE_PATH = os.environ.get("STARTUPDOC_CACHE_PATH", ".cache/responses.sqlite3")
+CACHE_TTL_SECONDS = int(os.environ.get("STARTUPDOC_CACHE_TTL", 7 * 24 * 3600))
+CACHE_MAX_ENTRIES = int(os.environ.get("STARTUPDOC_CACHE_MAX_ENTRIES", 256))
+CACHE_MAX_DISK_BYTES = int(os.environ.get("STARTUPDOC_CACHE_MAX_DISK_BYTES", 256 * 1024 * 1024))
+
+# Explicit context caching of shared prompt prefixes (STARTUPDOC_CONTEXT_CACHE=0 disables it)
+CONTEXT_CACHE_ENABLED = os.environ.get("STARTUPDOC_CONTEXT_CACHE", "1") != "0"
+CONTEXT_CACHE_TTL_SECONDS = int(os.environ.get("STARTUPDOC_CONTEXT_CACHE_TTL", 600))
+CONTEXT_CACHE_MAX_ENTRIES = int(os.environ.get("STARTUPDOC_CONTEXT_CACHE_MAX_ENTRIES", 32))
+# A prefix is uploaded once it has been sent this many times
+CONTEXT_CACHE_MIN_USES = int(os.environ.get("STARTUPDOC_CONTEXT_CACHE_MIN_USES", 2))
+# Number of not (yet) cached prefixes whose uses are counted
+CONTEXT_CACHE_TRACKED_PREFIXES = 1024
+
+
+def make_cache_key(prompt, model_name, generation_config=None):
+    """
+    Build a content-addressed cache key for a model request.
+
+    Args:
+        prompt (str): The fully crafted prompt (context included) sent to the model.
+        model_name (str): Name of the model answering the prompt.
+        generation_config (dict, optional): Generation settings that influence the output.
+
+    Returns:
+        str: SHA-256 hex digest identifying the request.
+    """
+    payload = json.dumps([prompt, model_name, generation_config or {}], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class ResponseCache:
+    """
+    Two-tier cache for generated responses: an in-memory LRU per process in front of an
+    optional SQLite database shared by every session and worker process on the host, or of a
+    shared state spanning several hosts (see backend.state) when one is given.
+    """
+
+    def __init__(self, path=CACHE_PATH, ttl=CACHE_TTL_SECONDS, max_entries=CACHE_MAX_ENTRIES,
+                 max_disk_bytes=CACHE_MAX_DISK_BYTES, state=None):
+        self.state = state
+        self.path = None if state is not None else path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_disk_bytes = max_disk_bytes
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._connections = threading.local()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        if self.path:
+            self._init_db()
+
+    @contextmanager
+    def _connect(self):
+        # One connection per thread, reused: the tier is read and written by every model request
+        conn = getattr(self._connections, "conn", None)
+        if conn is None:
+            conn = self._connections.conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA synchronous=NORMAL")
+        with conn:
+            yield conn
+
+    def _init_db(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    created REAL NOT NULL,
+                    accessed REAL NOT NULL
+                )
+                """
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)")
+            conn.execute("CREATE INDEX IF NOT EXISTS responses_created ON responses (created)")
+
+    @property
+    def shared(self):
+        # Whether responses cached by one worker process are visible to the others
+        return bool(self.path or self.state)
+
+    def _remember(self, key, value, created):
+        # Caller must hold the lock
+        self._memory[key] = (value, created)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def get(self, key):
+        """
+        Look up a cached response.
+
+        Args:
+            key (str): Cache key from `make_cache_key`.
+
+        Returns:
+            str: The cached response, or None on a miss or an expired entry.
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                value, created = entry
+                if now - created <= self.ttl:
+                    self._memory.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._memory[key]
+
+        if self.state is not None:
+            value = self.state.get(f"response:{key}")
+            if value is not None:
+                with self._lock:
+                    # The shared tier enforces the TTL; the local copy lives at most as long
+                    self._remember(key, value, now)
+                    self.hits += 1
+                    self.disk_hits += 1
+                return value
+        elif self.path:
+            with self._connect() as conn:
+                row = conn.execute(
+                    "SELECT value, created FROM responses WHERE key = ? AND created >= ?",
+                    (key, now - self.ttl),
+                ).fetchone()
+                if row is not None:
+                    conn.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+            if row is not None:
+                value, created = row
+                with self._lock:
+                    self._remember(key, value, created)
+                    self.hits += 1
+                    self.disk_hits += 1
+                return value
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def set(self, key, value):
+        """
+        Store a response in both tiers, evicting expired and least recently used entries.
+
+        Args:
+            key (str): Cache key from `make_cache_key`.
+            value (str): Response text to cache.
+        """
+        now = time.time()
+        with self._lock:
+            self._remember(key, value, now)
+
+        if self.state is not None:
+            self.state.set(f"response:{key}", value, ttl=self.ttl)
+        elif self.path:
+            with self._connect() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO responses (key, value, size, created, accessed) VALUES (?, ?, ?, ?, ?)",
+                    (key, value, len(value.encode()), now, now),
+                )
+                conn.execute("DELETE FROM responses WHERE created < ?", (now - self.ttl,))
+                # Pages in use measure the tier without scanning it (summing every entry's size would
+                # make each write slower as the cache grows)
+                page_size, pages, free_pages = (
+                    conn.execute(f"PRAGMA {name}").fetchone()[0] for name in ("page_size", "page_count", "freelist_count")
+                )
+                excess = (pages - free_pages) * page_size - self.max_disk_bytes
+                if excess > 0:
+                    # Drop the least recently accessed entries until the tier fits its budget again
+                    evicted = []
+                    for old_key, size in conn.execute("SELECT key, size FROM responses ORDER BY accessed"):
+                        if excess <= 0:
+                            break
+                        evicted.append((old_key,))
+                        excess -= size
+                    conn.executemany("DELETE FROM responses WHERE key = ?", evicted)
+
+    def stats(self):
+        """
+        Report cache counters.
+
+        Returns:
+            dict: Hit, miss and size counters for the cache.
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "memory_entries": len(self._memory),
+            }
+
+
+class ContextCache:
+    """
+    Explicit context caching: prompt prefixes shared by several requests (the company context,
+    alone or followed by the fixed instructions of a template) are uploaded to the model backend
+    once and referenced by handle afterwards, so their input tokens are not processed again.
+
+    A prefix is uploaded once it has been sent CONTEXT_CACHE_MIN_USES times. Cached prefixes live
+    for `ttl` seconds, extended while they keep being used; the least recently used ones are deleted
+    beyond `max_entries`.
+    """
+
+    def __init__(self, ttl=CONTEXT_CACHE_TTL_SECONDS, max_entries=CONTEXT_CACHE_MAX_ENTRIES,
+                 min_uses=CONTEXT_CACHE_MIN_USES, enabled=CONTEXT_CACHE_ENABLED):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.min_uses = min_uses
+        self.enabled = enabled
+        # key -> {"backend", "handle", "tokens", "expires"}, least recently used first
+        self._entries = OrderedDict()
+        self._uses = OrderedDict()
+        # Backends whose last upload failed, and until when they are not asked again
+        self._disabled_until = {}
+        self._lock = threading.Lock()
+        self._uploads = SingleFlight()
+        self.hits = 0
+        self.misses = 0
+        self.created = 0
+        self.evicted = 0
+        self.cached_tokens = 0
+
+    def resolve(self, backend, prefixes):
+        """
+        Pick the cached prefix a request should reference, uploading a prefix once it is reused.
+
+        Args:
+            backend (ModelBackend): The backend serving the request.
+            prefixes (list): Candidate prefixes of the request's prompt, longest first.
+
+        Returns:
+            tuple: (handle, prefix) of the cached prefix to reference, or (None, None).
+        """
+        now = time.time()
+        if not self.enabled or not isinstance(backend, ContextCachingBackend) or self._disabled_until.get(backend.name, 0) > now:
+            return None, None
+        candidates = [
+            (make_cache_key(prefix, backend.name), prefix)
+            for prefix in prefixes if estimate_tokens(prefix) >= backend.min_cache_tokens
+        ]
+        if not candidates:
+            return None, None
+
+        upload = None
+        with self._lock:
+            for key, prefix in candidates:
+                entry = self._entries.get(key)
+                if entry is not None and entry["expires"] <= now:
+                    del self._entries[key]
+                    entry = None
+                if entry is not None:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    self.cached_tokens += entry["tokens"]
+                    break
+            else:
+                self.misses += 1
+                for key, prefix in candidates:
+                    self._uses[key] = self._uses.get(key, 0) + 1
+                    self._uses.move_to_end(key)
+                    if upload is None and self._uses[key] >= self.min_uses:
+                        upload = key, prefix
+                while len(self._uses) > CONTEXT_CACHE_TRACKED_PREFIXES:
+                    self._uses.popitem(last=False)
+
+        if entry is not None:
+            if entry["expires"] - now < self.ttl / 2:
+                self._extend(entry, now)
+            return entry["handle"], prefix
+        if upload is not None:
+            key, prefix = upload
+            handle = self._uploads.do(key, self._upload, backend, key, prefix)
+            if handle is not None:
+                with self._lock:
+                    self.cached_tokens += estimate_tokens(prefix)
+                return handle, prefix
+        return None, None
+
+    def _upload(self, backend, key, prefix):
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is not None:  # Uploaded by a call that finished just before this one started
+            return entry["handle"]
+        try:
+            handle = backend.create_cache(prefix, self.ttl)
+        except Exception:
+            # E.g. a model without caching support; send prompts in full for a while
+            logger.warning("Context cache upload failed for %s", backend.name, exc_info=True)
+            self._disabled_until[backend.name] = time.time() + self.ttl
+            return None
+
+        evicted = []
+        with self._lock:
+            self._uses.pop(key, None)
+            self._entries[key] = {
+                "backend": backend, "handle": handle, "tokens": estimate_tokens(prefix), "expires": time.time() + self.ttl,
+            }
+            self.created += 1
+            while len(self._entries) > self.max_entries:
+                evicted.append(self._entries.popitem(last=False)[1])
+                self.evicted += 1
+        for entry in evicted:
+            self._delete(entry)
+        return handle
+
+    def _extend(self, entry, now):
+        try:
+            entry["backend"].update_cache(entry["handle"], self.ttl)
+            entry["expires"] = now + self.ttl
+        except Exception:
+            logger.warning("Context cache lifetime extension failed", exc_info=True)
+
+    def _delete(self, entry):
+        try:
+            entry["backend"].delete_cache(entry["handle"])
+        except Exception:  # The prefix expires on its own anyway
+            logger.warning("Context cache deletion failed", exc_info=True)
+
+    def invalidate(self, handle):
+        """
+        Forget a cached prefix the backend no longer knows (e.g. it expired early).
+
+        Args:
+            handle: Handle returned by `resolve`.
+        """
+        with self._lock:
+            for key, entry in list(self._entries.items()):
+                if entry["handle"] is handle or entry["handle"] == handle:
+                    del self._entries[key]
+
+    def clear(self):
+        """
+        Delete every cached prefix from the backends, e.g. at shutdown to stop paying for storage.
+        """
+        with self._lock:
+            entries = list(self._entries.values())
+            self._entries.clear()
+        for entry in entries:
+            self._delete(entry)
+
+    def stats(self):
+        """
+        Report context cache counters.
+
+        Returns:
+            dict: Requests referencing a cached prefix (hits) or not (misses), prefixes uploaded and
+            evicted, live entries and input tokens served from cached prefixes.
+        """
+        with self._lock:
+            return {
+                "context_cache_hits": self.hits,
+                "context_cache_misses": self.misses,
+                "context_caches_created": self.created,
+                "context_caches_evicted": self.evicted,
+                "context_cache_entries": len(self._entries),
+                "context_cached_tokens": self.cached_tokens,
+            }
+
+
+# Function to open the process-wide response cache the first time a response is looked up
+@functools.cache
+def get_response_cache():
+    """
+    Return the response cache shared by every session of the process (and every worker process).
+
+    Responses go to the shared state when it spans hosts, otherwise to the SQLite tier at CACHE_PATH.
+
+    Returns:
+        ResponseCache: The process-wide response cache.
+    """
+    shared_state = get_shared_state()
+    return ResponseCache(state=shared_state if shared_state.distributed else None)
+
+
+# Process-wide context cache shared by every Streamlit session (in memory only)
+context_cache = ContextCache()
@@ -0,0 +1,201 @@
+"""
+Headless document generation from JSON or YAML job files, without Streamlit.
+
+Each input file holds one job or a list of jobs (see `parse_job`), e.g.:
+
+    {"inputs": {"business_name": "Acme", "startup_domain": "FinTech", ...},
+     "document_types": ["business_plan", "pitch_deck"], "language": "English", "tone": "formal"}
+
+With `"translate": true`, documents are generated once in English and translated into the job's
+language section by section, so jobs asking for the same documents in several languages pay for
+one generation each.
+
+Documents are generated concurrently and streamed into the output directory: each one is written
+to `<name>.md.part` while it is generated and renamed to `<name>.md` once complete. One JSON line per
+finished document is printed to stdout, so the command can feed other pipeline steps. With
+`--formats`, each finished document is also exported next to it (e.g. `<name>.docx`).
+
+Run from the repository root:
+    python -m backend.cli jobs/*.json --output-dir out
+    python -m backend.cli jobs/ --output-dir out --workers 16
+    python -m backend.cli jobs/ --output-dir out --formats docx,pdf,pptx
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from backend.batch import parse_job, stream_job
+from backend.export import EXPORT_FORMATS, export_document
+from backend.langchain import DOCUMENT_TITLES, validate_templates
+
+# Default number of documents generated at once
+CLI_WORKERS = int(os.environ.get("STARTUPDOC_CLI_WORKERS", 8))
+JOB_FILE_EXTENSIONS = (".json", ".yaml", ".yml")
+
+
+# Function to read the jobs of one input file
+def load_jobs(path):
+    """
+    Read the jobs of a JSON or YAML file.
+
+    Args:
+        path (str): Path of the file.
+
+    Returns:
+        list: The parsed jobs (see `parse_job`).
+
+    Raises:
+        ValueError: If the file holds malformed jobs, or is YAML and PyYAML is not installed.
+    """
+    with open(path, encoding="utf-8") as f:
+        if path.endswith((".yaml", ".yml")):
+            try:
+                import yaml
+            except ImportError:
+                raise ValueError(f"{path}: reading YAML needs PyYAML (pip install pyyaml)") from None
+            data = yaml.safe_load(f)
+        else:
+            data = json.load(f)
+    specs = data if isinstance(data, list) else [data]
+    try:
+        return [parse_job(spec) for spec in specs]
+    except ValueError as e:
+        raise ValueError(f"{path}: {e}") from None
+
+
+# Function to list the job files given on the command line, expanding directories
+def iter_job_files(paths):
+    for path in paths:
+        if os.path.isdir(path):
+            for name in sorted(os.listdir(path)):
+                if name.endswith(JOB_FILE_EXTENSIONS):
+                    yield os.path.join(path, name)
+        else:
+            yield path
+
+
+# Function to list every document to generate, reading input files only as they are needed
+def iter_tasks(paths):
+    for path in iter_job_files(paths):
+        stem = os.path.splitext(os.path.basename(path))[0]
+        try:
+            jobs = load_jobs(path)
+        except (OSError, ValueError) as e:
+            yield {"source": path, "error": str(e)}
+            continue
+        for index, job in enumerate(jobs):
+            for document_type in job["document_types"]:
+                name = f"{stem}-{index}-{document_type}" if len(jobs) > 1 else f"{stem}-{document_type}"
+                yield {"source": path, "name": re.sub(r"[^\w.-]", "_", name), "job": job, "document_type": document_type}
+
+
+# Function to stream one document into the output directory
+def generate_to_file(task, output_dir, formats=()):
+    """
+    Generate one document, writing its text to disk as it streams in.
+
+    Args:
+        task (dict): Task from `iter_tasks` (source, name, job and document_type).
+        output_dir (str): Directory the document is written to.
+        formats (tuple, optional): Export formats (see EXPORT_FORMATS) written next to the document.
+
+    Returns:
+        dict: source, document_type, output (path, None on failure), exports (paths), characters,
+        latency and error.
+    """
+    path = os.path.join(output_dir, task["name"] + ".md")
+    start_time = time.perf_counter()
+    characters, error, exports = 0, None, []
+    try:
+        content = []
+        with open(path + ".part", "w", encoding="utf-8") as f:
+            for text in stream_job(task["job"], task["document_type"]):
+                f.write(text)
+                f.flush()
+                characters += len(text)
+                content.append(text)
+        os.replace(path + ".part", path)
+        for export_format in formats:
+            export_path = os.path.join(output_dir, f"{task['name']}.{export_format}")
+            with open(export_path, "wb") as f:
+                f.write(export_document("".join(content), export_format, DOCUMENT_TITLES[task["document_type"]]))
+            exports.append(export_path)
+    except Exception as e:  # Report the failure for this document without stopping the others
+        error = str(e)
+        if os.path.exists(path + ".part"):
+            os.remove(path + ".part")
+    return {
+        "source": task["source"],
+        "document_type": task["document_type"],
+        "output": None if error else path,
+        "exports": exports,
+        "characters": characters,
+        "latency": round(time.perf_counter() - start_time, 3),
+        "error": error,
+    }
+
+
+def run(paths, output_dir, workers=CLI_WORKERS, out=sys.stdout, formats=()):
+    """
+    Generate the documents of every job file, at most `workers` at a time.
+
+    Args:
+        paths (list): Job files or directories of job files.
+        output_dir (str): Directory the documents are written to (created if missing).
+        workers (int, optional): Maximum number of documents generated at once.
+        out (file, optional): Where the JSON line of each finished document is written.
+        formats (tuple, optional): Export formats written next to each document.
+
+    Returns:
+        int: Number of documents (or job files) that failed.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    failures = 0
+
+    def report(result):
+        nonlocal failures
+        failures += result["error"] is not None
+        out.write(json.dumps(result) + "\n")
+        out.flush()
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = set()
+        for task in iter_tasks(paths):
+            if "error" in task:
+                report({"source": task["source"], "document_type": None, "output": None, "exports": [], "characters": 0,
+                        "latency": 0.0, "error": task["error"]})
+                continue
+            # Submitting a bounded number ahead keeps memory flat however many files are given
+            if len(pending) >= workers * 2:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    report(future.result())
+            pending.add(executor.submit(generate_to_file, task, output_dir, formats))
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                report(future.result())
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("paths", nargs="+", help="JSON/YAML job files, or directories of them")
+    parser.add_argument("--output-dir", "-o", default="output", help="directory the documents are written to")
+    parser.add_argument("--workers", "-w", type=int, default=CLI_WORKERS, help="documents generated at once")
+    parser.add_argument("--formats", "-f", default="", help=f"comma-separated export formats ({', '.join(EXPORT_FORMATS)})")
+    args = parser.parse_args(argv)
+    formats = tuple(name.strip().lower() for name in args.formats.split(",") if name.strip())
+    unknown = [name for name in formats if name not in EXPORT_FORMATS]
+    if unknown:
+        parser.error(f"unknown export formats: {', '.join(unknown)}")
+    validate_templates()
+    return 1 if run(args.paths, args.output_dir, max(1, args.workers), formats=formats) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
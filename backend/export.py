@@ -0,0 +1,513 @@
+import hashlib
+import importlib.util
+import io
+import multiprocessing
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from backend.ratelimit import SingleFlight
+
+
+# Encoded downloads, memoized per document ID so reruns never encode the same document twice
+ENCODED_CACHE_SIZE = 256
+_encoded_documents = OrderedDict()
+_encoded_lock = threading.Lock()
+
+
+def encode_document(doc_id, content):
+    """
+    Encode a generated document for download, reusing the bytes produced for the same document earlier.
+
+    Args:
+        doc_id (str): Unique ID of the generated document.
+        content (str): Document text.
+
+    Returns:
+        bytes: UTF-8 encoded document.
+    """
+    with _encoded_lock:
+        data = _encoded_documents.get(doc_id)
+        if data is not None:
+            _encoded_documents.move_to_end(doc_id)
+            return data
+
+    data = content.encode()
+    with _encoded_lock:
+        _encoded_documents[doc_id] = data
+        while len(_encoded_documents) > ENCODED_CACHE_SIZE:
+            _encoded_documents.popitem(last=False)
+    return data
+
+
+# Export formats: file extension -> display label, MIME type and the library rendering it
+EXPORT_FORMATS = {
+    "docx": {
+        "label": "DOCX",
+        "mime": "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+        "module": "docx",
+    },
+    "pdf": {"label": "PDF", "mime": "application/pdf", "module": "fpdf"},
+    "pptx": {
+        "label": "PPTX",
+        "mime": "application/vnd.openxmlformats-officedocument.presentationml.presentation",
+        "module": "pptx",
+    },
+}
+
+# Rendering runs in worker processes; rendered files are cached by content hash in memory and on disk
+EXPORT_WORKERS = int(os.environ.get("STARTUPDOC_EXPORT_WORKERS", 2))
+EXPORT_CACHE_PATH = os.environ.get("STARTUPDOC_EXPORT_CACHE_PATH", ".cache/exports")
+EXPORT_CACHE_SIZE = int(os.environ.get("STARTUPDOC_EXPORT_CACHE_SIZE", 64))
+# Files on disk unused for longer than the TTL are deleted, then the least recently used ones beyond the size budget
+EXPORT_CACHE_TTL_SECONDS = int(os.environ.get("STARTUPDOC_EXPORT_CACHE_TTL", 7 * 24 * 3600))
+EXPORT_CACHE_MAX_DISK_BYTES = int(os.environ.get("STARTUPDOC_EXPORT_CACHE_MAX_DISK_BYTES", 256 * 1024 * 1024))
+# Unicode TrueType fonts for PDF output (PDF core fonts only cover Latin-1)
+PDF_FONT_DIR = os.environ.get("STARTUPDOC_PDF_FONT_DIR", "/usr/share/fonts/truetype/dejavu")
+PDF_FONT_FILES = {"": "DejaVuSans.ttf", "B": "DejaVuSans-Bold.ttf"}
+# Bullet points per slide before a section continues on the next slide
+MAX_SLIDE_BULLETS = 7
+
+HEADING_PATTERN = re.compile(r"^(#{1,6})\s+(.*?)\s*#*\s*$")
+BOLD_HEADING_PATTERN = re.compile(r"^\*\*([^*]+?)\*\*:?\s*$")
+BULLET_PATTERN = re.compile(r"^(\s*)[-*+•]\s+(.*)$")
+NUMBERED_PATTERN = re.compile(r"^(\s*)(\d+[.)])\s+(.*)$")
+RULE_PATTERN = re.compile(r"^\s*([-*_])(\s*\1){2,}\s*$")
+TABLE_SEPARATOR_PATTERN = re.compile(r"^\s*\|?[\s:|-]+\|[\s:|-]*$")
+INLINE_PATTERN = re.compile(r"\*\*(.+?)\*\*|__(.+?)__|(?<![\w*])\*(?!\s)(.+?)(?<!\s)\*|(?<!\w)_(?!\s)(.+?)(?<!\s)_(?!\w)")
+LINK_PATTERN = re.compile(r"\[([^\]]+)\]\(([^)]+)\)")
+HTML_TAG_PATTERN = re.compile(r"</?[a-zA-Z][^>]*>")
+# Emoji and pictographs, which the bundled PDF fonts have no glyphs for
+EMOJI_PATTERN = re.compile("[\U0001F000-\U0001FAFF☀-➿⬀-⯿️‍]")
+
+
+# Function to split inline markdown into (text, bold, italic) runs
+def parse_inline(text):
+    text = HTML_TAG_PATTERN.sub("", LINK_PATTERN.sub(r"\1 (\2)", text))
+    runs, position = [], 0
+    for match in INLINE_PATTERN.finditer(text):
+        if match.start() > position:
+            runs.append((text[position:match.start()], False, False))
+        bold, bold_alt, italic, italic_alt = match.groups()
+        runs.append((bold or bold_alt, True, False) if (bold or bold_alt) else (italic or italic_alt, False, True))
+        position = match.end()
+    if position < len(text):
+        runs.append((text[position:], False, False))
+    return [run for run in runs if run[0]]
+
+
+def parse_markdown(content):
+    """
+    Parse generated markdown into the blocks the exporters render.
+
+    Covers what the model produces: headings (including lines that are entirely bold), paragraphs,
+    bullet and numbered lists, tables (rendered as text rows) and horizontal rules.
+
+    Args:
+        content (str): Markdown document.
+
+    Returns:
+        list: Dicts with "kind" (heading, paragraph, bullet, numbered or rule), "level" (heading level
+        or list indentation) and "runs" (see `parse_inline`); numbered items also carry their "number".
+    """
+    blocks, paragraph = [], []
+
+    def flush():
+        if paragraph:
+            blocks.append({"kind": "paragraph", "level": 0, "runs": parse_inline(" ".join(paragraph))})
+            paragraph.clear()
+
+    for line in content.splitlines():
+        stripped = line.strip()
+        heading = HEADING_PATTERN.match(stripped)
+        bold_heading = BOLD_HEADING_PATTERN.match(stripped)
+        bullet = BULLET_PATTERN.match(line)
+        numbered = NUMBERED_PATTERN.match(line)
+        if not stripped or TABLE_SEPARATOR_PATTERN.match(stripped) and "-" in stripped:
+            flush()
+        elif RULE_PATTERN.match(stripped):
+            flush()
+            blocks.append({"kind": "rule", "level": 0, "runs": []})
+        elif heading or bold_heading:
+            flush()
+            level = len(heading.group(1)) if heading else 3
+            text = heading.group(2) if heading else bold_heading.group(1)
+            blocks.append({"kind": "heading", "level": level, "runs": [(run[0], False, False) for run in parse_inline(text)]})
+        elif bullet:
+            flush()
+            blocks.append({"kind": "bullet", "level": len(bullet.group(1).expandtabs(4)) // 2, "runs": parse_inline(bullet.group(2))})
+        elif numbered:
+            flush()
+            blocks.append({
+                "kind": "numbered", "level": len(numbered.group(1).expandtabs(4)) // 2,
+                "number": numbered.group(2), "runs": parse_inline(numbered.group(3)),
+            })
+        elif stripped.startswith("|"):
+            flush()
+            cells = [cell.strip() for cell in stripped.strip("|").split("|")]
+            blocks.append({"kind": "paragraph", "level": 0, "runs": parse_inline("  ·  ".join(cells))})
+        else:
+            paragraph.append(stripped)
+    flush()
+    return [block for block in blocks if block["runs"] or block["kind"] == "rule"]
+
+
+def _plain(runs):
+    return "".join(text for text, _, _ in runs)
+
+
+def _render_docx(title, blocks):
+    from docx import Document
+    from docx.shared import Pt
+
+    document = Document()
+    if title:
+        document.add_heading(title, level=0)
+    for block in blocks:
+        kind = block["kind"]
+        if kind == "rule":
+            continue
+        if kind == "heading":
+            paragraph = document.add_heading(level=min(block["level"], 9))
+        elif kind == "bullet":
+            paragraph = document.add_paragraph(style="List Bullet 2" if block["level"] else "List Bullet")
+        else:
+            paragraph = document.add_paragraph()
+            if kind == "numbered":
+                # Numbers are kept as written; Word's list numbering would continue across lists
+                paragraph.paragraph_format.left_indent = Pt(18 * (block["level"] + 1))
+                paragraph.paragraph_format.first_line_indent = Pt(-18)
+                paragraph.add_run(block["number"] + " ")
+        for text, bold, italic in block["runs"]:
+            run = paragraph.add_run(text)
+            run.bold = bold or None
+            run.italic = italic or None
+    buffer = io.BytesIO()
+    document.save(buffer)
+    return buffer.getvalue()
+
+
+def _pdf_fonts(pdf):
+    # Registers the Unicode fonts when available and returns the font family to use
+    paths = {style: os.path.join(PDF_FONT_DIR, name) for style, name in PDF_FONT_FILES.items()}
+    if not os.path.exists(paths[""]):
+        return "helvetica", False
+    for style in ("", "B", "I", "BI"):
+        path = paths.get(style.replace("I", "")) or paths[""]
+        pdf.add_font("body", style, path if os.path.exists(path) else paths[""])
+    return "body", True
+
+
+def _render_pdf(title, blocks):
+    from fpdf import FPDF
+
+    pdf = FPDF()
+    pdf.set_auto_page_break(True, margin=18)
+    pdf.set_margins(20, 18, 20)
+    pdf.add_page()
+    family, unicode_fonts = _pdf_fonts(pdf)
+    margin = pdf.l_margin
+
+    def clean(text):
+        text = EMOJI_PATTERN.sub("", text)
+        # Without Unicode fonts, characters outside Latin-1 cannot be drawn
+        return text if unicode_fonts else text.encode("latin-1", "replace").decode("latin-1")
+
+    def write(runs, size, bold=False, prefix=""):
+        height = size * 0.55
+        if prefix:
+            pdf.set_font(family, "B" if bold else "", size)
+            pdf.write(height, prefix)
+        for text, run_bold, italic in runs:
+            pdf.set_font(family, ("B" if bold or run_bold else "") + ("I" if italic else ""), size)
+            pdf.write(height, clean(text))
+        pdf.ln(height * 1.6)
+
+    if title:
+        write([(clean(title).strip(), True, False)], 20)
+    for block in blocks:
+        kind = block["kind"]
+        if kind == "rule":
+            pdf.ln(2)
+            continue
+        if kind == "heading":
+            pdf.ln(2)
+            write(block["runs"], {1: 17, 2: 15, 3: 13}.get(block["level"], 12), bold=True)
+            continue
+        indent = 6 * (block["level"] + 1) if kind in ("bullet", "numbered") else 0
+        pdf.set_left_margin(margin + indent)
+        pdf.set_x(margin + indent)
+        prefix = {"bullet": "• " if unicode_fonts else "- ", "numbered": block.get("number", "") + " "}.get(kind, "")
+        write(block["runs"], 11, prefix=prefix)
+        pdf.set_left_margin(margin)
+    return bytes(pdf.output())
+
+
+def slides_from_blocks(title, blocks):
+    """
+    Group document blocks into slides: one per section, continued on further slides when long.
+
+    Args:
+        title (str): Document title, used for the title slide.
+        blocks (list): Blocks from `parse_markdown`.
+
+    Returns:
+        list: (slide title, [(bullet runs, level)]) tuples, the title slide first with no bullets.
+    """
+    slides, current = [], None
+    for block in blocks:
+        if block["kind"] == "heading":
+            if block["level"] == 1 and not slides and current is None:
+                title = title or _plain(block["runs"])  # A leading "# Title" names the deck
+                continue
+            current = (_plain(block["runs"]), [])
+            slides.append(current)
+        elif block["kind"] != "rule":
+            if current is None:
+                current = (title or "Overview", [])
+                slides.append(current)
+            level = min(block["level"], 4) if block["kind"] in ("bullet", "numbered") else 0
+            current[1].append((block["runs"], level))
+
+    paged = [(title or "Document", [])]
+    for slide_title, bullets in slides:
+        for start in range(0, max(len(bullets), 1), MAX_SLIDE_BULLETS):
+            paged.append((slide_title if start == 0 else f"{slide_title} (cont.)", bullets[start:start + MAX_SLIDE_BULLETS]))
+    return paged
+
+
+def _render_pptx(title, blocks):
+    from pptx import Presentation
+    from pptx.enum.text import MSO_AUTO_SIZE
+    from pptx.util import Inches, Pt
+
+    presentation = Presentation()
+    # Widescreen slides
+    presentation.slide_width, presentation.slide_height = Inches(13.333), Inches(7.5)
+    slides = slides_from_blocks(title, blocks)
+
+    title_slide = presentation.slides.add_slide(presentation.slide_layouts[0])
+    title_slide.shapes.title.text = slides[0][0]
+    title_slide.placeholders[1].text = f"{len(slides) - 1} sections"
+    for slide_title, bullets in slides[1:]:
+        slide = presentation.slides.add_slide(presentation.slide_layouts[1])
+        slide.shapes.title.text = slide_title
+        body = slide.placeholders[1]
+        body.width = presentation.slide_width - body.left * 2
+        frame = body.text_frame
+        frame.word_wrap = True
+        # Long bullets shrink to fit when the deck is opened, rather than overflowing the slide
+        frame.auto_size = MSO_AUTO_SIZE.TEXT_TO_FIT_SHAPE
+        for i, (runs, level) in enumerate(bullets):
+            paragraph = frame.paragraphs[0] if i == 0 else frame.add_paragraph()
+            paragraph.level = level
+            for text, bold, italic in runs:
+                run = paragraph.add_run()
+                run.text = text
+                run.font.bold = bold or None
+                run.font.italic = italic or None
+                run.font.size = Pt(20 if level == 0 else 18)
+    buffer = io.BytesIO()
+    presentation.save(buffer)
+    return buffer.getvalue()
+
+
+_RENDERERS = {"docx": _render_docx, "pdf": _render_pdf, "pptx": _render_pptx}
+
+
+def render_export(content, export_format, title=None):
+    """
+    Render a markdown document to a file format, in the calling process.
+
+    Args:
+        content (str): Markdown document.
+        export_format (str): One of EXPORT_FORMATS ("docx", "pdf" or "pptx").
+        title (str, optional): Document title (e.g. the document type).
+
+    Returns:
+        bytes: The rendered file.
+
+    Raises:
+        ValueError: If the format is unknown.
+        ImportError: If the library rendering the format is not installed.
+    """
+    if export_format not in _RENDERERS:
+        raise ValueError(f"Unknown export format '{export_format}' (expected one of {list(EXPORT_FORMATS)})")
+    blocks = parse_markdown(content)
+    # A leading heading repeating the title would show twice
+    if title and blocks and blocks[0]["kind"] == "heading" and _plain(blocks[0]["runs"]).strip() == title.strip():
+        blocks = blocks[1:]
+    return _RENDERERS[export_format](title, blocks)
+
+
+# Function to list the export formats whose rendering library is installed (without importing it)
+def available_formats():
+    return [name for name, spec in EXPORT_FORMATS.items() if importlib.util.find_spec(spec["module"]) is not None]
+
+
+class ExportCache:
+    """
+    Rendered exports cached by content hash, in memory (LRU) and optionally on disk, rendered in a
+    process pool so large documents never hold the caller's thread or the GIL.
+
+    A file's modification time records its last use; every write evicts files unused for `ttl`
+    seconds, then the least recently used files until the directory fits `max_disk_bytes`.
+    """
+
+    def __init__(self, path=EXPORT_CACHE_PATH, max_entries=EXPORT_CACHE_SIZE, max_workers=EXPORT_WORKERS,
+                 ttl=EXPORT_CACHE_TTL_SECONDS, max_disk_bytes=EXPORT_CACHE_MAX_DISK_BYTES):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_workers = max_workers
+        self.ttl = ttl
+        self.max_disk_bytes = max_disk_bytes
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._renders = SingleFlight()
+        self._pool = None
+        self.hits = 0
+        self.renders = 0
+        self.evictions = 0
+
+    def _executor(self):
+        with self._lock:
+            if self._pool is None:
+                # Spawned workers: forking a process that runs server threads is not safe
+                self._pool = ProcessPoolExecutor(self.max_workers, mp_context=multiprocessing.get_context("spawn"))
+            return self._pool
+
+    def _file(self, key, export_format):
+        return os.path.join(self.path, f"{key}.{export_format}")
+
+    def _remember(self, key, data):
+        with self._lock:
+            self._memory[key] = data
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+    def _render(self, key, content, export_format, title):
+        future = self._executor().submit(render_export, content, export_format, title)
+        try:
+            data = future.result()
+        except BrokenProcessPool:
+            with self._lock:  # A crashed worker breaks the pool; start a new one for the next export
+                self._pool = None
+            raise
+        with self._lock:
+            self.renders += 1
+        if self.path:
+            # Created on first write, so importing the module (e.g. in a render worker) touches no disk
+            os.makedirs(self.path, exist_ok=True)
+            path = self._file(key, export_format)
+            with open(path + ".tmp", "wb") as f:
+                f.write(data)
+            os.replace(path + ".tmp", path)
+            self._evict()
+        self._remember(key, data)
+        return data
+
+    def _evict(self):
+        # Files may be deleted concurrently by another worker process evicting the same directory
+        now = time.time()
+        files = []
+        for entry in os.scandir(self.path):
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, entry.path))
+        files.sort()
+        total = sum(size for _, size, _ in files)
+        evicted = 0
+        for used, size, path in files:
+            if now - used <= self.ttl and total <= self.max_disk_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            evicted += 1
+        if evicted:
+            with self._lock:
+                self.evictions += evicted
+
+    def get(self, content, export_format, title=None):
+        """
+        Return a document rendered to a file format, rendering it only if it was never rendered before.
+
+        Args:
+            content (str): Markdown document.
+            export_format (str): One of EXPORT_FORMATS.
+            title (str, optional): Document title.
+
+        Returns:
+            bytes: The rendered file.
+
+        Raises:
+            ValueError: If the format is unknown.
+            ImportError: If the library rendering the format is not installed.
+        """
+        if export_format not in EXPORT_FORMATS:
+            raise ValueError(f"Unknown export format '{export_format}' (expected one of {list(EXPORT_FORMATS)})")
+        key = hashlib.sha256(f"{export_format}\0{title or ''}\0{content}".encode()).hexdigest()
+        with self._lock:
+            data = self._memory.get(key)
+            if data is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return data
+        if self.path and os.path.exists(self._file(key, export_format)):
+            try:
+                with open(self._file(key, export_format), "rb") as f:
+                    data = f.read()
+                os.utime(self._file(key, export_format))
+            except FileNotFoundError:  # Evicted meanwhile
+                return self._renders.do(key, self._render, key, content, export_format, title)
+            self._remember(key, data)
+            with self._lock:
+                self.hits += 1
+            return data
+        # Concurrent requests for the same export share one render
+        return self._renders.do(key, self._render, key, content, export_format, title)
+
+    def stats(self):
+        """
+        Report export cache counters.
+
+        Returns:
+            dict: Exports served from the cache, exports rendered, rendered files held in memory and
+            files evicted from disk.
+        """
+        with self._lock:
+            return {
+                "export_cache_hits": self.hits,
+                "exports_rendered": self.renders,
+                "export_memory_entries": len(self._memory),
+                "export_disk_evictions": self.evictions,
+            }
+
+
+# Process-wide export cache and render pool
+export_cache = ExportCache()
+
+
+# Function to export a document (a deferred download callback for the app)
+def export_document(content, export_format, title=None):
+    """
+    Render a document to DOCX, PDF or PPTX, from the export cache when possible.
+
+    Args:
+        content (str): Markdown document.
+        export_format (str): One of EXPORT_FORMATS.
+        title (str, optional): Document title.
+
+    Returns:
+        bytes: The rendered file.
+    """
+    return export_cache.get(content, export_format, title)
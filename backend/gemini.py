@@ -1,12 +1,294 @@
+import asyncio
+import functools
+import logging
 import os
-import google.generativeai as genai
-from google.api_core.exceptions import GoogleAPIError
-import streamlit as st
+import threading
+import time
+from backend.cache import context_cache, get_response_cache, make_cache_key
+from backend.langchain import Prompt
+from backend.metrics import metrics
+from backend.models import get_backend
+from backend.ratelimit import RateLimiter, RetryPolicy, SingleFlight, estimate_tokens
+from backend.router import PRO_MODEL, model_router
+from backend.state import get_shared_state
 
-# Configure API Key
-gemini_key = st.secrets["api_keys"]["gemini"]
-os.environ["GOOGLE_API_KEY"] = gemini_key
-genai.configure(api_key=gemini_key)
+logger = logging.getLogger(__name__)
+
+# Default model and generation settings (part of the response cache key); the router picks the
+# model of each request per document type and input size
+MODEL_NAME = PRO_MODEL
+GENERATION_CONFIG = {}
+
+# Request coalescing shared by every session in the process
+single_flight = SingleFlight()
+# Longest wait for another worker process generating the same request
+GENERATION_LOCK_SECONDS = float(os.environ.get("STARTUPDOC_GENERATION_LOCK_SECONDS", 300))
+# Retry policies per backend, since each backend knows which of its errors are transient
+_retry_policies = {}
+# Model calls and tokens per document type, for cost tracking
+_token_usage = {}
+_token_usage_lock = threading.Lock()
+
+
+# Function to create the throttling shared by every worker process on the first model call
+@functools.cache
+def get_rate_limiter():
+    """
+    Return the request and token quotas shared by every worker process using the shared state.
+
+    Returns:
+        RateLimiter: The process-wide rate limiter.
+    """
+    return RateLimiter(state=get_shared_state())
+
+
+def generation_config(prompt=None):
+    """
+    Return the generation settings for a prompt.
+
+    Args:
+        prompt (str, optional): The prompt; prompts from `craft_prompt` carry the output token limit
+            of their document type.
+
+    Returns:
+        dict: GENERATION_CONFIG, plus max_output_tokens when the prompt sets one.
+    """
+    max_output_tokens = getattr(prompt, "max_output_tokens", None)
+    if max_output_tokens is None:
+        return GENERATION_CONFIG
+    return {**GENERATION_CONFIG, "max_output_tokens": max_output_tokens}
+
+
+def get_model_backend(prompt=None, context=""):
+    """
+    Return the pooled backend of the model a request is routed to first (Gemini, or the stub when
+    STARTUPDOC_BACKEND=stub).
+
+    Args:
+        prompt (str, optional): The prompt to serve; its document type and generation settings select
+            the backend (MODEL_NAME without a prompt).
+        context (str, optional): Context of the prompt, whose size is part of the routing.
+
+    Returns:
+        ModelBackend: The shared model backend.
+    """
+    if prompt is None:
+        return get_backend(MODEL_NAME, generation_config())
+    model = model_router.rule(_document_type(prompt), estimate_tokens(context + prompt))["models"][0]
+    return get_backend(model, generation_config(prompt))
+
+
+def _document_type(prompt):
+    return getattr(prompt, "document_type", None)
+
+
+def _retry_policy(backend):
+    policy = _retry_policies.get(backend.name)
+    if policy is None:
+        policy = _retry_policies.setdefault(backend.name, RetryPolicy(backend.retryable_errors))
+    return policy
+
+
+# Function to identify a request for caching and job de-duplication
+def request_key(context, prompt):
+    """
+    Return the content-addressed key of a text-only request to the configured model.
+
+    Args:
+        context (str): Context for the prompt.
+        prompt (str): User prompt to generate content.
+
+    Returns:
+        str: SHA-256 hex digest of the prompt, name of the model it is routed to first and generation
+        config.
+    """
+    return make_cache_key(context + prompt, get_model_backend(prompt, context).name, generation_config(prompt))
+
+
+# Function to look up a previously generated response
+def cached_response(context, prompt):
+    """
+    Return the cached response for a context and prompt, if one exists.
+
+    Args:
+        context (str): Context for the prompt.
+        prompt (str): User prompt to generate content.
+
+    Returns:
+        str: The cached response, or None if the request has not been answered before.
+    """
+    return get_response_cache().get(request_key(context, prompt))
+
+
+# Function to label the metrics of a request by document type and model
+def _metric_labels(backend, prompt):
+    return {"document_type": getattr(prompt, "document_type", None) or "-", "model": backend.name}
+
+
+# Function to log and count the token usage of a model call, for cost tracking per document type
+def _log_usage(backend, prompt, prompt_tokens, output_tokens, cached_tokens=0):
+    labels = _metric_labels(backend, prompt)
+    document_type = labels["document_type"]
+    metrics.count("input_tokens", prompt_tokens, **labels)
+    metrics.count("cached_input_tokens", cached_tokens, **labels)
+    metrics.count("output_tokens", output_tokens, **labels)
+    logger.info(
+        "model=%s document_type=%s input_tokens=%d cached_input_tokens=%d output_tokens=%d",
+        backend.name, document_type, prompt_tokens, cached_tokens, output_tokens,
+    )
+    with _token_usage_lock:
+        usage = _token_usage.setdefault(
+            document_type, {"requests": 0, "input_tokens": 0, "cached_input_tokens": 0, "output_tokens": 0}
+        )
+        usage["requests"] += 1
+        usage["input_tokens"] += prompt_tokens
+        usage["cached_input_tokens"] += cached_tokens
+        usage["output_tokens"] += output_tokens
+
+
+# Function to list the prompt prefixes worth caching, longest first
+def _cacheable_prefixes(context, prompt):
+    # The context comes first, so it is shared by every document generated from the same inputs;
+    # followed by the fixed template text it is also shared by every tone and language
+    prefixes = [context + prompt[:getattr(prompt, "static_length", 0)], context]
+    return [prefix for i, prefix in enumerate(prefixes) if prefix and prefix not in prefixes[:i]]
+
+
+# Function to send one throttled request to the model backend, referencing a cached prefix when possible
+def _request(backend, context, prompt, image=None, stream=False):
+    # Returns the response (or chunk iterator) and the estimated input tokens served from the cache
+    text = context + prompt
+    get_rate_limiter().acquire(estimate_tokens(text))
+    handle, prefix = (None, None) if image else context_cache.resolve(backend, _cacheable_prefixes(context, prompt))
+    if handle is not None:
+        try:
+            send = backend.stream if stream else backend.generate
+            return send(text[len(prefix):], cache=handle), estimate_tokens(prefix)
+        except backend.retryable_errors:
+            raise
+        except Exception:
+            # The cached prefix may have expired or been deleted upstream; resend the prompt in full
+            logger.warning("Request with cached context failed, retrying without it", exc_info=True)
+            context_cache.invalidate(handle)
+    contents = [text, image] if image else text
+    return (backend.stream(contents) if stream else backend.generate(contents)), 0
+
+
+# Function to call the routed models (with throttling, retries, hedging and fallback) and cache the response
+def _call_model(context, prompt, image=None):
+    def attempt(model):
+        backend = get_backend(model, generation_config(prompt))
+        with metrics.span("model_call", **_metric_labels(backend, prompt)):
+            response, _ = _retry_policy(backend).call(_request, backend, context, prompt, image)
+        # Every answered call is billed, including hedged calls that lost the race
+        _log_usage(backend, prompt, response["prompt_tokens"], response["output_tokens"], response["cached_tokens"])
+        model_router.record_cost(model, response["prompt_tokens"], response["output_tokens"])
+        return response
+
+    _, response = model_router.call(
+        _document_type(prompt), estimate_tokens(context + prompt), attempt,
+        acceptable=lambda response: bool(response["content"].strip()),
+    )
+    if not image:
+        get_response_cache().set(request_key(context, prompt), response["content"])
+    return {**response, "cached": False}
+
+
+# Function to generate content with Gemini, reporting token usage
+def generate_gemini_response(context, prompt, image=None):
+    """
+    Generate content with the Gemini model and report how many tokens the request used.
+
+    Requests are throttled by the shared rate limiter, retried with jittered backoff on transient
+    errors, routed to a model per document type and input size (hedged with, or falling back to, the
+    next model of the route), and concurrent identical text-only requests share a single upstream call,
+    also across worker processes sharing the response cache.
+
+    Args:
+        context (str): Context for the prompt.
+        prompt (str): User prompt to generate content.
+        image (str, optional): Path to an image file for multimodal inputs.
+
+    Returns:
+        dict: "content" (str), "prompt_tokens", "output_tokens" and "cached_tokens" (int, input tokens
+        served from a cached context; all 0 for cached responses) and "cached" (bool).
+
+    Raises:
+        AllModelsFailed: If every model of the route failed (chained to the last model's error).
+    """
+    if image:
+        return _call_model(context, prompt, image)
+
+    # Serve repeated text-only requests from the response cache
+    cache_key = request_key(context, prompt)
+    cached = get_response_cache().get(cache_key)
+    if cached is not None:
+        metrics.count("response_cache_hits", document_type=getattr(prompt, "document_type", None) or "-")
+        return {"content": cached, "prompt_tokens": 0, "output_tokens": 0, "cached_tokens": 0, "cached": True}
+    return single_flight.do(cache_key, _call_model_once, cache_key, context, prompt)
+
+
+# Function to call the model unless another worker process is already answering the same request
+def _call_model_once(cache_key, context, prompt):
+    response_cache, shared_state = get_response_cache(), get_shared_state()
+    if not response_cache.shared:  # Other processes could not see the answer anyway
+        return _call_model(context, prompt)
+    name = f"generate:{cache_key}"
+    token = shared_state.acquire(name, 0, lease=GENERATION_LOCK_SECONDS)
+    contended = token is None
+    if contended:
+        # Another process holds the request; its response lands in the shared cache when it is done
+        metrics.count("generation_waits", document_type=_document_type(prompt) or "-")
+        token = shared_state.acquire(name, GENERATION_LOCK_SECONDS)
+    try:
+        if contended:
+            cached = response_cache.get(cache_key)
+            if cached is not None:
+                return {"content": cached, "prompt_tokens": 0, "output_tokens": 0, "cached_tokens": 0, "cached": True}
+        return _call_model(context, prompt)
+    finally:
+        if token is not None:
+            shared_state.release(name, token)
+
+
+# Function to generate content with Gemini, raising on failure
+def generate_gemini(context, prompt, image=None):
+    """
+    Generate content with the Gemini model, letting API errors propagate to the caller.
+
+    Args:
+        context (str): Context for the prompt.
+        prompt (str): User prompt to generate content.
+        image (str, optional): Path to an image file for multimodal inputs.
+
+    Returns:
+        str: Generated content from the Gemini model.
+
+    Raises:
+        AllModelsFailed: If every model of the route failed (chained to the last model's error).
+    """
+    return generate_gemini_response(context, prompt, image)["content"]
+
+
+# Function to generate content asynchronously
+async def generate_gemini_async(context, prompt):
+    """
+    Generate content without blocking the event loop, for async callers.
+
+    Runs `generate_gemini_response` in a worker thread, so async callers get the same throttling,
+    retries, routing, caching and request coalescing (across processes too) as every other caller.
+
+    Args:
+        context (str): Context for the prompt.
+        prompt (str): User prompt to generate content.
+
+    Returns:
+        dict: Same as `generate_gemini_response`.
+
+    Raises:
+        AllModelsFailed: If every model of the route failed (chained to the last model's error).
+    """
+    return await asyncio.to_thread(generate_gemini_response, context, prompt)
 
 
 # Function to query Gemini model
@@ -23,19 +305,129 @@ def query_gemini(context, prompt, image=None):
         str: Generated content from the Gemini model or None if an error occurs.
     """
     try:
-        # Choose the Gemini model
-        model = genai.GenerativeModel('gemini-1.5-pro-latest')
-
-        # Generate content based on whether an image is included
-        if image:
-            response = model.generate_content([context + prompt, image])
-        else:
-            response = model.generate_content(context + prompt)
-
-        # Parse response
-        if hasattr(response, 'candidates') and response.candidates:
-            return ' '.join(part.text for part in response.candidates[0].content.parts)
-        else:
-            return "Unexpected response format from Gemini API."
-    except GoogleAPIError as e:
-        return f"An error occurred while querying the Gemini API: {e}"
+        return generate_gemini(context, prompt, image)
+    except Exception:
+        # Errors are logged rather than returned, so they can never be mistaken for a document
+        logger.exception("Gemini request failed")
+        return None
+
+
+# Function to stream the Gemini model response
+def stream_gemini(context, prompt, image=None):
+    """
+    Stream content from the Gemini model, yielding text as soon as each chunk arrives.
+
+    The initial request is throttled, retried and routed like `generate_gemini_response` (hedging
+    and fallback apply until the first chunk arrives), and references a cached context when one is
+    available.
+
+    Args:
+        context (str): Context for the prompt.
+        prompt (str): User prompt to generate content.
+        image (str, optional): Path to an image file for multimodal inputs.
+
+    Yields:
+        str: Text of each streamed chunk from the Gemini model.
+
+    Raises:
+        AllModelsFailed: If every model of the route failed (chained to the last model's error).
+    """
+    # Request a streamed response so the first tokens are available without waiting for the full document;
+    # the router hedges and falls back on the time to first token
+    start_time = time.perf_counter()
+
+    def attempt(model):
+        backend = get_backend(model, generation_config(prompt))
+        chunks, cached_tokens = _retry_policy(backend).call(_request, backend, context, prompt, image, stream=True)
+        first = next(chunks, "")
+        metrics.observe("model_ttft", time.perf_counter() - start_time, **_metric_labels(backend, prompt))
+        return model, backend, first, chunks, cached_tokens
+
+    def discard(started):
+        # A stream that lost the race is closed; its input was still processed and is billed
+        model, backend, first, chunks, cached_tokens = started
+        chunks.close()
+        _log_usage(backend, prompt, input_tokens, estimate_tokens(first), cached_tokens)
+        model_router.record_cost(model, input_tokens, estimate_tokens(first))
+
+    input_tokens = estimate_tokens(context + prompt)
+    labels = _metric_labels(get_model_backend(prompt, context), prompt)
+    try:
+        model, (_, backend, content, chunks, cached_tokens) = model_router.call(
+            _document_type(prompt), input_tokens, attempt, kind="stream",
+            acceptable=lambda started: bool(started[2]), discard=discard,
+        )
+        labels = _metric_labels(backend, prompt)
+        yield content
+        for text in chunks:
+            content += text
+            yield text
+    except Exception:
+        metrics.observe("model_call", time.perf_counter() - start_time, error=True, **labels)
+        raise
+    metrics.observe("model_call", time.perf_counter() - start_time, **labels)
+    # Streamed chunks carry no usage metadata, so both counts are estimates
+    _log_usage(backend, prompt, input_tokens, estimate_tokens(content), cached_tokens)
+    model_router.record_cost(model, input_tokens, estimate_tokens(content))
+
+    # Only complete text-only responses are cached
+    if content and not image:
+        get_response_cache().set(request_key(context, prompt), content)
+
+
+# Function to summarize an oversized form input (see `compact_field`)
+def summarize_field(text, token_budget):
+    """
+    Summarize a text with the model so it fits into a token budget.
+
+    Args:
+        text (str): The text to shorten.
+        token_budget (int): Maximum estimated tokens of the summary.
+
+    Returns:
+        str: The summary.
+
+    Raises:
+        AllModelsFailed: If every model of the route failed (chained to the last model's error).
+    """
+    prompt = Prompt(
+        f"\n\nSummarize the text above in at most {token_budget * 3 // 4} words. Keep every name, figure "
+        "and date; reply with the summary only.",
+        max_output_tokens=token_budget,
+    )
+    return generate_gemini(text, prompt).strip()
+
+
+# Function to report throttling, retry and coalescing metrics
+def backend_stats():
+    """
+    Collect the model client metrics.
+
+    Returns:
+        dict: Limiter queue depth and throttled count, retry counts, coalesced request counts and
+        context cache counters.
+    """
+    retries = {"retries": 0, "retries_exhausted": 0}
+    for policy in list(_retry_policies.values()):
+        for name, count in policy.stats().items():
+            retries[name] += count
+    return {**get_rate_limiter().stats(), **retries, **single_flight.stats(), **context_cache.stats()}
+
+
+# Function to report token usage per document type
+def token_usage():
+    """
+    Collect the model calls and tokens used so far, per document type.
+
+    Returns:
+        dict: Mapping of document type keys ("-" for prompts without one) to requests, input_tokens,
+        cached_input_tokens (the part of input_tokens served from a cached context) and output_tokens
+        (estimated for streamed responses).
+    """
+    with _token_usage_lock:
+        return {document_type: dict(usage) for document_type, usage in _token_usage.items()}
+
+
+# Client and cache counters are exported alongside the request metrics
+metrics.register_collector(backend_stats)
+metrics.register_collector(lambda: {f"response_cache_{name}": value for name, value in get_response_cache().stats().items()})
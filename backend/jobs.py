@@ -0,0 +1,257 @@
+import functools
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from backend.state import get_shared_state
+
+
+# Job store location and worker pool size
+JOBS_PATH = os.environ.get("STARTUPDOC_JOBS_PATH", ".cache/jobs.sqlite3")
+JOB_WORKERS = int(os.environ.get("STARTUPDOC_JOB_WORKERS", 4))
+
+# How often a running job persists its partial output (and notices cancellation)
+FLUSH_INTERVAL_SECONDS = 0.25
+# Longest wait for another worker process submitting a job for the same request
+SUBMIT_LOCK_SECONDS = 10
+
+# Job statuses
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED_STATUSES = (DONE, FAILED, CANCELLED)
+
+
+class JobQueue:
+    """
+    Background generation jobs backed by a local worker pool.
+
+    Job state and partial output are persisted in SQLite, so a Streamlit rerun or a page refresh
+    can look a job up by ID and reattach to it instead of submitting the request again. Given a
+    shared state, submitting the same request from several worker processes of the host (e.g.
+    Streamlit replicas) also starts a single job.
+    """
+
+    def __init__(self, path=JOBS_PATH, max_workers=JOB_WORKERS, state=None):
+        self.path = path
+        self.state = state
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="startupdoc-job")
+        self._futures = {}
+        self._lock = threading.Lock()
+        self._init_db()
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _init_db(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    key TEXT,
+                    status TEXT NOT NULL,
+                    content TEXT NOT NULL DEFAULT '',
+                    error TEXT,
+                    meta TEXT NOT NULL DEFAULT '{}',
+                    pid INTEGER NOT NULL,
+                    created REAL NOT NULL,
+                    started REAL,
+                    first_token REAL,
+                    finished REAL
+                )
+                """
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_key ON jobs (key, status)")
+            # Jobs left unfinished by a process that no longer exists can never complete
+            for row in conn.execute("SELECT id, pid FROM jobs WHERE status IN (?, ?)", (QUEUED, RUNNING)).fetchall():
+                if not _process_alive(row["pid"]):
+                    conn.execute(
+                        "UPDATE jobs SET status = ?, error = ?, finished = ? WHERE id = ?",
+                        (FAILED, "The worker running this job exited.", time.time(), row["id"]),
+                    )
+
+    def submit(self, generate, *args, key=None, meta=None):
+        """
+        Submit a generation to the worker pool.
+
+        Args:
+            generate (callable): Called with `args`; returns either the generated text or an iterable of text chunks.
+            *args: Arguments passed to `generate`.
+            key (str, optional): Request identity (e.g. a response cache key). If a job with the same key is
+                still queued or running, its ID is returned instead of submitting a duplicate.
+            meta (dict, optional): JSON-serializable details stored with the job (document type, prompt, ...).
+
+        Returns:
+            str: ID of the (new or already running) job.
+        """
+        with self._lock:
+            # Checking for an active job and inserting one is atomic across processes too; if the lock
+            # cannot be had in time, a duplicate job is the lesser evil
+            token = None
+            if key is not None and self.state is not None:
+                token = self.state.acquire(f"job:{key}", SUBMIT_LOCK_SECONDS)
+            try:
+                if key is not None:
+                    existing = self.find_active(key)
+                    if existing is not None:
+                        return existing
+
+                job_id = uuid.uuid4().hex
+                with self._connect() as conn:
+                    conn.execute(
+                        "INSERT INTO jobs (id, key, status, meta, pid, created) VALUES (?, ?, ?, ?, ?, ?)",
+                        (job_id, key, QUEUED, json.dumps(meta or {}), os.getpid(), time.time()),
+                    )
+            finally:
+                if token is not None:
+                    self.state.release(f"job:{key}", token)
+            self._futures[job_id] = self._executor.submit(self._run, job_id, generate, args)
+            return job_id
+
+    def _run(self, job_id, generate, args):
+        now = time.time()
+        with self._connect() as conn:
+            claimed = conn.execute(
+                "UPDATE jobs SET status = ?, started = ? WHERE id = ? AND status = ?", (RUNNING, now, job_id, QUEUED)
+            ).rowcount
+        if not claimed:  # Cancelled while still queued
+            with self._lock:
+                self._futures.pop(job_id, None)
+            return
+
+        content = ""
+        first_token = None
+        last_flush = time.perf_counter()
+        try:
+            chunks = generate(*args)
+            for chunk in [chunks] if isinstance(chunks, str) else chunks:
+                if first_token is None:
+                    first_token = time.time()
+                content += chunk or ""
+                if time.perf_counter() - last_flush >= FLUSH_INTERVAL_SECONDS:
+                    last_flush = time.perf_counter()
+                    if not self._flush(job_id, content, first_token):
+                        return
+            status, error = (DONE, None) if content else (FAILED, "The model returned no content.")
+        except Exception as e:  # Surface the failure through the job status instead of losing it in the pool
+            status, error = FAILED, str(e)
+        finally:
+            with self._lock:
+                self._futures.pop(job_id, None)
+
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, content = ?, error = ?, first_token = ?, finished = ? "
+                "WHERE id = ? AND status = ?",
+                (status, content, error, first_token, time.time(), job_id, RUNNING),
+            )
+
+    def _flush(self, job_id, content, first_token):
+        # Persist partial output; returns False once the job has been cancelled
+        with self._connect() as conn:
+            return conn.execute(
+                "UPDATE jobs SET content = ?, first_token = ? WHERE id = ? AND status = ?",
+                (content, first_token, job_id, RUNNING),
+            ).rowcount > 0
+
+    def get(self, job_id):
+        """
+        Fetch the current state of a job.
+
+        Args:
+            job_id (str): ID returned by `submit`.
+
+        Returns:
+            dict: Job fields (id, status, content, error, meta and timestamps), or None if the ID is unknown.
+        """
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job["meta"] = json.loads(job["meta"])
+        return job
+
+    def find_active(self, key):
+        """
+        Find a queued or running job for a request key.
+
+        Args:
+            key (str): Request identity passed to `submit`.
+
+        Returns:
+            str: The job ID, or None if no such job is in flight.
+        """
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT id FROM jobs WHERE key = ? AND status IN (?, ?) ORDER BY created DESC LIMIT 1",
+                (key, QUEUED, RUNNING),
+            ).fetchone()
+        return row["id"] if row else None
+
+    def cancel(self, job_id):
+        """
+        Cancel a queued or running job. Running jobs stop at their next flush.
+
+        Args:
+            job_id (str): ID returned by `submit`.
+
+        Returns:
+            bool: True if the job was still in flight and is now cancelled.
+        """
+        with self._lock:
+            future = self._futures.get(job_id)
+            # A future cancelled before it started never runs `_run`, which would forget it
+            if future is not None and future.cancel():
+                del self._futures[job_id]
+        with self._connect() as conn:
+            return conn.execute(
+                "UPDATE jobs SET status = ?, finished = ? WHERE id = ? AND status IN (?, ?)",
+                (CANCELLED, time.time(), job_id, QUEUED, RUNNING),
+            ).rowcount > 0
+
+
+def _process_alive(pid):
+    if pid == os.getpid():
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+# Function to open the process-wide job queue the first time a job is submitted or looked up
+@functools.cache
+def get_job_queue():
+    """
+    Return the job queue shared by every Streamlit session of the process.
+
+    Opening it creates the worker pool and fails the jobs orphaned by exited worker processes, so
+    this happens on first use rather than at import.
+
+    Returns:
+        JobQueue: The process-wide job queue.
+    """
+    return JobQueue(state=get_shared_state())
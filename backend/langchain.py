@@ -1,9 +1,368 @@
-from langchain.prompts import PromptTemplate
+import os
+import re
+import threading
+
+from backend.metrics import metrics
+from backend.ratelimit import estimate_tokens
+
+
+# Display names of the supported document types, keyed by template key
+DOCUMENT_TITLES = {
+    "business_plan": "Business Plan 🏢",
+    "funding_proposal": "Funding Proposal 💼",
+    "pitch_deck": "Pitch Deck 🎯",
+    "investor_materials": "Investor Materials 📈",
+    "technical_documentation": "Technical Documentation 📘",
+    "project_proposal": "Project Proposal 🏗️",
+    "investment_memorandum": "Investment Memorandum 💡",
+    "shareholder_update": "Shareholder Update 📊",
+}
+
+# Variables every document template must consume
+TEMPLATE_INPUT_VARIABLES = ["query", "language", "tone"]
+
+# Output token limit per document type (unknown types use the business plan limit)
+MAX_OUTPUT_TOKENS = {
+    "business_plan": 4096,
+    "funding_proposal": 3072,
+    "pitch_deck": 2048,
+    "investor_materials": 3072,
+    "technical_documentation": 4096,
+    "project_proposal": 3072,
+    "investment_memorandum": 3072,
+    "shareholder_update": 2048,
+}
+# Output token limits of the outline pass and of each section of a sectioned generation (at most the
+# limit of the whole document)
+OUTLINE_MAX_OUTPUT_TOKENS = 512
+SECTION_MAX_OUTPUT_TOKENS = 1024
+
+# Longest a single form input may be in the context; longer inputs are truncated, or summarized by the
+# model with STARTUPDOC_SUMMARIZE_FIELDS=1 (one extra, cached, model call per oversized input)
+FIELD_TOKEN_BUDGET = int(os.environ.get("STARTUPDOC_FIELD_TOKEN_BUDGET", 1000))
+SUMMARIZE_FIELDS = os.environ.get("STARTUPDOC_SUMMARIZE_FIELDS", "0") == "1"
+# The outline pass sees every input, each compacted to this budget so the pass stays short
+OUTLINE_FIELD_TOKEN_BUDGET = int(os.environ.get("STARTUPDOC_OUTLINE_FIELD_TOKEN_BUDGET", 200))
+
+# Define tone styles for more nuanced prompt generation
+TONE_STYLES = {
+    "Formal": "Adopt a formal, highly professional tone with a focus on structure, precision, and clarity.",
+    "Neutral": "Use a neutral tone, ensuring clear and balanced information without emotional bias or excessive detail.",
+    "Casual": "Provide a conversational and approachable tone, using simple language while ensuring clarity.",
+    "Professional": "Emphasize clear, concise, and structured language with a focus on professionalism and detailed insights.",
+    "Friendly": "Adopt a warm, approachable tone that engages readers with simplicity and empathy.",
+    "Inspirational": "Use motivating language to evoke enthusiasm and confidence in the reader.",
+    "Serious": "Maintain a straightforward, serious tone, conveying critical information with emphasis on logic and results."
+}
+
+# Document templates with improved structure and effectiveness
+TEMPLATES = {
+    "business_plan": """
+        Create a comprehensive business plan with the following sections:
+        1. **Executive Summary**: Briefly summarize the company, its mission, and vision. Include key highlights of the business.
+        2. **Market Analysis**: Analyze the target market, including key trends, customer needs, and competitor landscape.
+        3. **Product/Service Overview**: Describe the product or service, its features, and unique selling points.
+        4. **Marketing and Sales Strategies**: Explain how the business plans to attract customers, sales strategies, and marketing channels.
+        5. **Financial Projections**: Provide projections for revenue, expenses, profit margins, and break-even analysis.
+        6. **Operational Plan**: Outline the daily operations, production methods, and key partnerships.
+
+        **Role**: The business strategist is responsible for ensuring a robust and comprehensive plan with clear data and market insight.
+        Ensure clarity, conciseness, and a logical flow throughout the document.
+
+        Tone: {tone}
+        Query: {query}
+        Language: {language}
+    """,
+    "funding_proposal": """
+        Draft a compelling funding proposal that includes the following sections:
+        1. **Executive Summary**: Provide a high-level overview of the business, including the investment opportunity.
+        2. **Problem Statement and Market Opportunity**: Define the problem your product/service solves and outline the market size and demand.
+        3. **Proposed Solution/Business Case**: Clearly present your solution and why it is the best option available.
+        4. **Funding Requirements and Allocation Plan**: Detail how much funding is needed, how it will be used, and the expected outcomes.
+        5. **Financial Projections and Return on Investment (ROI)**: Project the financial performance and explain how investors will benefit.
+        6. **Risk Assessment and Mitigation Strategies**: Identify potential risks and outline strategies for mitigating them.
+
+        **Role**: The investment analyst should focus on presenting the funding opportunity clearly, using data-driven insights and strategic rationale to address investor concerns.
+
+        Tone: {tone}
+        Query: {query}
+        Language: {language}
+    """,
+    "pitch_deck": """
+        Create a visually compelling and concise pitch deck with the following sections:
+        1. **Introduction and Vision**: Start with a brief introduction and your company’s vision.
+        2. **Problem and Solution**: Explain the problem you're solving and present your solution clearly.
+        3. **Market Opportunity and Competitive Landscape**: Provide insights into the market size, growth, and competitors.
+        4. **Business Model and Revenue Streams**: Define how your company will make money and why your model is sustainable.
+        5. **Financial Projections and Milestones**: Share your financial projections and key business milestones.
+        6. **Ask and Call to Action**: Specify the funding needed and what you are seeking from potential investors.
+
+        **Role**: The presentation designer is responsible for ensuring a visually engaging presentation that resonates with investors.
+
+        Tone: {tone}
+        Query: {query}
+        Language: {language}
+    """,
+    "technical_documentation": """
+        Write a comprehensive technical document that covers the following areas:
+        1. **System Overview and Architecture**: Provide a high-level description of the system architecture, including components and how they interact.
+        2. **Setup and Installation Instructions**: Clearly explain how to set up the system, including dependencies, configuration, and installation steps.
+        3. **Features and Functionalities**: Describe the system’s features and how each one works.
+        4. **API Documentation (if applicable)**: Provide detailed API endpoints, request/response formats, and usage examples.
+        5. **Troubleshooting Guide and FAQs**: List common issues and their solutions, along with frequently asked questions.
+
+        **Role**: The technical writer or engineer should ensure the document is clear, detailed, and accessible for developers and users alike.
+
+        Tone: {tone}
+        Query: {query}
+        Language: {language}
+    """,
+    "project_proposal": """
+        Create a comprehensive project proposal with the following sections:
+        1. **Executive Summary**: Briefly introduce the project and summarize the expected benefits.
+        2. **Project Objectives and Scope**: Clearly outline the project’s goals, objectives, and the scope of work.
+        3. **Methodology and Timeline**: Describe the approach, methodology, and timeline for executing the project.
+        4. **Budget and Resource Requirements**: Specify the resources, budget, and timelines needed for successful project completion.
+        5. **Expected Outcomes and Impact**: Outline the expected outcomes and how they will impact stakeholders and the community.
+
+        **Role**: The project manager or coordinator must ensure the proposal is thorough, with a clear plan for execution, risk management, and alignment to business goals.
+
+        Tone: {tone}
+        Query: {query}
+        Language: {language}
+    """,
+    "investor_materials": """
+        Prepare detailed investor materials that include:
+        1. **Overview of the Investment Opportunity**: Present an overview of the business opportunity, highlighting key value propositions.
+        2. **Market Size and Growth Potential**: Provide a detailed analysis of the market size, trends, and potential for growth.
+        3. **Financial Projections and ROI**: Share financial projections, expected returns, and any relevant financial metrics.
+        4. **Risk Assessment and Mitigation Strategies**: Address potential risks and outline strategies to mitigate them.
+        5. **Key Investment Highlights and Benefits**: Emphasize the key selling points for investors and the benefits they will gain.
+
+        **Role**: The investment consultant or financial analyst must create clear, compelling materials that address investor needs and mitigate concerns.
+
+        Tone: {tone}
+        Query: {query}
+        Language: {language}
+    """,
+    "investment_memorandum": """
+        Write a compelling investment memorandum with the following sections:
+        1. **Business Overview and Vision**: Introduce the company and its vision for the future.
+        2. **Investment Highlights and Unique Selling Proposition (USP)**: Clearly articulate what makes the business unique and why it's a worthwhile investment.
+        3. **Market Opportunity and Competitive Advantage**: Define the market opportunity, how the business stands out, and its competitive advantage.
+        4. **Financial Metrics and Projections**: Provide detailed financial data, growth projections, and key financial indicators.
+        5. **Risk Analysis and Mitigation Plans**: Outline potential risks to the business and how they will be mitigated.
+
+        **Role**: The corporate strategist should focus on creating a convincing, data-driven narrative that positions the company as a viable, high-potential investment.
+
+        Tone: {tone}
+        Query: {query}
+        Language: {language}
+    """,
+    "shareholder_update": """
+        Draft a shareholder update document with the following sections:
+        1. **Business Performance Overview**: Summarize the company’s performance since the last update, including key metrics.
+        2. **Key Achievements and Milestones**: Highlight significant achievements and progress toward goals.
+        3. **Financial Performance and Key Metrics**: Provide financial data such as revenue, expenses, and profit margins.
+        4. **Upcoming Goals and Future Plans**: Outline the company’s plans and goals for the upcoming quarter/year.
+        5. **Risk Assessment and Challenges**: Identify any challenges or risks the company is facing and how they will be addressed.
+
+        **Role**: The executive or communication officer must ensure transparency and keep shareholders informed about the company’s performance and outlook.
+
+        Tone: {tone}
+        Query: {query}
+        Language: {language}
+    """,
+}
+
+
+class Prompt(str):
+    """
+    Prompt text carrying its estimated token count and the generation settings it was crafted for.
+
+    `static_length` is the length of the leading template text that does not depend on the inputs,
+    which requests for the same document type share (and can cache, see `ContextCache`).
+
+    Behaves exactly like the plain prompt string everywhere else.
+    """
+
+    def __new__(cls, text, document_type=None, max_output_tokens=None, static_length=0):
+        prompt = super().__new__(cls, text)
+        prompt.tokens = estimate_tokens(text)
+        prompt.document_type = document_type
+        prompt.max_output_tokens = max_output_tokens
+        prompt.static_length = static_length
+        return prompt
+
+
+# Function to drop template indentation and repeated blank lines, which only cost tokens
+def compact_text(text):
+    lines = [line.strip() for line in text.strip().splitlines()]
+    return re.sub(r"\n{3,}", "\n\n", "\n".join(lines))
+
+
+def compile_templates(templates=TEMPLATES):
+    """
+    Parse every document template once and check it uses exactly the expected input variables.
+
+    Args:
+        templates (dict): Mapping of document type keys to raw template strings.
+
+    Returns:
+        dict: Mapping of document type keys to compiled LangChain prompt templates.
+
+    Raises:
+        ValueError: If a template references missing or unexpected input variables.
+    """
+    # LangChain takes most of a second to import, so it is only loaded once the first prompt is crafted
+    from langchain.prompts import PromptTemplate
+
+    compiled = {}
+    for document_type, template in templates.items():
+        prompt_template = PromptTemplate.from_template(compact_text(template))
+        if sorted(prompt_template.input_variables) != sorted(TEMPLATE_INPUT_VARIABLES):
+            raise ValueError(
+                f"Template '{document_type}' uses variables {prompt_template.input_variables}, "
+                f"expected {TEMPLATE_INPUT_VARIABLES}"
+            )
+        compiled[document_type] = prompt_template
+    return compiled
+
+
+# Process-wide registry of compiled templates, built on first use and only read afterwards
+PROMPT_TEMPLATES = {}
+_templates_compiled = False
+_registry_lock = threading.Lock()
+
+
+# Function to compile the built-in templates the first time a prompt is crafted
+def _prompt_templates():
+    global _templates_compiled
+    if not _templates_compiled:
+        with _registry_lock:
+            if not _templates_compiled:
+                # Templates registered in the meantime replace the built-in ones
+                PROMPT_TEMPLATES.update({**compile_templates(), **PROMPT_TEMPLATES})
+                _templates_compiled = True
+    return PROMPT_TEMPLATES
+
+
+# Compiled outline and section templates (see OUTLINE_TEMPLATE and SECTION_TEMPLATE), built on first use
+FIXED_TEMPLATES = {}
+
+
+# Function to compile the outline and section templates the first time one is needed
+def _fixed_templates():
+    if not FIXED_TEMPLATES:
+        with _registry_lock:
+            if not FIXED_TEMPLATES:
+                from langchain.prompts import PromptTemplate
+
+                compiled = {}
+                for name, template, variables in (
+                    ("outline", OUTLINE_TEMPLATE, OUTLINE_INPUT_VARIABLES),
+                    ("section", SECTION_TEMPLATE, SECTION_INPUT_VARIABLES),
+                ):
+                    compiled[name] = PromptTemplate.from_template(template)
+                    if sorted(compiled[name].input_variables) != sorted(variables):
+                        raise ValueError(
+                            f"The {name} template uses variables {compiled[name].input_variables}, expected {variables}"
+                        )
+                FIXED_TEMPLATES.update(compiled)
+    return FIXED_TEMPLATES
+
+
+def validate_templates():
+    """
+    Compile and check every template now instead of when the first prompt is crafted.
+
+    Entry points call this once at startup, so a broken template stops the process before it
+    serves anyone; importing this module still does not load LangChain.
+
+    Raises:
+        ValueError: If a template references missing or unexpected input variables.
+    """
+    _prompt_templates()
+    _fixed_templates()
+
+
+def register_template(document_type, template):
+    """
+    Compile and add (or replace) a document template in the process-wide registry.
+
+    Args:
+        document_type (str): Key of the document type.
+        template (str): Raw template string using the standard input variables.
+    """
+    compiled = compile_templates({document_type: template})
+    with _registry_lock:
+        TEMPLATES[document_type] = template
+        PROMPT_TEMPLATES[document_type] = compiled[document_type]
+
+
+# Numbered section specs inside a template ("1. **Executive Summary**: Briefly summarize ...")
+SECTION_PATTERN = re.compile(r"^\s*(\d+)\.\s+\*\*(.+?)\*\*:\s*(.+?)\s*$", re.MULTILINE)
+# Template lines carrying the input variables rather than instructions
+VARIABLE_LINE_PATTERN = re.compile(r"^(Tone|Query|Language):")
+
+
+def split_template_sections(template):
+    """
+    Split a document template into its introduction, numbered section specs and closing guidance.
+
+    Args:
+        template (str): Raw document template.
+
+    Returns:
+        dict: "intro" (str), "sections" (list of dicts with number, title and instructions)
+        and "guidance" (str, e.g. the **Role** paragraph).
+    """
+    lines = [line.strip() for line in template.strip().splitlines()]
+    sections = [
+        {"number": int(number), "title": title.strip(), "instructions": instructions}
+        for number, title, instructions in SECTION_PATTERN.findall(template)
+    ]
+    guidance = [
+        line for line in lines[1:]
+        if line and not SECTION_PATTERN.match(line) and not VARIABLE_LINE_PATTERN.match(line)
+    ]
+    return {"intro": lines[0].rstrip(":") + ".", "sections": sections, "guidance": "\n".join(guidance)}
+
+
+# Section specs of every document template, split once at startup
+TEMPLATE_SECTIONS = {document_type: split_template_sections(template) for document_type, template in TEMPLATES.items()}
+
+# Short outline pass shared by every section of a sectioned generation
+OUTLINE_TEMPLATE = """{intro}
+Do not write the document yet. Produce a concise outline of at most 10 bullet points that fixes the key facts,
+figures and terminology every section must use consistently. The sections are:
+{section_list}
+
+Tone: {tone}
+Query: {query}
+Language: {language}"""
+
+OUTLINE_INPUT_VARIABLES = ["intro", "section_list", "query", "language", "tone"]
+
+# Generation of a single numbered section, given the shared outline
+SECTION_TEMPLATE = """You are writing one section of a larger document. {intro}
+Outline shared by all sections (stay consistent with it):
+{outline}
+
+Write only this section, starting with the heading "## {number}. {title}":
+{number}. **{title}**: {instructions}
+
+{guidance}
+
+Tone: {tone}
+Query: {query}
+Language: {language}"""
+SECTION_INPUT_VARIABLES = ["intro", "outline", "number", "title", "instructions", "guidance", "query", "language", "tone"]
 
 
 def generate_prompt_template(document_type, tone):
     """
-    Generate a dynamic and optimized prompt template based on document type and tone.
+    Return the precompiled prompt template for a document type.
 
     Args:
         document_type (str): The type of document to generate (e.g., Business Plan, Funding Proposal, etc.).
@@ -12,161 +371,244 @@ def generate_prompt_template(document_type, tone):
     Returns:
         PromptTemplate: A LangChain prompt template for dynamic LLM inputs.
     """
-    # Define tone styles for more nuanced prompt generation
-    tone_styles = {
-        "Formal": "Adopt a formal, highly professional tone with a focus on structure, precision, and clarity.",
-        "Neutral": "Use a neutral tone, ensuring clear and balanced information without emotional bias or excessive detail.",
-        "Casual": "Provide a conversational and approachable tone, using simple language while ensuring clarity.",
-        "Professional": "Emphasize clear, concise, and structured language with a focus on professionalism and detailed insights.",
-        "Friendly": "Adopt a warm, approachable tone that engages readers with simplicity and empathy.",
-        "Inspirational": "Use motivating language to evoke enthusiasm and confidence in the reader.",
-        "Serious": "Maintain a straightforward, serious tone, conveying critical information with emphasis on logic and results."
-    }
+    # Fall back to the business plan template for unknown document types
+    templates = _prompt_templates()
+    return templates.get(document_type.lower(), templates["business_plan"])
 
-    # Document templates with improved structure and effectiveness
-    templates = {
-        "business_plan": """
-            Create a comprehensive business plan with the following sections:
-            1. **Executive Summary**: Briefly summarize the company, its mission, and vision. Include key highlights of the business.
-            2. **Market Analysis**: Analyze the target market, including key trends, customer needs, and competitor landscape.
-            3. **Product/Service Overview**: Describe the product or service, its features, and unique selling points.
-            4. **Marketing and Sales Strategies**: Explain how the business plans to attract customers, sales strategies, and marketing channels.
-            5. **Financial Projections**: Provide projections for revenue, expenses, profit margins, and break-even analysis.
-            6. **Operational Plan**: Outline the daily operations, production methods, and key partnerships.
-
-            **Role**: The business strategist is responsible for ensuring a robust and comprehensive plan with clear data and market insight.
-            Ensure clarity, conciseness, and a logical flow throughout the document.
-
-            Tone: {tone}
-            Query: {query}
-            Language: {language}
-        """,
-        "funding_proposal": """
-            Draft a compelling funding proposal that includes the following sections:
-            1. **Executive Summary**: Provide a high-level overview of the business, including the investment opportunity.
-            2. **Problem Statement and Market Opportunity**: Define the problem your product/service solves and outline the market size and demand.
-            3. **Proposed Solution/Business Case**: Clearly present your solution and why it is the best option available.
-            4. **Funding Requirements and Allocation Plan**: Detail how much funding is needed, how it will be used, and the expected outcomes.
-            5. **Financial Projections and Return on Investment (ROI)**: Project the financial performance and explain how investors will benefit.
-            6. **Risk Assessment and Mitigation Strategies**: Identify potential risks and outline strategies for mitigating them.
-
-            **Role**: The investment analyst should focus on presenting the funding opportunity clearly, using data-driven insights and strategic rationale to address investor concerns.
-
-            Tone: {tone}
-            Query: {query}
-            Language: {language}
-        """,
-        "pitch_deck": """
-            Create a visually compelling and concise pitch deck with the following sections:
-            1. **Introduction and Vision**: Start with a brief introduction and your company’s vision.
-            2. **Problem and Solution**: Explain the problem you're solving and present your solution clearly.
-            3. **Market Opportunity and Competitive Landscape**: Provide insights into the market size, growth, and competitors.
-            4. **Business Model and Revenue Streams**: Define how your company will make money and why your model is sustainable.
-            5. **Financial Projections and Milestones**: Share your financial projections and key business milestones.
-            6. **Ask and Call to Action**: Specify the funding needed and what you are seeking from potential investors.
-
-            **Role**: The presentation designer is responsible for ensuring a visually engaging presentation that resonates with investors.
-
-            Tone: {tone}
-            Query: {query}
-            Language: {language}
-        """,
-        "technical_documentation": """
-            Write a comprehensive technical document that covers the following areas:
-            1. **System Overview and Architecture**: Provide a high-level description of the system architecture, including components and how they interact.
-            2. **Setup and Installation Instructions**: Clearly explain how to set up the system, including dependencies, configuration, and installation steps.
-            3. **Features and Functionalities**: Describe the system’s features and how each one works.
-            4. **API Documentation (if applicable)**: Provide detailed API endpoints, request/response formats, and usage examples.
-            5. **Troubleshooting Guide and FAQs**: List common issues and their solutions, along with frequently asked questions.
-
-            **Role**: The technical writer or engineer should ensure the document is clear, detailed, and accessible for developers and users alike.
-
-            Tone: {tone}
-            Query: {query}
-            Language: {language}
-        """,
-        "project_proposal": """
-            Create a comprehensive project proposal with the following sections:
-            1. **Executive Summary**: Briefly introduce the project and summarize the expected benefits.
-            2. **Project Objectives and Scope**: Clearly outline the project’s goals, objectives, and the scope of work.
-            3. **Methodology and Timeline**: Describe the approach, methodology, and timeline for executing the project.
-            4. **Budget and Resource Requirements**: Specify the resources, budget, and timelines needed for successful project completion.
-            5. **Expected Outcomes and Impact**: Outline the expected outcomes and how they will impact stakeholders and the community.
-
-            **Role**: The project manager or coordinator must ensure the proposal is thorough, with a clear plan for execution, risk management, and alignment to business goals.
-
-            Tone: {tone}
-            Query: {query}
-            Language: {language}
-        """,
-        "investor_materials": """
-            Prepare detailed investor materials that include:
-            1. **Overview of the Investment Opportunity**: Present an overview of the business opportunity, highlighting key value propositions.
-            2. **Market Size and Growth Potential**: Provide a detailed analysis of the market size, trends, and potential for growth.
-            3. **Financial Projections and ROI**: Share financial projections, expected returns, and any relevant financial metrics.
-            4. **Risk Assessment and Mitigation Strategies**: Address potential risks and outline strategies to mitigate them.
-            5. **Key Investment Highlights and Benefits**: Emphasize the key selling points for investors and the benefits they will gain.
-
-            **Role**: The investment consultant or financial analyst must create clear, compelling materials that address investor needs and mitigate concerns.
-
-            Tone: {tone}
-            Query: {query}
-            Language: {language}
-        """,
-        "investment_memorandum": """
-            Write a compelling investment memorandum with the following sections:
-            1. **Business Overview and Vision**: Introduce the company and its vision for the future.
-            2. **Investment Highlights and Unique Selling Proposition (USP)**: Clearly articulate what makes the business unique and why it's a worthwhile investment.
-            3. **Market Opportunity and Competitive Advantage**: Define the market opportunity, how the business stands out, and its competitive advantage.
-            4. **Financial Metrics and Projections**: Provide detailed financial data, growth projections, and key financial indicators.
-            5. **Risk Analysis and Mitigation Plans**: Outline potential risks to the business and how they will be mitigated.
-
-            **Role**: The corporate strategist should focus on creating a convincing, data-driven narrative that positions the company as a viable, high-potential investment.
-
-            Tone: {tone}
-            Query: {query}
-            Language: {language}
-        """,
-        "shareholder_update": """
-            Draft a shareholder update document with the following sections:
-            1. **Business Performance Overview**: Summarize the company’s performance since the last update, including key metrics.
-            2. **Key Achievements and Milestones**: Highlight significant achievements and progress toward goals.
-            3. **Financial Performance and Key Metrics**: Provide financial data such as revenue, expenses, and profit margins.
-            4. **Upcoming Goals and Future Plans**: Outline the company’s plans and goals for the upcoming quarter/year.
-            5. **Risk Assessment and Challenges**: Identify any challenges or risks the company is facing and how they will be addressed.
-
-            **Role**: The executive or communication officer must ensure transparency and keep shareholders informed about the company’s performance and outlook.
-
-            Tone: {tone}
-            Query: {query}
-            Language: {language}
-        """,
-    }
 
-    # Fallback to neutral tone style if the specified tone is not found
-    tone_style = tone_styles.get(tone, tone_styles["Neutral"])
+def craft_prompt(query, document_type, language, tone):
+    """
+    Craft a prompt for the Gemini LLM using LangChain.
+
+    Args:
+        query (str): The user's input or topic.
+        document_type (str): The type of document (e.g., Business Plan, Funding Proposal).
+        language (str): Language for the response.
+        tone (str): The tone of the response (e.g., Formal, Casual).
+
+    Returns:
+        Prompt: The crafted prompt, with its token count and the output token limit of the document type.
+    """
+    with metrics.span("craft_prompt", document_type=document_type):
+        prompt_template = generate_prompt_template(document_type, tone)
+        template = prompt_template.template
+        return Prompt(
+            prompt_template.format(query=query, language=language, tone=tone),
+            document_type=document_type,
+            max_output_tokens=max_output_tokens(document_type),
+            # Everything up to the line holding the first input variable is the same for every request
+            static_length=template.rfind("\n", 0, template.find("{")) + 1,
+        )
+
 
-    # Fetch the template based on document type
-    template = templates.get(document_type.lower(), templates["business_plan"])
+# Function to look up the output token limit of a document type
+def max_output_tokens(document_type):
+    # Unknown document types use the business plan limit, like their template
+    return MAX_OUTPUT_TOKENS.get(document_type.lower(), MAX_OUTPUT_TOKENS["business_plan"])
 
-    return PromptTemplate(
-        input_variables=["query", "language", "tone"],
-        template=template.strip()
+
+def get_template_sections(document_type):
+    """
+    Return the precomputed section specs for a document type.
+
+    Args:
+        document_type (str): The type of document (e.g., business_plan).
+
+    Returns:
+        dict: Intro, section specs and guidance (see `split_template_sections`).
+    """
+    # Fall back to the business plan template for unknown document types, like generate_prompt_template
+    return TEMPLATE_SECTIONS.get(document_type.lower(), TEMPLATE_SECTIONS["business_plan"])
+
+
+def craft_outline_prompt(query, document_type, language, tone):
+    """
+    Craft the outline prompt that precedes sectioned generation.
+
+    Args:
+        query (str): The user's input or topic.
+        document_type (str): The type of document (e.g., business_plan).
+        language (str): Language for the response.
+        tone (str): The tone of the response (e.g., Formal, Casual).
+
+    Returns:
+        Prompt: The crafted outline prompt, capped at OUTLINE_MAX_OUTPUT_TOKENS output tokens.
+    """
+    spec = get_template_sections(document_type)
+    section_list = "\n".join(f"{section['number']}. {section['title']}" for section in spec["sections"])
+    return Prompt(
+        _fixed_templates()["outline"].format(
+            intro=spec["intro"], section_list=section_list, query=query, language=language, tone=tone
+        ),
+        document_type=document_type,
+        max_output_tokens=min(OUTLINE_MAX_OUTPUT_TOKENS, max_output_tokens(document_type)),
     )
 
 
-def craft_prompt(query, document_type, language, tone):
+def craft_section_prompt(query, document_type, section, outline, language, tone):
     """
-    Craft a prompt for the Gemini LLM using LangChain.
+    Craft the prompt generating one numbered section of a document.
 
     Args:
         query (str): The user's input or topic.
-        document_type (str): The type of document (e.g., Business Plan, Funding Proposal).
+        document_type (str): The type of document (e.g., business_plan).
+        section (dict): Section spec from `get_template_sections`.
+        outline (str): Outline shared by all sections of the document.
         language (str): Language for the response.
         tone (str): The tone of the response (e.g., Formal, Casual).
 
     Returns:
-        str: The crafted prompt.
+        Prompt: The crafted section prompt, capped at SECTION_MAX_OUTPUT_TOKENS output tokens.
+    """
+    spec = get_template_sections(document_type)
+    return Prompt(
+        _fixed_templates()["section"].format(
+            intro=spec["intro"],
+            outline=outline,
+            number=section["number"],
+            title=section["title"],
+            instructions=section["instructions"],
+            guidance=spec["guidance"],
+            query=query,
+            language=language,
+            tone=tone,
+        ),
+        document_type=document_type,
+        max_output_tokens=min(SECTION_MAX_OUTPUT_TOKENS, max_output_tokens(document_type)),
+    )
+
+
+# Inputs identifying the business or project; every section consumes them
+SHARED_INPUTS = ["business_name", "startup_domain", "project_name", "doc_title"]
+
+# Which template sections consume each form input (see `fields` in app.py), by document type.
+# Inputs missing from a document type's map are treated as shared.
+FIELD_SECTIONS = {
+    "business_plan": {
+        "target_market": [1, 2, 4],
+        "competitors": [2, 3],
+        "market_trends": [2],
+        "revenue_model": [1, 4, 5],
+        "cost_structure": [5, 6],
+        "funding_needed": [1, 5],
+    },
+    "funding_proposal": {
+        "investment_opportunity": [1, 2, 3],
+        "capital_needed": [1, 4, 5],
+        "revenue_projections": [5, 6],
+    },
+    "pitch_deck": {
+        "business_idea": [1, 2, 4],
+        "team_vision": [1, 6],
+        "market_opportunity": [3, 5],
+    },
+    "investor_materials": {
+        "investment_opportunity": [1, 2, 5],
+        "team_background": [1, 4, 5],
+        "financial_forecast": [3, 5],
+    },
+    "technical_documentation": {
+        "key_features": [1, 3],
+        "use_cases": [3, 5],
+        "technical_specs": [1, 2, 4, 5],
+    },
+    "project_proposal": {
+        "project_description": [1, 2, 3],
+        "goals": [1, 2, 5],
+        "timeline": [3, 4],
+        "target_market": [1, 5],
+        "competitors": [5],
+        "market_trends": [5],
+        "capital_needed": [4],
+    },
+    "investment_memorandum": {
+        "investment_highlights": [1, 2, 4],
+        "market_opportunity": [3],
+        "risk_analysis": [5],
+    },
+    "shareholder_update": {
+        "progress_overview": [1, 3],
+        "achievements": [1, 2],
+        "upcoming_goals": [4],
+        "challenges": [5],
+    },
+}
+
+
+def section_inputs(document_type, number, user_inputs):
+    """
+    Select the inputs a template section consumes, so it can be regenerated only when they change.
+
+    Args:
+        document_type (str): The type of document (e.g., business_plan).
+        number (int): Section number (the outline consumes every input instead).
+        user_inputs (dict): Mapping of input keys to user-provided values.
+
+    Returns:
+        dict: The subset of `user_inputs` the section depends on, in form order.
+    """
+    field_sections = FIELD_SECTIONS.get(document_type.lower(), FIELD_SECTIONS["business_plan"])
+    return {
+        key: value for key, value in user_inputs.items()
+        if key in SHARED_INPUTS or key not in field_sections or number in field_sections[key]
+    }
+
+
+def compact_field(value, token_budget=FIELD_TOKEN_BUDGET, summarize=None):
+    """
+    Normalize the whitespace of a form input and fit it into a token budget.
+
+    Args:
+        value: The user-provided value.
+        token_budget (int, optional): Maximum estimated tokens for the value.
+        summarize (callable, optional): Called as summarize(text, token_budget) for oversized values;
+            defaults to `backend.gemini.summarize_field` with STARTUPDOC_SUMMARIZE_FIELDS=1, otherwise
+            they are truncated at a word boundary.
+
+    Returns:
+        str: The compacted value.
+    """
+    lines = [" ".join(line.split()) for line in str(value).strip().splitlines()]
+    text = re.sub(r"\n{3,}", "\n\n", "\n".join(lines))
+    if estimate_tokens(text) <= token_budget:
+        return text
+    if summarize is None and SUMMARIZE_FIELDS:
+        # Imported on use: the model client is only loaded once a request needs it
+        from backend.gemini import summarize_field as summarize
+    if summarize is not None:
+        return summarize(text, token_budget)
+    return text[:token_budget * 4].rsplit(" ", 1)[0] + " [...]"
+
+
+def build_context(user_inputs, field_token_budget=FIELD_TOKEN_BUDGET, summarize=None):
+    """
+    Turn the collected form inputs into the context block sent ahead of the prompt.
+
+    Args:
+        user_inputs (dict): Mapping of input keys (e.g. business_name) to user-provided values.
+        field_token_budget (int, optional): Maximum estimated tokens per input (see `compact_field`).
+        summarize (callable, optional): Summarizer for oversized inputs (see `compact_field`).
+
+    Returns:
+        str: One "Key Name: value" line per input.
+    """
+    return "\n".join([
+        f"{key.replace('_', ' ').title()}: {compact_field(value, field_token_budget, summarize)}"
+        for key, value in user_inputs.items()
+    ])
+
+
+def input_subject(user_inputs):
+    """
+    Return the name of the business or project the inputs describe.
+
+    Args:
+        user_inputs (dict): Mapping of input keys to user-provided values.
+
+    Returns:
+        str: The business name, project name or documentation title, or None if none was given.
     """
-    prompt_template = generate_prompt_template(document_type, tone)
-    return prompt_template.format(query=query, language=language, tone=tone)
+    for key in ("business_name", "project_name", "doc_title"):
+        if user_inputs.get(key):
+            return user_inputs[key]
+    return None
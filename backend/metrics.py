@@ -0,0 +1,293 @@
+import logging
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# Window of recent samples used for live percentiles and throughput, and samples kept per series
+METRICS_WINDOW_SECONDS = int(os.environ.get("STARTUPDOC_METRICS_WINDOW", 300))
+METRICS_MAX_SAMPLES = int(os.environ.get("STARTUPDOC_METRICS_MAX_SAMPLES", 4096))
+# Port of the Prometheus endpoint started by the app (unset or 0 keeps it off)
+METRICS_PORT = int(os.environ.get("STARTUPDOC_METRICS_PORT", 0))
+# Upper bounds (seconds) of the exported latency histogram buckets
+LATENCY_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+METRIC_PREFIX = "startupdoc"
+
+
+class _Series:
+    def __init__(self, max_samples):
+        # Recent (timestamp, seconds, error) samples, plus cumulative totals for the exporter
+        self.samples = deque(maxlen=max_samples)
+        self.buckets = [0] * len(LATENCY_BUCKETS)
+        self.count = 0
+        self.errors = 0
+        self.sum = 0.0
+
+    def add(self, seconds, error):
+        self.samples.append((time.time(), seconds, error))
+        self.count += 1
+        self.errors += error
+        self.sum += seconds
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if seconds <= bound:
+                self.buckets[i] += 1
+
+
+def _percentile(values, pct):
+    # Nearest-rank percentile of sorted values
+    return values[min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))]
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(labels):
+    return ",".join(f'{key}="{_escape(value)}"' for key, value in labels)
+
+
+class Metrics:
+    """
+    In-process spans and metrics for the generation hot path.
+
+    Spans record their duration and outcome per name and labels (e.g. document type and model), as
+    recent samples for live p50/p95 and throughput and as cumulative histograms for Prometheus.
+    When OpenTelemetry is installed, every span is also emitted through its global tracer, so any
+    configured OpenTelemetry exporter receives them.
+    """
+
+    def __init__(self, window=METRICS_WINDOW_SECONDS, max_samples=METRICS_MAX_SAMPLES):
+        self.window = window
+        self.max_samples = max_samples
+        self._series = {}
+        self._counters = {}
+        self._collectors = []
+        self._lock = threading.Lock()
+        self._tracer = None
+
+    def observe(self, name, seconds, error=False, **labels):
+        """
+        Record one timed operation.
+
+        Args:
+            name (str): Operation name (e.g. "model_call").
+            seconds (float): Its duration.
+            error (bool, optional): Whether it failed.
+            **labels: Label values, e.g. document_type and model.
+        """
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = _Series(self.max_samples)
+            series.add(seconds, bool(error))
+
+    def count(self, name, value=1, **labels):
+        """
+        Add to a counter (e.g. tokens or cache hits).
+
+        Args:
+            name (str): Counter name.
+            value (float, optional): Amount to add.
+            **labels: Label values.
+        """
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def _otel_tracer(self):
+        if self._tracer is None:
+            try:
+                from opentelemetry import trace
+
+                self._tracer = trace.get_tracer("startupdoc")
+            except ImportError:
+                self._tracer = False
+        return self._tracer
+
+    @contextmanager
+    def span(self, name, **labels):
+        """
+        Time a block of code as an operation.
+
+        Numeric attributes set on the yielded dict (e.g. attributes["output_tokens"] = 512) are added
+        to the counters "<name>_<attribute>" with the same labels.
+
+        Args:
+            name (str): Operation name.
+            **labels: Label values.
+
+        Yields:
+            dict: Attributes of the span.
+        """
+        attributes = {}
+        tracer = self._otel_tracer()
+        otel_span = tracer.start_as_current_span(name, attributes=labels) if tracer else None
+        start = time.perf_counter()
+        error = False
+        try:
+            if otel_span is None:
+                yield attributes
+            else:
+                with otel_span as current:
+                    yield attributes
+                    current.set_attributes({key: value for key, value in attributes.items()})
+        except Exception:
+            error = True
+            raise
+        finally:
+            self.observe(name, time.perf_counter() - start, error=error, **labels)
+            for key, value in attributes.items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    self.count(f"{name}_{key}", value, **labels)
+
+    def register_collector(self, collect):
+        """
+        Export the values returned by a stats function (e.g. cache counters) as gauges.
+
+        Args:
+            collect (callable): Returns a dict of metric names to numbers.
+        """
+        with self._lock:
+            self._collectors.append(collect)
+
+    def summary(self, window=None):
+        """
+        Summarize the recent samples of every operation.
+
+        Args:
+            window (float, optional): Seconds to look back (defaults to the metrics window).
+
+        Returns:
+            list: Dicts with name, labels (dict), requests, errors, p50 and p95 (seconds, None
+            without samples) and throughput (requests per minute), sorted by name and labels.
+        """
+        window = window or self.window
+        since = time.time() - window
+        with self._lock:
+            series = [(key, list(series.samples)) for key, series in self._series.items()]
+        rows = []
+        for (name, labels), samples in sorted(series):
+            recent = [(seconds, error) for timestamp, seconds, error in samples if timestamp >= since]
+            durations = sorted(seconds for seconds, _ in recent)
+            rows.append({
+                "name": name,
+                "labels": dict(labels),
+                "requests": len(recent),
+                "errors": sum(error for _, error in recent),
+                "p50": _percentile(durations, 50) if durations else None,
+                "p95": _percentile(durations, 95) if durations else None,
+                "throughput": len(recent) * 60 / window,
+            })
+        return rows
+
+    def counters(self):
+        """
+        Return the counters.
+
+        Returns:
+            list: (name, labels dict, value) tuples.
+        """
+        with self._lock:
+            return [(name, dict(labels), value) for (name, labels), value in sorted(self._counters.items())]
+
+    def prometheus(self):
+        """
+        Render every metric in the Prometheus text exposition format.
+
+        Returns:
+            str: The exposition text.
+        """
+        with self._lock:
+            series = sorted(
+                (key, list(s.buckets), s.count, s.errors, s.sum) for key, s in self._series.items()
+            )
+            counters = sorted(self._counters.items())
+            collectors = list(self._collectors)
+
+        duration = f"{METRIC_PREFIX}_span_duration_seconds"
+        errors = f"{METRIC_PREFIX}_span_errors_total"
+        lines = [f"# HELP {duration} Duration of instrumented operations.", f"# TYPE {duration} histogram"]
+        for (name, labels), buckets, count, _, total in series:
+            labels = (("span", name),) + labels
+            for bound, bucket_count in zip(LATENCY_BUCKETS, buckets):
+                lines.append(f'{duration}_bucket{{{_labels(labels + (("le", bound),))}}} {bucket_count}')
+            lines.append(f'{duration}_bucket{{{_labels(labels + (("le", "+Inf"),))}}} {count}')
+            lines.append(f"{duration}_sum{{{_labels(labels)}}} {total}")
+            lines.append(f"{duration}_count{{{_labels(labels)}}} {count}")
+        lines += [f"# HELP {errors} Failed instrumented operations.", f"# TYPE {errors} counter"]
+        for (name, labels), _, _, error_count, _ in series:
+            lines.append(f"{errors}{{{_labels((('span', name),) + labels)}}} {error_count}")
+
+        declared = set()
+        for (name, labels), value in counters:
+            metric = f"{METRIC_PREFIX}_{name}_total"
+            if metric not in declared:
+                declared.add(metric)
+                lines.append(f"# TYPE {metric} counter")
+            lines.append(f"{metric}{{{_labels(labels)}}} {value}")
+        for collect in collectors:
+            try:
+                values = collect()
+            except Exception:  # A failing collector must not break the endpoint
+                logger.warning("Metrics collector failed", exc_info=True)
+                continue
+            for name, value in sorted(values.items()):
+                if isinstance(value, (int, float)):
+                    lines += [f"# TYPE {METRIC_PREFIX}_{name} gauge", f"{METRIC_PREFIX}_{name} {value}"]
+        return "\n".join(lines) + "\n"
+
+
+_server = None
+_server_lock = threading.Lock()
+
+
+# Function to serve the metrics to Prometheus from a background thread
+def start_metrics_server(port=METRICS_PORT, host="0.0.0.0"):
+    """
+    Serve GET /metrics on a background thread, once per process.
+
+    Args:
+        port (int, optional): Port to listen on; 0 or None leaves the endpoint off.
+        host (str, optional): Interface to listen on.
+
+    Returns:
+        bool: Whether the endpoint is running.
+    """
+    global _server
+    if not port:
+        return False
+    # http.server is only imported here, so processes without the endpoint do not pay for it
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class PrometheusHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = metrics.prometheus().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):  # Scrapes are not worth a log line each
+            pass
+
+    with _server_lock:
+        if _server is None:
+            try:
+                _server = ThreadingHTTPServer((host, port), PrometheusHandler)
+            except OSError:  # E.g. another worker process already serves the port
+                logger.warning("Could not serve metrics on port %s", port, exc_info=True)
+                return False
+            threading.Thread(target=_server.serve_forever, name="startupdoc-metrics", daemon=True).start()
+    return True
+
+
+# Process-wide metrics shared by every session and request
+metrics = Metrics()
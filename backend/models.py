@@ -0,0 +1,417 @@
+import abc
+import asyncio
+import datetime
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+import uuid
+
+
+# Which model backend serves requests: "gemini" (default) or "stub" for offline load tests and benchmarks
+BACKEND = os.environ.get("STARTUPDOC_BACKEND", "gemini")
+
+# Stable model versions context caches are created for: caching needs an explicit version, not a
+# "-latest" alias (models missing here are cached under their own name)
+GEMINI_CACHE_MODELS = {
+    "gemini-1.5-pro-latest": "models/gemini-1.5-pro-002",
+    "gemini-1.5-flash-latest": "models/gemini-1.5-flash-002",
+}
+
+# Stub backend behaviour
+STUB_FIRST_TOKEN_SECONDS = float(os.environ.get("STARTUPDOC_STUB_FIRST_TOKEN_SECONDS", 0.5))
+STUB_TOKENS_PER_SECOND = float(os.environ.get("STARTUPDOC_STUB_TOKENS_PER_SECOND", 200))
+STUB_OUTPUT_TOKENS = int(os.environ.get("STARTUPDOC_STUB_OUTPUT_TOKENS", 800))
+# Input processing speed (uncached input tokens delay the first token) and smallest cacheable prefix
+STUB_PREFILL_TOKENS_PER_SECOND = float(os.environ.get("STARTUPDOC_STUB_PREFILL_TOKENS_PER_SECOND", 20000))
+STUB_MIN_CACHE_TOKENS = int(os.environ.get("STARTUPDOC_STUB_MIN_CACHE_TOKENS", 1024))
+# Per-model overrides of the stub behaviour (StubBackend arguments), e.g. a slow or failing model:
+# {"gemini-1.5-pro-latest": {"first_token_seconds": 2, "failure_rate": 0.2}}
+STUB_MODELS = json.loads(os.environ.get("STARTUPDOC_STUB_MODELS") or "{}")
+
+# Numbered section titles requested by a prompt ("1. **Executive Summary**: ...")
+PROMPT_SECTION_PATTERN = re.compile(r"^\s*\d+\.\s+\*\*(.+?)\*\*", re.MULTILINE)
+
+# Filler vocabulary for synthetic output
+STUB_WORDS = (
+    "market growth revenue customers strategy investors product team traction funding pricing "
+    "competition roadmap margin scalable retention channel milestone partnership forecast"
+).split()
+
+
+def _prompt_text(contents):
+    # Multimodal requests are [text, image]; only the text matters outside Gemini
+    return contents if isinstance(contents, str) else contents[0]
+
+
+class ModelBackend(abc.ABC):
+    """
+    Interface shared by every model backend.
+
+    Backends accept `contents` (a prompt string, or [prompt, image] for multimodal requests) and
+    return dicts with "content", "prompt_tokens", "output_tokens" and "cached_tokens". Backends
+    supporting explicit context caching implement `ContextCachingBackend`.
+    """
+
+    # Identifies the backend and model in cache keys and metrics
+    name = "backend"
+    # Exceptions worth retrying with backoff
+    retryable_errors = ()
+
+    @abc.abstractmethod
+    def generate(self, contents, cache=None):
+        """
+        Generate a complete response.
+
+        Args:
+            contents (str | list): The prompt, or [prompt, image].
+            cache (optional): Handle of a cached prompt prefix that `contents` continues.
+
+        Returns:
+            dict: "content" (str), "prompt_tokens" (int, cached tokens included), "output_tokens" (int)
+            and "cached_tokens" (int).
+        """
+
+    async def generate_async(self, contents, cache=None):
+        """
+        Generate a complete response without blocking the event loop.
+
+        Args:
+            contents (str | list): The prompt, or [prompt, image].
+            cache (optional): Handle of a cached prompt prefix that `contents` continues.
+
+        Returns:
+            dict: Same as `generate`.
+        """
+        return await asyncio.to_thread(self.generate, contents, cache)
+
+    @abc.abstractmethod
+    def stream(self, contents, cache=None):
+        """
+        Start a streamed response. The request is sent before this returns, so errors raised while
+        starting the request can be retried by the caller.
+
+        Args:
+            contents (str | list): The prompt, or [prompt, image].
+            cache (optional): Handle of a cached prompt prefix that `contents` continues.
+
+        Returns:
+            Iterator[str]: Text chunks as they are produced.
+        """
+
+
+class ContextCachingBackend(ModelBackend):
+    """
+    Interface of the model backends supporting explicit context caching.
+
+    They upload a prompt prefix once (`create_cache`) and accept its handle as `cache`; `contents`
+    then only holds the rest of the prompt. Callers check `isinstance(backend, ContextCachingBackend)`
+    before using a cache.
+    """
+
+    # Smallest prefix the backend accepts for caching, in tokens
+    min_cache_tokens = 0
+
+    @abc.abstractmethod
+    def create_cache(self, prefix, ttl_seconds):
+        """
+        Upload a prompt prefix so later requests can reference it instead of resending it.
+
+        Args:
+            prefix (str): The prompt prefix.
+            ttl_seconds (int): Lifetime of the cached prefix.
+
+        Returns:
+            The cache handle to pass as `cache`.
+        """
+
+    @abc.abstractmethod
+    def update_cache(self, cache, ttl_seconds):
+        """
+        Extend the lifetime of a cached prefix.
+
+        Args:
+            cache: Handle returned by `create_cache`.
+            ttl_seconds (int): New lifetime, from now.
+        """
+
+    @abc.abstractmethod
+    def delete_cache(self, cache):
+        """
+        Delete a cached prefix before it expires.
+
+        Args:
+            cache: Handle returned by `create_cache`.
+        """
+
+
+class GeminiBackend(ContextCachingBackend):
+    """
+    Google Gemini models via `google.generativeai`.
+
+    Cache handles are `google.generativeai.caching.CachedContent` objects.
+    """
+
+    _configure_lock = threading.Lock()
+    _configured = False
+    # Smallest input the Gemini 1.5 models accept for explicit caching
+    min_cache_tokens = 32768
+
+    def __init__(self, model_name, generation_config=None):
+        import google.generativeai as genai
+        from google.api_core.exceptions import (
+            DeadlineExceeded,
+            InternalServerError,
+            ResourceExhausted,
+            ServiceUnavailable,
+        )
+
+        self._configure(genai)
+        self._genai = genai
+        self.name = model_name
+        self.retryable_errors = (ResourceExhausted, ServiceUnavailable, InternalServerError, DeadlineExceeded)
+        self._generation_config = generation_config or {}
+        self._model = genai.GenerativeModel(model_name, generation_config=self._generation_config)
+
+    @classmethod
+    def _configure(cls, genai):
+        # Read the API key on first use rather than at import, so importing the backend needs no secrets
+        with cls._configure_lock:
+            if cls._configured:
+                return
+            gemini_key = os.environ.get("GOOGLE_API_KEY")
+            if not gemini_key:
+                import streamlit as st
+
+                gemini_key = st.secrets["api_keys"]["gemini"]
+                os.environ["GOOGLE_API_KEY"] = gemini_key
+            genai.configure(api_key=gemini_key)
+            cls._configured = True
+
+    @staticmethod
+    def _parse(response):
+        if not (hasattr(response, 'candidates') and response.candidates):
+            raise ValueError("Unexpected response format from Gemini API.")
+        usage = getattr(response, 'usage_metadata', None)
+        return {
+            "content": ' '.join(part.text for part in response.candidates[0].content.parts),
+            "prompt_tokens": getattr(usage, 'prompt_token_count', 0) or 0,
+            "output_tokens": getattr(usage, 'candidates_token_count', 0) or 0,
+            "cached_tokens": getattr(usage, 'cached_content_token_count', 0) or 0,
+        }
+
+    def _model_for(self, cache):
+        if cache is None:
+            return self._model
+        # Passing the CachedContent object (not its name) avoids a lookup request per call
+        return self._genai.GenerativeModel.from_cached_content(cache, generation_config=self._generation_config)
+
+    def generate(self, contents, cache=None):
+        return self._parse(self._model_for(cache).generate_content(contents))
+
+    async def generate_async(self, contents, cache=None):
+        return self._parse(await self._model_for(cache).generate_content_async(contents))
+
+    def stream(self, contents, cache=None):
+        response = self._model_for(cache).generate_content(contents, stream=True)
+        # Chunks without candidates (e.g. trailing metadata) carry no text
+        return (
+            ''.join(part.text for part in chunk.candidates[0].content.parts)
+            for chunk in response
+            if hasattr(chunk, 'candidates') and chunk.candidates
+        )
+
+    def create_cache(self, prefix, ttl_seconds):
+        return self._genai.caching.CachedContent.create(
+            model=GEMINI_CACHE_MODELS.get(self.name, self.name),
+            contents=[prefix],
+            ttl=datetime.timedelta(seconds=ttl_seconds),
+        )
+
+    def update_cache(self, cache, ttl_seconds):
+        cache.update(ttl=datetime.timedelta(seconds=ttl_seconds))
+
+    def delete_cache(self, cache):
+        cache.delete()
+
+
+class StubBackend(ContextCachingBackend):
+    """
+    Local, deterministic stand-in for a model, for load tests and benchmarks without API calls.
+
+    Output is synthetic markdown with one heading per numbered section requested by the prompt,
+    seeded by the prompt so identical prompts produce identical documents. Latency is modelled as
+    a fixed time to first token (plus `slow_seconds` for a `slow_rate` share of calls, to emulate
+    tail latency), plus input processing for uncached input tokens, plus a constant output token
+    rate. Context caching is emulated locally: cached prefixes skip input processing.
+    """
+
+    # Emulated cached prefixes, shared by every instance like a server-side cache: handle -> (prefix, expiry time)
+    _caches = {}
+    _caches_lock = threading.Lock()
+
+    def __init__(self, model_name="stub", first_token_seconds=STUB_FIRST_TOKEN_SECONDS,
+                 tokens_per_second=STUB_TOKENS_PER_SECOND, output_tokens=STUB_OUTPUT_TOKENS,
+                 failure_rate=0.0, error=RuntimeError, prefill_tokens_per_second=STUB_PREFILL_TOKENS_PER_SECOND,
+                 min_cache_tokens=STUB_MIN_CACHE_TOKENS, slow_rate=0.0, slow_seconds=0.0):
+        self.name = f"stub:{model_name}"
+        self.first_token_seconds = first_token_seconds
+        self.tokens_per_second = tokens_per_second
+        self.output_tokens = output_tokens
+        self.failure_rate = failure_rate
+        self.error = error
+        self.retryable_errors = (error,) if failure_rate else ()
+        self.prefill_tokens_per_second = prefill_tokens_per_second
+        self.min_cache_tokens = min_cache_tokens
+        self.slow_rate = slow_rate
+        self.slow_seconds = slow_seconds
+
+    def _maybe_fail(self):
+        # Failures are random per call (not per prompt) so retries can succeed
+        if self.failure_rate and random.random() < self.failure_rate:
+            raise self.error(f"{self.name} simulated failure")
+
+    def _chunks(self, prompt):
+        # Deterministic synthetic document, one chunk of about 20 tokens at a time
+        rng = random.Random(hashlib.sha256(prompt.encode()).digest())
+        titles = PROMPT_SECTION_PATTERN.findall(prompt) or ["Overview"]
+        tokens_per_section = max(1, self.output_tokens // len(titles))
+        for number, title in enumerate(titles, start=1):
+            yield f"## {number}. {title}\n\n"
+            for start in range(0, tokens_per_section, 20):
+                count = min(20, tokens_per_section - start)
+                yield " ".join(rng.choice(STUB_WORDS) for _ in range(count)) + " "
+            yield "\n\n"
+
+    def _first_token_delay(self):
+        # Slow calls are random per call, like failures
+        if self.slow_rate and random.random() < self.slow_rate:
+            return self.first_token_seconds + self.slow_seconds
+        return self.first_token_seconds
+
+    def _delay(self, tokens):
+        return tokens / self.tokens_per_second if self.tokens_per_second else 0.0
+
+    def _prefill(self, tokens):
+        return tokens / self.prefill_tokens_per_second if self.prefill_tokens_per_second else 0.0
+
+    def _resolve(self, contents, cache):
+        # Returns the full prompt and the number of its tokens served from the cache
+        prompt = _prompt_text(contents)
+        if cache is None:
+            return prompt, 0
+        with self._caches_lock:
+            prefix, expires = self._caches.get(cache, (None, 0.0))
+        if prefix is None or expires < time.time():
+            raise LookupError(f"{self.name} cached content {cache} not found")
+        return prefix + prompt, len(prefix) // 4
+
+    def _response(self, prompt, cached_tokens):
+        return {
+            "content": "".join(self._chunks(prompt)),
+            "prompt_tokens": len(prompt) // 4,
+            "output_tokens": self.output_tokens,
+            "cached_tokens": cached_tokens,
+        }
+
+    def generate(self, contents, cache=None):
+        prompt, cached_tokens = self._resolve(contents, cache)
+        self._maybe_fail()
+        time.sleep(
+            self._first_token_delay() + self._prefill(len(prompt) // 4 - cached_tokens) + self._delay(self.output_tokens)
+        )
+        return self._response(prompt, cached_tokens)
+
+    async def generate_async(self, contents, cache=None):
+        prompt, cached_tokens = self._resolve(contents, cache)
+        self._maybe_fail()
+        await asyncio.sleep(
+            self._first_token_delay() + self._prefill(len(prompt) // 4 - cached_tokens) + self._delay(self.output_tokens)
+        )
+        return self._response(prompt, cached_tokens)
+
+    def stream(self, contents, cache=None):
+        prompt, cached_tokens = self._resolve(contents, cache)
+        self._maybe_fail()
+        chunks = self._chunks(prompt)
+        time.sleep(self._first_token_delay() + self._prefill(len(prompt) // 4 - cached_tokens))
+        return self._paced(chunks)
+
+    def create_cache(self, prefix, ttl_seconds):
+        # Uploading a prefix costs one pass of input processing
+        time.sleep(self._prefill(len(prefix) // 4))
+        handle = f"cachedContents/{uuid.uuid4().hex}"
+        with self._caches_lock:
+            self._caches[handle] = (prefix, time.time() + ttl_seconds)
+        return handle
+
+    def update_cache(self, cache, ttl_seconds):
+        with self._caches_lock:
+            if cache not in self._caches:
+                raise LookupError(f"{self.name} cached content {cache} not found")
+            self._caches[cache] = (self._caches[cache][0], time.time() + ttl_seconds)
+
+    def delete_cache(self, cache):
+        with self._caches_lock:
+            self._caches.pop(cache, None)
+
+    def _paced(self, chunks):
+        for chunk in chunks:
+            time.sleep(self._delay(len(chunk.split())))
+            yield chunk
+
+
+# Backends shared by every session, keyed by backend kind, model name and generation config
+_backend_pool = {}
+_backend_pool_lock = threading.Lock()
+
+
+def get_backend(model_name, generation_config=None, kind=None):
+    """
+    Return a pooled model backend, creating it on first use.
+
+    Args:
+        model_name (str): Name of the model.
+        generation_config (dict, optional): Generation settings for the model.
+        kind (str, optional): "gemini" or "stub"; defaults to the STARTUPDOC_BACKEND setting.
+
+    Returns:
+        ModelBackend: The shared backend for this kind, model and config.
+    """
+    kind = kind or BACKEND
+    key = (kind, model_name, json.dumps(generation_config or {}, sort_keys=True))
+    backend = _backend_pool.get(key)
+    if backend is None:
+        with _backend_pool_lock:
+            backend = _backend_pool.get(key)
+            if backend is None:
+                if kind == "gemini":
+                    backend = GeminiBackend(model_name, generation_config)
+                elif kind == "stub":
+                    # The stub honours output token limits like the real model
+                    max_output_tokens = (generation_config or {}).get("max_output_tokens", STUB_OUTPUT_TOKENS)
+                    settings = {"output_tokens": STUB_OUTPUT_TOKENS, **STUB_MODELS.get(model_name, {})}
+                    settings["output_tokens"] = min(settings["output_tokens"], max_output_tokens)
+                    backend = StubBackend(model_name, **settings)
+                else:
+                    raise ValueError(f"Unknown model backend: {kind}")
+                _backend_pool[key] = backend
+    return backend
+
+
+def register_backend(backend, model_name, generation_config=None, kind=None):
+    """
+    Install a custom backend instance (e.g. a stub with specific latency) for a model.
+
+    Args:
+        backend (ModelBackend): The backend to use.
+        model_name (str): Name of the model it serves.
+        generation_config (dict, optional): Generation settings it serves.
+        kind (str, optional): Backend kind it replaces; defaults to the STARTUPDOC_BACKEND setting.
+    """
+    key = (kind or BACKEND, model_name, json.dumps(generation_config or {}, sort_keys=True))
+    with _backend_pool_lock:
+        _backend_pool[key] = backend
@@ -0,0 +1,229 @@
+import os
+import random
+import threading
+import time
+
+
+# Client-side quotas shared by every session in the process
+REQUESTS_PER_MINUTE = int(os.environ.get("STARTUPDOC_REQUESTS_PER_MINUTE", 60))
+TOKENS_PER_MINUTE = int(os.environ.get("STARTUPDOC_TOKENS_PER_MINUTE", 1_000_000))
+
+# Retry policy for transient API errors
+MAX_ATTEMPTS = int(os.environ.get("STARTUPDOC_MAX_ATTEMPTS", 4))
+BASE_RETRY_DELAY_SECONDS = 1.0
+MAX_RETRY_DELAY_SECONDS = 30.0
+
+
+def estimate_tokens(text):
+    """
+    Cheaply estimate the number of tokens in a text (about four characters per token).
+
+    Args:
+        text (str): Text sent to the model.
+
+    Returns:
+        int: Estimated token count, at least 1.
+    """
+    return max(1, len(text) // 4)
+
+
+class TokenBucket:
+    """
+    Token bucket refilled continuously at a per-minute rate.
+
+    Callers reserve capacity up front and sleep off any shortfall, so waiting callers are
+    served in arrival order. With a shared state (see backend.state), the bucket is shared by every
+    worker process using the same key.
+    """
+
+    def __init__(self, per_minute, capacity=None, state=None, key=None):
+        self.rate = per_minute / 60.0
+        self.capacity = capacity or per_minute
+        self.state = state
+        self.key = key
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, amount=1):
+        """
+        Take `amount` tokens from the bucket, going into debt if necessary.
+
+        Args:
+            amount (int, optional): Tokens to take; capped at the bucket capacity.
+
+        Returns:
+            float: Seconds the caller must wait before using the reservation.
+        """
+        if self.state is not None:
+            return self.state.take_tokens(self.key, amount, self.rate, self.capacity)
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= min(amount, self.capacity)
+            return max(0.0, -self._tokens / self.rate)
+
+
+class RateLimiter:
+    """
+    Combined requests-per-minute and tokens-per-minute limiter.
+
+    Given a shared state, the quotas hold across every worker process using it, rather than per process.
+    """
+
+    def __init__(self, requests_per_minute=REQUESTS_PER_MINUTE, tokens_per_minute=TOKENS_PER_MINUTE, state=None):
+        self.requests = TokenBucket(requests_per_minute, state=state, key="ratelimit:requests")
+        self.tokens = TokenBucket(tokens_per_minute, state=state, key="ratelimit:tokens")
+        self._lock = threading.Lock()
+        self.waiting = 0
+        self.throttled = 0
+
+    def acquire(self, tokens=1):
+        """
+        Block until one request carrying `tokens` input tokens may be sent.
+
+        Args:
+            tokens (int, optional): Estimated input tokens of the request.
+
+        Returns:
+            float: Seconds spent waiting.
+        """
+        delay = max(self.requests.reserve(1), self.tokens.reserve(tokens))
+        if delay > 0:
+            with self._lock:
+                self.waiting += 1
+                self.throttled += 1
+            try:
+                time.sleep(delay)
+            finally:
+                with self._lock:
+                    self.waiting -= 1
+        return delay
+
+    def stats(self):
+        """
+        Report limiter counters.
+
+        Returns:
+            dict: Current queue depth and number of throttled requests.
+        """
+        with self._lock:
+            return {"queue_depth": self.waiting, "throttled": self.throttled}
+
+
+class RetryPolicy:
+    """
+    Jittered exponential backoff ("full jitter") for transient errors.
+    """
+
+    def __init__(self, retryable, max_attempts=MAX_ATTEMPTS, base_delay=BASE_RETRY_DELAY_SECONDS,
+                 max_delay=MAX_RETRY_DELAY_SECONDS):
+        self.retryable = retryable
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._lock = threading.Lock()
+        self.retries = 0
+        self.exhausted = 0
+
+    def call(self, func, *args, **kwargs):
+        """
+        Call `func`, retrying on retryable errors.
+
+        Args:
+            func (callable): Function to call.
+            *args, **kwargs: Arguments passed to `func`.
+
+        Returns:
+            The return value of `func`.
+
+        Raises:
+            Exception: The last error once all attempts are used up, or any non-retryable error.
+        """
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                return func(*args, **kwargs)
+            except self.retryable:
+                if attempt == self.max_attempts:
+                    with self._lock:
+                        self.exhausted += 1
+                    raise
+                with self._lock:
+                    self.retries += 1
+                time.sleep(random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1))))
+
+    def stats(self):
+        """
+        Report retry counters.
+
+        Returns:
+            dict: Number of retries performed and of calls that failed after the last attempt.
+        """
+        with self._lock:
+            return {"retries": self.retries, "retries_exhausted": self.exhausted}
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key into a single upstream call.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.coalesced = 0
+
+    def do(self, key, func, *args, **kwargs):
+        """
+        Run `func` unless a call with the same key is already in flight, in which case wait for its result.
+
+        Args:
+            key (str): Identity of the call.
+            func (callable): Function to call.
+            *args, **kwargs: Arguments passed to `func`.
+
+        Returns:
+            The return value of `func` (shared by all coalesced callers).
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = func(*args, **kwargs)
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def stats(self):
+        """
+        Report coalescing counters.
+
+        Returns:
+            dict: Number of calls served by another in-flight call.
+        """
+        with self._lock:
+            return {"coalesced": self.coalesced, "in_flight": len(self._calls)}
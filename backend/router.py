@@ -0,0 +1,329 @@
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from backend.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+PRO_MODEL = "gemini-1.5-pro-latest"
+FLASH_MODEL = "gemini-1.5-flash-latest"
+
+# Models per document type, in order of preference: each rule applies up to `max_input_tokens` (the
+# last rule of a document type has no limit), "*" covers document types without rules. Later models
+# are the fallbacks; `hedge_after` (seconds) sends the next model the same request when the first has
+# not answered in time ("auto" uses the first model's p95 latency, None disables hedging).
+DEFAULT_ROUTES = {
+    "*": [{"models": [PRO_MODEL, FLASH_MODEL], "hedge_after": "auto"}],
+    "shareholder_update": [
+        {"max_input_tokens": 8000, "models": [FLASH_MODEL, PRO_MODEL], "hedge_after": "auto"},
+        {"models": [PRO_MODEL, FLASH_MODEL], "hedge_after": "auto"},
+    ],
+    "pitch_deck": [
+        {"max_input_tokens": 4000, "models": [FLASH_MODEL, PRO_MODEL], "hedge_after": "auto"},
+        {"models": [PRO_MODEL, FLASH_MODEL], "hedge_after": "auto"},
+    ],
+    # Sections of generated documents translated into other languages (see backend/translate.py)
+    "translation": [{"models": [FLASH_MODEL, PRO_MODEL], "hedge_after": "auto"}],
+}
+# JSON file replacing DEFAULT_ROUTES (same structure)
+ROUTES_PATH = os.environ.get("STARTUPDOC_ROUTES_PATH", "")
+# Price per million input and output tokens (USD), for cost tracking per model
+MODEL_PRICES = {
+    PRO_MODEL: {"input": 1.25, "output": 5.0},
+    FLASH_MODEL: {"input": 0.075, "output": 0.3},
+}
+
+# Latency samples kept per model, and samples needed before they steer routing
+ROUTER_WINDOW = int(os.environ.get("STARTUPDOC_ROUTER_WINDOW", 200))
+ROUTER_MIN_SAMPLES = int(os.environ.get("STARTUPDOC_ROUTER_MIN_SAMPLES", 10))
+# Models failing more often than this (over their recent calls) are tried last
+ROUTER_MAX_ERROR_RATE = float(os.environ.get("STARTUPDOC_ROUTER_MAX_ERROR_RATE", 0.5))
+# Lower bound of adaptive hedging delays, so fast models are not hedged on noise
+ROUTER_MIN_HEDGE_SECONDS = float(os.environ.get("STARTUPDOC_ROUTER_MIN_HEDGE_SECONDS", 1.0))
+# Threads running routed attempts (each request uses one per model it is sent to)
+ROUTER_THREADS = int(os.environ.get("STARTUPDOC_ROUTER_THREADS", 32))
+
+
+class AllModelsFailed(Exception):
+    """
+    Raised when every model of a route failed or gave an unacceptable answer.
+    """
+
+
+# Function to read the routing configuration
+def load_routes(path=ROUTES_PATH):
+    """
+    Read the routes from a JSON file, or return the defaults.
+
+    Args:
+        path (str, optional): JSON file with the structure of DEFAULT_ROUTES; empty for the defaults.
+
+    Returns:
+        dict: Document type ("*" for the rest) -> list of rules.
+
+    Raises:
+        ValueError: If the file does not hold a valid routing configuration.
+    """
+    if not path:
+        return DEFAULT_ROUTES
+    with open(path, encoding="utf-8") as f:
+        routes = json.load(f)
+    if not isinstance(routes, dict) or "*" not in routes:
+        raise ValueError(f"{path}: routes must be an object with a '*' entry")
+    for document_type, rules in routes.items():
+        if not isinstance(rules, list) or not rules or not all(rule.get("models") for rule in rules):
+            raise ValueError(f"{path}: '{document_type}' needs a list of rules, each with 'models'")
+    return routes
+
+
+class ModelStats:
+    """
+    Recent latency and outcome of one model, per call kind ("generate" or "stream").
+    """
+
+    def __init__(self, window=ROUTER_WINDOW):
+        # (latency seconds, error) per call kind; streams are timed to their first token
+        self._samples = {}
+        self._window = window
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.errors = 0
+        self.hedges = 0
+        self.wins = 0
+        self.cost = 0.0
+
+    def record(self, kind, seconds, error=False):
+        with self._lock:
+            self._samples.setdefault(kind, deque(maxlen=self._window)).append((seconds, error))
+            self.calls += 1
+            self.errors += error
+
+    def add(self, counter, value=1):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + value)
+
+    def latency(self, kind, percentile):
+        """
+        Return a latency percentile of the model's recent successful calls.
+
+        Args:
+            kind (str): "generate" or "stream".
+            percentile (float): Percentile (0-100).
+
+        Returns:
+            float: Latency in seconds, or None with fewer than ROUTER_MIN_SAMPLES successful calls.
+        """
+        with self._lock:
+            latencies = sorted(seconds for seconds, error in self._samples.get(kind, ()) if not error)
+        if len(latencies) < ROUTER_MIN_SAMPLES:
+            return None
+        return latencies[min(len(latencies) - 1, int(round(percentile / 100 * (len(latencies) - 1))))]
+
+    def error_rate(self):
+        with self._lock:
+            outcomes = [error for samples in self._samples.values() for _, error in samples]
+        if len(outcomes) < ROUTER_MIN_SAMPLES:
+            return 0.0
+        return sum(outcomes) / len(outcomes)
+
+
+class ModelRouter:
+    """
+    Picks the models serving a request and runs it on them with hedging and fallback.
+
+    A request goes to the first healthy model of its route. If that model has not answered within
+    the route's hedging delay, the next model gets the same request and the first acceptable answer
+    wins; if a model fails (after its own retries) or answers unacceptably, the next model is tried.
+    Latency and errors are recorded per model: models failing often are tried last, and "auto"
+    hedging delays follow each model's recent p95 latency.
+    """
+
+    def __init__(self, routes=None, prices=None, threads=ROUTER_THREADS):
+        self.routes = routes or load_routes()
+        self.prices = MODEL_PRICES if prices is None else prices
+        self._stats = {}
+        self._lock = threading.Lock()
+        self._threads = threads
+        self._executor = None
+
+    def _pool(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(self._threads, thread_name_prefix="startupdoc-router")
+            return self._executor
+
+    def stats_for(self, model):
+        with self._lock:
+            stats = self._stats.get(model)
+            if stats is None:
+                stats = self._stats[model] = ModelStats()
+            return stats
+
+    def rule(self, document_type, input_tokens):
+        """
+        Return the routing rule for a request.
+
+        Args:
+            document_type (str): Document type key (None for prompts without one).
+            input_tokens (int): Estimated input tokens of the request.
+
+        Returns:
+            dict: The first rule of the document type (or of "*") whose `max_input_tokens` fits.
+        """
+        rules = self.routes.get(document_type) or self.routes["*"]
+        for rule in rules:
+            if input_tokens <= rule.get("max_input_tokens", float("inf")):
+                return rule
+        return rules[-1]
+
+    def models(self, document_type, input_tokens):
+        """
+        Return the models to try for a request, in order.
+
+        Args:
+            document_type (str): Document type key.
+            input_tokens (int): Estimated input tokens of the request.
+
+        Returns:
+            list: Model names; the configured order, with models failing too often moved last.
+        """
+        models = list(self.rule(document_type, input_tokens)["models"])
+        healthy = [model for model in models if self.stats_for(model).error_rate() <= ROUTER_MAX_ERROR_RATE]
+        return healthy + [model for model in models if model not in healthy]
+
+    def hedge_after(self, document_type, input_tokens, model, kind):
+        """
+        Return how long to wait for a model before hedging with the next one.
+
+        Args:
+            document_type (str): Document type key.
+            input_tokens (int): Estimated input tokens of the request.
+            model (str): The model the request is waiting on.
+            kind (str): "generate" or "stream".
+
+        Returns:
+            float: Seconds, or None to wait without hedging.
+        """
+        hedge_after = self.rule(document_type, input_tokens).get("hedge_after")
+        if hedge_after == "auto":
+            p95 = self.stats_for(model).latency(kind, 95)
+            return None if p95 is None else max(ROUTER_MIN_HEDGE_SECONDS, p95)
+        return hedge_after
+
+    def record_cost(self, model, input_tokens, output_tokens):
+        price = self.prices.get(model)
+        if price:
+            self.stats_for(model).add("cost", (input_tokens * price["input"] + output_tokens * price["output"]) / 1_000_000)
+
+    def call(self, document_type, input_tokens, attempt, kind="generate", acceptable=None, discard=None):
+        """
+        Run a request on the models of its route, hedging slow models and falling back on failures.
+
+        Args:
+            document_type (str): Document type key.
+            input_tokens (int): Estimated input tokens of the request.
+            attempt (callable): attempt(model) sends the request to a model and returns its answer
+                (for streams: once the first chunk arrived).
+            kind (str, optional): "generate" or "stream"; latency statistics are kept per kind.
+            acceptable (callable, optional): acceptable(answer) -> bool; unacceptable answers count
+                as failures. Defaults to accepting every answer.
+            discard (callable, optional): Called with the answers of attempts that lost a hedge race
+                (e.g. to close a stream), from the thread that produced them.
+
+        Returns:
+            tuple: (model that answered, its answer).
+
+        Raises:
+            AllModelsFailed: If every model failed; chained to the last model's error.
+        """
+        models = self.models(document_type, input_tokens)
+        state = {"winner": None}
+        state_lock = threading.Lock()
+
+        def run(model):
+            start = time.perf_counter()
+            try:
+                answer = attempt(model)
+                if acceptable is not None and not acceptable(answer):
+                    raise ValueError(f"{model} returned an unacceptable answer")
+            except Exception:
+                self.stats_for(model).record(kind, time.perf_counter() - start, error=True)
+                raise
+            self.stats_for(model).record(kind, time.perf_counter() - start)
+            with state_lock:
+                lost = state["winner"] is not None
+                if not lost:
+                    state["winner"] = model
+            if lost and discard is not None:
+                discard(answer)
+            return answer
+
+        pending, next_model, last_error = {}, 0, None
+        while True:
+            if not pending:
+                if next_model == len(models):
+                    raise AllModelsFailed(f"Every model failed: {', '.join(models)}") from last_error
+                if next_model:
+                    metrics.count("router_fallbacks", model=models[next_model], document_type=document_type or "-")
+                pending[self._pool().submit(run, models[next_model])] = models[next_model]
+                next_model += 1
+            # Hedge on the most recently started model, if another model is left to hedge with
+            delay = None
+            if next_model < len(models):
+                delay = self.hedge_after(document_type, input_tokens, models[next_model - 1], kind)
+            done, _ = wait(pending, timeout=delay, return_when=FIRST_COMPLETED)
+            if not done:
+                model = models[next_model]
+                self.stats_for(model).add("hedges")
+                metrics.count("router_hedges", model=model, document_type=document_type or "-")
+                logger.info("Hedging %s request with %s after %.1fs", document_type, model, delay)
+                pending[self._pool().submit(run, model)] = model
+                next_model += 1
+                continue
+            for future in done:
+                model = pending.pop(future)
+                try:
+                    answer = future.result()
+                except Exception as e:
+                    logger.warning("Model %s failed, trying the next model: %s", model, e)
+                    last_error = e
+                    continue
+                if state["winner"] == model:
+                    self.stats_for(model).add("wins")
+                    return model, answer
+
+    def stats(self):
+        """
+        Report routing statistics per model.
+
+        Returns:
+            dict: Model name -> calls, errors, error_rate, hedges (requests hedged onto it), wins
+            (requests it answered first), p50/p95 latency of generate and stream calls (seconds, None
+            with too few samples) and estimated cost (USD).
+        """
+        with self._lock:
+            models = dict(self._stats)
+        return {
+            model: {
+                "calls": stats.calls,
+                "errors": stats.errors,
+                "error_rate": round(stats.error_rate(), 3),
+                "hedges": stats.hedges,
+                "wins": stats.wins,
+                **{
+                    f"{kind}_p{percentile}": stats.latency(kind, percentile)
+                    for kind in ("generate", "stream") for percentile in (50, 95)
+                },
+                "cost": round(stats.cost, 6),
+            }
+            for model, stats in sorted(models.items())
+        }
+
+
+# Process-wide router shared by every session
+model_router = ModelRouter()
@@ -0,0 +1,339 @@
+import hashlib
+import re
+import sqlite3
+import time
+from contextlib import contextmanager
+
+
+# Section starts in generated markdown (headings or bold/numbered section titles); shared by the
+# progress estimate of the app and the section split of translations
+HEADING_PATTERN = re.compile(r"^\s*(?:#{1,6}\s+|\*\*\d+\.|\d+\.\s+\*\*)(.+?)\s*$", re.MULTILINE)
+WORD_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+# Hashed bag-of-words embedding and random-hyperplane LSH used for approximate nearest neighbours
+EMBEDDING_DIMENSIONS = 256
+LSH_TABLES = 4
+LSH_BITS = 12
+# Upper bound on LSH candidates re-ranked per similarity query
+MAX_CANDIDATES = 2000
+# Broad full-text queries rank only the newest matches, since bm25 costs grow with every matching row
+MAX_RANKED_MATCHES = 5000
+LSH_SEED = 20240601
+# Sections shorter than this are merged into the previous one instead of being indexed on their own
+MIN_SECTION_CHARS = 40
+
+
+def split_sections(content):
+    """
+    Split a generated markdown document into titled sections.
+
+    Args:
+        content (str): Document text.
+
+    Returns:
+        list: (title, text) tuples in document order; text before the first heading is titled "Introduction".
+    """
+    matches = list(HEADING_PATTERN.finditer(content))
+    sections = []
+    if not matches or matches[0].start() > 0:
+        intro = content[:matches[0].start() if matches else len(content)].strip()
+        if intro:
+            sections.append(("Introduction", intro))
+    for i, match in enumerate(matches):
+        end = matches[i + 1].start() if i + 1 < len(matches) else len(content)
+        title = match.group(1).strip("*# :")
+        text = content[match.start():end].strip()
+        if sections and len(text) < MIN_SECTION_CHARS:
+            sections[-1] = (sections[-1][0], sections[-1][1] + "\n\n" + text)
+        else:
+            sections.append((title, text))
+    return sections
+
+
+def embed_text(text):
+    """
+    Embed text as a normalized, signed hashed bag of words.
+
+    A dependency-free local embedding: texts sharing vocabulary end up close in cosine distance.
+    Any function returning a fixed-size float vector can be passed to `SectionIndex` instead.
+
+    Args:
+        text (str): Text to embed.
+
+    Returns:
+        numpy.ndarray: float32 vector of EMBEDDING_DIMENSIONS values with unit length (or all zeros).
+    """
+    import numpy as np
+
+    vector = np.zeros(EMBEDDING_DIMENSIONS, dtype=np.float32)
+    for word in WORD_PATTERN.findall(text.lower()):
+        digest = int.from_bytes(hashlib.blake2b(word.encode(), digest_size=8).digest(), "little")
+        vector[digest % EMBEDDING_DIMENSIONS] += 1.0 if digest >> 63 else -1.0
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+def _fts_query(query, operator, doc_type=None):
+    # Quote every word so user input can never be parsed as FTS5 syntax
+    match = f" {operator} ".join(f'"{word}"' for word in WORD_PATTERN.findall(query))
+    if doc_type is None:
+        return match
+    # The type filter is a term of the index, so FTS5 intersects it with the words before ranking
+    return f'doc_type : "{type_token(doc_type)}" AND ({match})'
+
+
+# Function to turn a document type into a single index term (display names hold spaces and emoji)
+def type_token(doc_type):
+    """
+    Return the term a document type is indexed under, in the full-text index and the LSH buckets.
+
+    Args:
+        doc_type (str): Document type (display name, e.g. "Business Plan 🏢").
+
+    Returns:
+        str: An alphanumeric token unique to the type.
+    """
+    return "type" + hashlib.blake2b(doc_type.encode(), digest_size=8).hexdigest()
+
+
+class SectionIndex:
+    """
+    Search index over the sections of stored documents.
+
+    Keeps an SQLite FTS5 full-text index plus a local embedding index with random-hyperplane LSH
+    buckets for approximate nearest-neighbour queries. Lives in the document store's database and
+    is updated in the same transaction that stores each document. The document type is part of
+    both indexes (an FTS5 column and a key of the buckets), so type-filtered queries only ever
+    fetch candidates of that type.
+
+    numpy is only imported once a section is embedded, so opening the store stays cheap at startup.
+    """
+
+    def __init__(self, path, embed=embed_text, dimensions=EMBEDDING_DIMENSIONS):
+        self.path = path
+        self.embed = embed
+        self.dimensions = dimensions
+        self._planes = None
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def create_tables(self, conn):
+        """
+        Create the index tables.
+
+        Args:
+            conn (sqlite3.Connection): Connection to the document store database.
+        """
+        # Indexes created before the document type was part of them are rebuilt (see DocumentStore)
+        fts_columns = [row[1] for row in conn.execute("PRAGMA table_info(sections_fts)")]
+        if fts_columns and "doc_type" not in fts_columns:
+            for table in ("sections", "sections_fts", "section_vectors", "section_buckets"):
+                conn.execute(f"DROP TABLE IF EXISTS {table}")
+        # Section metadata is kept narrow (text lives in the FTS table, vectors in their own table)
+        # so filtering many candidate sections touches as few pages as possible
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS sections (
+                id INTEGER PRIMARY KEY,
+                doc_id TEXT NOT NULL,
+                doc_type TEXT NOT NULL,
+                created REAL NOT NULL,
+                position INTEGER NOT NULL
+            )
+            """
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS sections_doc ON sections (doc_id, position)")
+        if not fts_columns or "doc_type" not in fts_columns:
+            conn.execute("CREATE VIRTUAL TABLE sections_fts USING fts5(title, content, doc_type, tokenize='unicode61')")
+            # The type term only filters; it must not weigh in the bm25 rank
+            conn.execute("INSERT INTO sections_fts (sections_fts, rank) VALUES ('rank', 'bm25(1.0, 1.0, 0.0)')")
+        conn.execute("CREATE TABLE IF NOT EXISTS section_vectors (id INTEGER PRIMARY KEY, vector BLOB NOT NULL)")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS section_buckets (doc_type TEXT NOT NULL, "
+            "lsh_table INTEGER NOT NULL, bucket INTEGER NOT NULL, section_id INTEGER NOT NULL)"
+        )
+        # Covering indexes: bucket lookups, with or without a type, never read the table itself
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS section_buckets_lookup ON section_buckets (lsh_table, bucket, section_id)"
+        )
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS section_buckets_type ON section_buckets (doc_type, lsh_table, bucket, section_id)"
+        )
+
+    def _buckets(self, vector):
+        import numpy as np
+
+        if self._planes is None:  # Seeded, so concurrent first calls build identical planes
+            planes = np.random.default_rng(LSH_SEED).standard_normal((LSH_TABLES * LSH_BITS, self.dimensions))
+            self._bit_weights = 1 << np.arange(LSH_BITS)
+            self._planes = planes.astype(np.float32)
+        bits = (self._planes @ vector > 0).reshape(LSH_TABLES, LSH_BITS)
+        return [int(bucket) for bucket in bits @ self._bit_weights]
+
+    def index_document(self, conn, doc_id, content):
+        """
+        Add the sections of a newly stored document to the index.
+
+        Args:
+            conn (sqlite3.Connection): Connection (and transaction) used to store the document.
+            doc_id (str): Document ID.
+            content (str): Document text.
+        """
+        import numpy as np
+
+        # Filter columns are copied onto each section so searches need no join to filter
+        doc_type, created = conn.execute("SELECT doc_type, created FROM documents WHERE id = ?", (doc_id,)).fetchone()
+        token = type_token(doc_type)
+        for position, (title, text) in enumerate(split_sections(content)):
+            vector = np.asarray(self.embed(text), dtype=np.float32)
+            section_id = conn.execute(
+                "INSERT INTO sections (doc_id, doc_type, created, position) VALUES (?, ?, ?, ?)",
+                (doc_id, doc_type, created, position),
+            ).lastrowid
+            conn.execute(
+                "INSERT INTO sections_fts (rowid, title, content, doc_type) VALUES (?, ?, ?, ?)",
+                (section_id, title, text, token),
+            )
+            conn.execute("INSERT INTO section_vectors (id, vector) VALUES (?, ?)", (section_id, vector.tobytes()))
+            conn.executemany(
+                "INSERT INTO section_buckets (doc_type, lsh_table, bucket, section_id) VALUES (?, ?, ?, ?)",
+                [(token, table, bucket, section_id) for table, bucket in enumerate(self._buckets(vector))],
+            )
+
+    @staticmethod
+    def _since_filter(since, column):
+        # The date filter stays a join on the section metadata (the type filter is part of the indexes)
+        if since is None:
+            return "", "", []
+        return f" JOIN sections s ON s.id = {column}", " AND s.created >= ?", [since]
+
+    def search(self, query, limit=10, doc_type=None, since=None):
+        """
+        Full-text search over document sections, best matches first.
+
+        Args:
+            query (str): Free-text query.
+            limit (int, optional): Maximum number of sections returned.
+            doc_type (str, optional): Only sections of documents of this type.
+            since (float, optional): Only documents created at or after this UNIX timestamp.
+
+        Returns:
+            list: Dicts with doc_id, type, business_name, created, title, snippet and content.
+        """
+        if not WORD_PATTERN.search(query):
+            return []
+        join, filters, params = self._since_filter(since, "f.rowid")
+        results, seen = [], set()
+        # Sections containing every word first; partial (OR) matches only fill up the remaining slots.
+        # Matches are walked newest first (cheap in FTS5), bm25-ranked, and snippets built for the results only.
+        for operator in ("AND", "OR"):
+            match = _fts_query(query, operator, doc_type)
+            with self._connect() as conn:
+                rows = conn.execute(
+                    "SELECT s.id, s.doc_id, s.doc_type, d.business_name, s.created, "
+                    "sections_fts.title, sections_fts.content, "
+                    "snippet(sections_fts, 1, '**', '**', ' … ', 16) AS snippet "
+                    "FROM (SELECT id, rank FROM ("
+                    f"SELECT f.rowid AS id, f.rank AS rank FROM sections_fts f{join} "
+                    f"WHERE sections_fts MATCH ?{filters} ORDER BY f.rowid DESC LIMIT ?"
+                    ") ORDER BY rank LIMIT ?) ranked "
+                    "JOIN sections_fts ON sections_fts.rowid = ranked.id "
+                    "JOIN sections s ON s.id = ranked.id JOIN documents d ON d.id = s.doc_id "
+                    "WHERE sections_fts MATCH ? ORDER BY ranked.rank",
+                    (match, *params, MAX_RANKED_MATCHES, limit, match),
+                ).fetchall()
+            for row in rows:
+                if row["id"] not in seen and len(results) < limit:
+                    seen.add(row["id"])
+                    results.append(self._result(row, snippet=row["snippet"]))
+            if len(results) >= limit:
+                break
+        return results
+
+    def similar(self, text, limit=10, doc_type=None, since=None):
+        """
+        Approximate nearest-neighbour search for sections similar to a text.
+
+        Candidates come from the LSH buckets the text falls into and are re-ranked by cosine similarity.
+
+        Args:
+            text (str): Query text (e.g. a section to find alternatives for).
+            limit (int, optional): Maximum number of sections returned.
+            doc_type (str, optional): Only sections of documents of this type.
+            since (float, optional): Only documents created at or after this UNIX timestamp.
+
+        Returns:
+            list: Same dicts as `search`, plus a "score" (cosine similarity), best first.
+        """
+        import numpy as np
+
+        vector = np.asarray(self.embed(text), dtype=np.float32)
+        if not vector.any():
+            return []
+        join, filters, params = self._since_filter(since, "b.section_id")
+        # With a type filter, only that type's buckets are read
+        bucket = "b.lsh_table = ? AND b.bucket = ?"
+        if doc_type is not None:
+            bucket = "b.doc_type = ? AND " + bucket
+        buckets = " OR ".join(f"({bucket})" for _ in range(LSH_TABLES))
+        bucket_params = [
+            value
+            for table, bucket_id in enumerate(self._buckets(vector))
+            for value in ((type_token(doc_type),) if doc_type is not None else ()) + (table, bucket_id)
+        ]
+        with self._connect() as conn:
+            candidates = conn.execute(
+                "SELECT DISTINCT b.section_id AS id, v.vector FROM section_buckets b"
+                f"{join} JOIN section_vectors v ON v.id = b.section_id "
+                f"WHERE ({buckets}){filters} LIMIT ?",
+                (*bucket_params, *params, MAX_CANDIDATES),
+            ).fetchall()
+            if not candidates:
+                return []
+            scores = np.stack([np.frombuffer(row["vector"], dtype=np.float32) for row in candidates]) @ vector
+            best = {candidates[i]["id"]: float(scores[i]) for i in np.argsort(-scores)[:limit]}
+            # Text and metadata are only loaded for the sections returned
+            rows = conn.execute(
+                "SELECT s.id, s.doc_id, s.doc_type, d.business_name, s.created, t.title, t.content "
+                "FROM sections s JOIN sections_fts t ON t.rowid = s.id JOIN documents d ON d.id = s.doc_id "
+                f"WHERE s.id IN ({', '.join('?' * len(best))})",
+                list(best),
+            ).fetchall()
+        rows.sort(key=lambda row: -best[row["id"]])
+        return [self._result(row, score=best[row["id"]]) for row in rows]
+
+    @staticmethod
+    def _result(row, snippet=None, score=None):
+        result = {
+            "doc_id": row["doc_id"],
+            "type": row["doc_type"],
+            "business_name": row["business_name"],
+            "created": row["created"],
+            "title": row["title"],
+            "snippet": snippet if snippet is not None else row["content"][:200],
+            "content": row["content"],
+        }
+        if score is not None:
+            result["score"] = score
+        return result
+
+
+def days_ago(days):
+    """
+    Return the UNIX timestamp of `days` days ago, for the `since` search filters.
+
+    Args:
+        days (int): Number of days.
+
+    Returns:
+        float: The timestamp.
+    """
+    return time.time() - days * 24 * 3600
@@ -0,0 +1,134 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from backend.gemini import generate_gemini_response, request_key
+from backend.langchain import (
+    OUTLINE_FIELD_TOKEN_BUDGET,
+    build_context,
+    craft_outline_prompt,
+    craft_section_prompt,
+    get_template_sections,
+    section_inputs,
+)
+
+
+# Upper bound on concurrent section requests for one document
+MAX_SECTION_WORKERS = 6
+
+
+def _timed_generation(context, prompt):
+    start_time = time.perf_counter()
+    try:
+        response, error = generate_gemini_response(context, prompt), None
+    except Exception as e:  # Keep the other sections going when one of them fails
+        response = {"content": None, "prompt_tokens": 0, "output_tokens": 0, "cached_tokens": 0, "cached": False}
+        error = str(e)
+    return {**response, "error": error, "latency": time.perf_counter() - start_time}
+
+
+def _generate_or_reuse(context, prompt, previous, key=None):
+    # A section whose key (by default its context and prompt) is unchanged is taken over from the previous version
+    key = key or request_key(context, prompt)
+    reused = previous.get(key)
+    if reused is not None:
+        return {
+            "content": reused["content"],
+            "prompt_tokens": reused["prompt_tokens"],
+            "output_tokens": reused["output_tokens"],
+            "cached_tokens": 0,
+            "cached": False,
+            "error": None,
+            "latency": 0.0,
+            "key": key,
+            "reused": True,
+        }
+    return {**_timed_generation(context, prompt), "key": key, "reused": False}
+
+
+def generate_sections(user_inputs, query, document_type, language, tone, previous=None,
+                      max_workers=MAX_SECTION_WORKERS):
+    """
+    Generate a document section by section, running the sections concurrently.
+
+    A short outline pass runs first so every section shares the same facts and terminology;
+    the numbered sections of the template are then generated in parallel and yielded in
+    document order as soon as each one (and every section before it) has completed.
+
+    The outline sees every input (each compacted to OUTLINE_FIELD_TOKEN_BUDGET tokens), while
+    each section only sees the inputs it consumes (see `section_inputs`). Sections are keyed by
+    their inputs and instructions, not by the outline, so after a form edit the sections of a
+    `previous` version whose inputs did not change are reused as they are and only the affected
+    sections (and the outline) are regenerated.
+
+    Args:
+        user_inputs (dict): Mapping of input keys to user-provided values.
+        query (str): The user's input or topic.
+        document_type (str): The type of document (e.g., business_plan).
+        language (str): Language for the response.
+        tone (str): The tone of the response.
+        previous (list, optional): Section dicts of an earlier version of the document (with key,
+            content, prompt_tokens and output_tokens), e.g. from `DocumentStore.get_sections`.
+        max_workers (int, optional): Maximum number of section requests in flight at once.
+
+    Yields:
+        dict: First the outline (number 0), then one dict per section with number, title, content,
+        error, latency, prompt_tokens, output_tokens, cached, key (request key) and reused.
+    """
+    previous = {result["key"]: result for result in previous or [] if result.get("content")}
+
+    def generate_section(section):
+        context = build_context(section_inputs(document_type, section["number"], user_inputs))
+        prompt = craft_section_prompt(query, document_type, section, outline["content"], language, tone)
+        # Any form edit changes the outline, so the outline is left out of the key reusing sections
+        key = request_key(context, craft_section_prompt(query, document_type, section, "", language, tone))
+        return _generate_or_reuse(context, prompt, previous, key)
+
+    outline = _generate_or_reuse(
+        build_context(user_inputs, OUTLINE_FIELD_TOKEN_BUDGET),
+        craft_outline_prompt(query, document_type, language, tone),
+        previous,
+    )
+    yield {"number": 0, "title": "Outline", **outline}
+    if outline["error"]:
+        return
+
+    sections = get_template_sections(document_type)["sections"]
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(sections)))) as executor:
+        futures = [executor.submit(generate_section, section) for section in sections]
+        # Waiting on the futures in submission order keeps the output in document order
+        for section, future in zip(sections, futures):
+            yield {"number": section["number"], "title": section["title"], **future.result()}
+
+
+def assemble_sections(results):
+    """
+    Join generated sections back into a single document.
+
+    Args:
+        results (list): Section dicts yielded by `generate_sections`.
+
+    Returns:
+        str: The document text, with the outline and failed sections left out.
+    """
+    return "\n\n".join(result["content"] for result in results if result["number"] and result["content"])
+
+
+def reuse_stats(results):
+    """
+    Count the sections and tokens reused from a previous version versus regenerated.
+
+    Args:
+        results (list): Section dicts yielded by `generate_sections` (the outline included).
+
+    Returns:
+        dict: sections_reused, sections_generated, tokens_reused and tokens_generated
+        (input plus output tokens).
+    """
+    stats = {"sections_reused": 0, "sections_generated": 0, "tokens_reused": 0, "tokens_generated": 0}
+    for result in results:
+        if result["content"] is None:
+            continue
+        kind = "reused" if result["reused"] else "generated"
+        stats[f"sections_{kind}"] += 1
+        stats[f"tokens_{kind}"] += result["prompt_tokens"] + result["output_tokens"]
+    return stats
@@ -0,0 +1,407 @@
+import abc
+import functools
+import hashlib
+import math
+import os
+import random
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Without POSIX record locks (Windows), locks only hold within the process
+    fcntl = None
+
+
+# Where state shared by every worker process lives: a SQLite path (or sqlite:///path) for the
+# processes of one host, or a redis:// URL for several hosts
+STATE_URL = os.environ.get("STARTUPDOC_STATE_URL", "sqlite:///.cache/state.sqlite3")
+# Expired keys are purged on about one write in this many
+STATE_PURGE_EVERY = 100
+# How often a waiting lock is retried
+LOCK_POLL_SECONDS = 0.05
+
+
+class LockTimeout(TimeoutError):
+    """
+    Raised when a shared lock could not be acquired in time.
+    """
+
+
+class SharedState(abc.ABC):
+    """
+    Interface of the state shared by every worker process (and host) serving the app.
+
+    Covers what the app needs from a Redis-like store: string keys with expiry, counters, token
+    buckets for rate limiting and named locks. Values are strings.
+    """
+
+    # Whether the state is shared beyond the processes of one host
+    distributed = False
+
+    @abc.abstractmethod
+    def get(self, key):
+        """
+        Read a key.
+
+        Args:
+            key (str): The key.
+
+        Returns:
+            str: Its value, or None if it is missing or expired.
+        """
+
+    @abc.abstractmethod
+    def set(self, key, value, ttl=None, only_if_absent=False):
+        """
+        Write a key.
+
+        Args:
+            key (str): The key.
+            value (str): Its value.
+            ttl (float, optional): Seconds until the key expires; None keeps it.
+            only_if_absent (bool, optional): Only write the key if it does not exist yet.
+
+        Returns:
+            bool: Whether the key was written.
+        """
+
+    @abc.abstractmethod
+    def delete(self, key):
+        """
+        Delete a key.
+
+        Args:
+            key (str): The key.
+        """
+
+    @abc.abstractmethod
+    def incr(self, key, amount=1, ttl=None):
+        """
+        Add to an integer counter, creating it at 0.
+
+        Args:
+            key (str): The counter.
+            amount (int, optional): Amount to add.
+            ttl (float, optional): Lifetime of a newly created counter.
+
+        Returns:
+            int: The new value.
+        """
+
+    @abc.abstractmethod
+    def take_tokens(self, key, amount, rate, capacity):
+        """
+        Take tokens from a token bucket refilled continuously, going into debt if necessary.
+
+        Args:
+            key (str): The bucket.
+            amount (float): Tokens to take; capped at the capacity.
+            rate (float): Tokens added per second.
+            capacity (float): Size of the bucket (and its initial content).
+
+        Returns:
+            float: Seconds the caller must wait before using the tokens.
+        """
+
+    @abc.abstractmethod
+    def acquire(self, name, timeout, lease=None):
+        """
+        Acquire a named lock held across every process sharing the state.
+
+        Args:
+            name (str): Name of the lock.
+            timeout (float): Seconds to wait for it (0 tries once).
+            lease (float, optional): Seconds after which the lock is released if its holder never
+                releases it (e.g. a crashed process); defaults to `timeout`.
+
+        Returns:
+            str: Token to release the lock with, or None if it was not acquired in time.
+        """
+
+    @abc.abstractmethod
+    def release(self, name, token):
+        """
+        Release a lock acquired with `acquire`.
+
+        Args:
+            name (str): Name of the lock.
+            token (str): Token returned by `acquire`.
+        """
+
+    @contextmanager
+    def lock(self, name, timeout, lease=None):
+        """
+        Hold a named lock for the duration of a block.
+
+        Args:
+            name (str): Name of the lock.
+            timeout (float): Seconds to wait for it.
+            lease (float, optional): See `acquire`.
+
+        Raises:
+            LockTimeout: If the lock was not acquired in time.
+        """
+        token = self.acquire(name, timeout, lease)
+        if token is None:
+            raise LockTimeout(f"Timed out waiting for lock '{name}'")
+        try:
+            yield
+        finally:
+            self.release(name, token)
+
+
+class LocalState(SharedState):
+    """
+    State shared by the worker processes of one host: keys and token buckets in a SQLite database,
+    locks as POSIX record locks on a file next to it (released by the OS when a holder exits).
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock_file = None
+        self._local_locks = {}
+        self._guard = threading.Lock()
+        self._connections = threading.local()
+        self._init_db()
+
+    @contextmanager
+    def _connect(self, write=False):
+        # One connection per thread, reused: the state is hit by every model request, and opening a
+        # connection costs more than the statements themselves
+        conn = getattr(self._connections, "conn", None)
+        if conn is None:
+            conn = self._connections.conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            # The state is transient (quotas, locks, session lists), so commits need not wait for the disk
+            conn.execute("PRAGMA synchronous=NORMAL")
+        # Writes take the database lock up front, so read-modify-write updates are atomic across processes
+        conn.execute("BEGIN IMMEDIATE" if write else "BEGIN")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def _init_db(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS state (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires REAL)")
+            conn.execute("CREATE TABLE IF NOT EXISTS buckets (key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)")
+            conn.commit()
+        finally:
+            conn.close()
+
+    def get(self, key):
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT value FROM state WHERE key = ? AND (expires IS NULL OR expires > ?)", (key, time.time())
+            ).fetchone()
+        return row[0] if row else None
+
+    def set(self, key, value, ttl=None, only_if_absent=False):
+        now = time.time()
+        with self._connect(write=True) as conn:
+            if random.randrange(STATE_PURGE_EVERY) == 0:
+                conn.execute("DELETE FROM state WHERE expires <= ?", (now,))
+            if only_if_absent and conn.execute(
+                "SELECT 1 FROM state WHERE key = ? AND (expires IS NULL OR expires > ?)", (key, now)
+            ).fetchone():
+                return False
+            conn.execute(
+                "INSERT OR REPLACE INTO state (key, value, expires) VALUES (?, ?, ?)",
+                (key, value, None if ttl is None else now + ttl),
+            )
+        return True
+
+    def delete(self, key):
+        with self._connect(write=True) as conn:
+            conn.execute("DELETE FROM state WHERE key = ?", (key,))
+
+    def incr(self, key, amount=1, ttl=None):
+        now = time.time()
+        with self._connect(write=True) as conn:
+            row = conn.execute(
+                "SELECT value FROM state WHERE key = ? AND (expires IS NULL OR expires > ?)", (key, now)
+            ).fetchone()
+            if row is None:
+                value = amount
+                conn.execute(
+                    "INSERT OR REPLACE INTO state (key, value, expires) VALUES (?, ?, ?)",
+                    (key, str(value), None if ttl is None else now + ttl),
+                )
+            else:
+                value = int(row[0]) + amount
+                conn.execute("UPDATE state SET value = ? WHERE key = ?", (str(value), key))
+        return value
+
+    def take_tokens(self, key, amount, rate, capacity):
+        now = time.time()
+        with self._connect(write=True) as conn:
+            row = conn.execute("SELECT tokens, updated FROM buckets WHERE key = ?", (key,)).fetchone()
+            tokens, updated = row if row else (capacity, now)
+            tokens = min(capacity, tokens + max(0.0, now - updated) * rate) - min(amount, capacity)
+            conn.execute("INSERT OR REPLACE INTO buckets (key, tokens, updated) VALUES (?, ?, ?)", (key, tokens, now))
+        return max(0.0, -tokens / rate)
+
+    def _local_lock(self, name, delta):
+        # Record locks are held per process, so threads of this process also queue on a threading lock
+        with self._guard:
+            entry = self._local_locks.setdefault(name, [threading.Lock(), 0])
+            entry[1] += delta
+            if entry[1] == 0:
+                del self._local_locks[name]
+            return entry[0]
+
+    def _lock_fd(self):
+        with self._guard:
+            if self._lock_file is None:
+                # Kept open for the life of the process: closing any descriptor of the file would drop
+                # every record lock this process holds on it
+                self._lock_file = open(self.path + ".locks", "a+b")
+            return self._lock_file.fileno()
+
+    @staticmethod
+    def _offset(name):
+        # Each lock is one byte of a sparse file, at an offset derived from its name
+        return int(hashlib.sha256(name.encode()).hexdigest()[:15], 16)
+
+    def acquire(self, name, timeout, lease=None):
+        # Record locks are released when their holder exits, so no lease is needed
+        deadline = time.monotonic() + timeout
+        local = self._local_lock(name, 1)
+        if not (local.acquire(timeout=timeout) if timeout > 0 else local.acquire(blocking=False)):
+            self._local_lock(name, -1)
+            return None
+        if fcntl is None:
+            return name
+        fd, offset = self._lock_fd(), self._offset(name)
+        while True:
+            try:
+                fcntl.lockf(fd, fcntl.LOCK_EX | fcntl.LOCK_NB, 1, offset)
+                return name
+            except OSError:
+                if time.monotonic() >= deadline:
+                    local.release()
+                    self._local_lock(name, -1)
+                    return None
+                time.sleep(LOCK_POLL_SECONDS)
+
+    def release(self, name, token):
+        if fcntl is not None:
+            fcntl.lockf(self._lock_fd(), fcntl.LOCK_UN, 1, self._offset(name))
+        self._local_lock(name, 0).release()
+        self._local_lock(name, -1)
+
+
+# Token bucket update, atomic on the Redis server
+_TAKE_TOKENS_SCRIPT = """
+local rate, capacity, amount, now = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3]), tonumber(ARGV[4])
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = tonumber(state[1]) or capacity
+local updated = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - updated) * rate) - math.min(amount, capacity)
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 60)
+return tostring(tokens)
+"""
+# Deletes a lock only if it is still held with the caller's token
+_RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then return redis.call('DEL', KEYS[1]) end
+return 0
+"""
+
+
+class RedisState(SharedState):
+    """
+    State shared by every host, on a Redis server (or any server speaking the Redis protocol, such
+    as a local stand-in). Locks are leases: a lock whose holder never releases it expires.
+    """
+
+    distributed = True
+
+    def __init__(self, client, prefix="startupdoc:"):
+        self.client = client
+        self.prefix = prefix
+        self._take_tokens = client.register_script(_TAKE_TOKENS_SCRIPT)
+        self._release = client.register_script(_RELEASE_SCRIPT)
+
+    @classmethod
+    def from_url(cls, url):
+        try:
+            import redis
+        except ImportError:
+            raise ValueError(f"{url}: shared state on Redis needs the redis package (pip install redis)") from None
+        return cls(redis.Redis.from_url(url))
+
+    def get(self, key):
+        value = self.client.get(self.prefix + key)
+        return None if value is None else value.decode()
+
+    def set(self, key, value, ttl=None, only_if_absent=False):
+        px = None if ttl is None else max(1, int(ttl * 1000))
+        return bool(self.client.set(self.prefix + key, value, px=px, nx=only_if_absent))
+
+    def delete(self, key):
+        self.client.delete(self.prefix + key)
+
+    def incr(self, key, amount=1, ttl=None):
+        value = self.client.incrby(self.prefix + key, amount)
+        if ttl is not None and value == amount:
+            self.client.expire(self.prefix + key, math.ceil(ttl))
+        return value
+
+    def take_tokens(self, key, amount, rate, capacity):
+        tokens = float(self._take_tokens(keys=[self.prefix + key], args=[rate, capacity, amount, time.time()]))
+        return max(0.0, -tokens / rate)
+
+    def acquire(self, name, timeout, lease=None):
+        token = uuid.uuid4().hex
+        deadline = time.monotonic() + timeout
+        while not self.set(f"lock:{name}", token, ttl=lease or max(timeout, 1), only_if_absent=True):
+            if time.monotonic() >= deadline:
+                return None
+            time.sleep(LOCK_POLL_SECONDS)
+        return token
+
+    def release(self, name, token):
+        self._release(keys=[f"{self.prefix}lock:{name}"], args=[token])
+
+
+# Function to open the shared state a URL points to
+def open_state(url=STATE_URL):
+    """
+    Open the shared state at a URL.
+
+    Args:
+        url (str, optional): "redis://..." (or "rediss://...") for Redis, otherwise a SQLite path,
+            optionally prefixed with "sqlite:///".
+
+    Returns:
+        SharedState: The shared state.
+
+    Raises:
+        ValueError: If the URL needs a package that is not installed.
+    """
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisState.from_url(url)
+    return LocalState(url[len("sqlite:///"):] if url.startswith("sqlite:///") else url)
+
+
+# Function to open the process-wide handle on the shared state the first time it is needed
+@functools.cache
+def get_shared_state():
+    """
+    Return the state shared by every worker process, opening it (at STATE_URL) on first use.
+
+    Returns:
+        SharedState: The process-wide shared state.
+    """
+    return open_state()
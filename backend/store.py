@@ -0,0 +1,291 @@
+import functools
+import hashlib
+import json
+import os
+import sqlite3
+import time
+import uuid
+from contextlib import contextmanager
+
+from backend.search import SectionIndex
+from backend.state import get_shared_state
+
+try:
+    import zstandard
+except ImportError:  # Documents are stored uncompressed without the zstandard package
+    zstandard = None
+
+
+# Document store location (kept across restarts and shared by every session and worker process)
+STORE_PATH = os.environ.get("STARTUPDOC_STORE_PATH", "data/documents.sqlite3")
+ZSTD_LEVEL = 3
+# How long documents stay readable from a distributed shared state, by replicas on other hosts
+SHARED_DOCUMENT_TTL_SECONDS = int(os.environ.get("STARTUPDOC_SHARED_DOCUMENT_TTL", 30 * 24 * 3600))
+
+
+def _compress(data):
+    if zstandard is None:
+        return "raw", data
+    return "zstd", zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data)
+
+
+def _decompress(codec, data):
+    if codec == "zstd":
+        return zstandard.ZstdDecompressor().decompress(data)
+    return data
+
+
+def _put_blob(conn, text):
+    # Content-addressed: identical texts (e.g. sections reused across versions) are stored once
+    data = text.encode()
+    content_hash = hashlib.sha256(data).hexdigest()
+    codec, stored = _compress(data)
+    conn.execute(
+        "INSERT OR IGNORE INTO blobs (hash, codec, size, data) VALUES (?, ?, ?, ?)",
+        (content_hash, codec, len(data), stored),
+    )
+    return content_hash
+
+
+class DocumentStore:
+    """
+    Persistent store of generated documents.
+
+    Document text lives in content-addressed blobs (identical documents are stored once), and
+    metadata rows are indexed by ID, document type, business name and prompt hash, so sessions
+    only need to keep document IDs. Every stored document is also added to the section search
+    index (`sections`).
+
+    The database is local to the host. With a `state` shared across hosts (see backend/state.py),
+    every saved document is also copied there, so replicas on other hosts can still `get` it
+    (search and incremental regeneration stay per host).
+    """
+
+    def __init__(self, path=STORE_PATH, state=None):
+        self.path = path
+        self.state = state
+        self.sections = SectionIndex(path)
+        self._init_db()
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _init_db(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS blobs (
+                    hash TEXT PRIMARY KEY,
+                    codec TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    data BLOB NOT NULL
+                )
+                """
+            )
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS documents (
+                    id TEXT PRIMARY KEY,
+                    doc_type TEXT NOT NULL,
+                    business_name TEXT,
+                    prompt_hash TEXT,
+                    content_hash TEXT NOT NULL REFERENCES blobs (hash),
+                    created REAL NOT NULL
+                )
+                """
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS documents_type ON documents (doc_type, created)")
+            conn.execute("CREATE INDEX IF NOT EXISTS documents_business ON documents (business_name, created)")
+            conn.execute("CREATE INDEX IF NOT EXISTS documents_prompt ON documents (prompt_hash)")
+            conn.execute("CREATE INDEX IF NOT EXISTS documents_created ON documents (created)")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS document_sections (
+                    doc_id TEXT NOT NULL REFERENCES documents (id),
+                    number INTEGER NOT NULL,
+                    title TEXT NOT NULL,
+                    request_key TEXT NOT NULL,
+                    content_hash TEXT NOT NULL REFERENCES blobs (hash),
+                    prompt_tokens INTEGER NOT NULL,
+                    output_tokens INTEGER NOT NULL,
+                    PRIMARY KEY (doc_id, number)
+                )
+                """
+            )
+            self.sections.create_tables(conn)
+
+            # Index documents stored before the section index existed
+            unindexed = conn.execute(
+                "SELECT d.id, b.codec, b.data FROM documents d JOIN blobs b ON b.hash = d.content_hash "
+                "WHERE NOT EXISTS (SELECT 1 FROM sections s WHERE s.doc_id = d.id)"
+            ).fetchall()
+            for row in unindexed:
+                self.sections.index_document(conn, row["id"], _decompress(row["codec"], row["data"]).decode())
+
+    def save(self, doc_type, content, business_name=None, prompt_hash=None, sections=None):
+        """
+        Store a generated document.
+
+        Args:
+            doc_type (str): Document type (display name, e.g. "Business Plan 🏢").
+            content (str): Document text.
+            business_name (str, optional): Business or project the document is about.
+            prompt_hash (str, optional): Request key of the prompt that produced it.
+            sections (list, optional): Per-section outputs of a sectioned generation (dicts with number,
+                title, key, content, prompt_tokens and output_tokens), kept for incremental regeneration.
+
+        Returns:
+            str: ID of the new document.
+        """
+        doc_id, created = uuid.uuid4().hex, time.time()
+        with self._connect() as conn:
+            content_hash = _put_blob(conn, content)
+            conn.execute(
+                "INSERT INTO documents (id, doc_type, business_name, prompt_hash, content_hash, created) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (doc_id, doc_type, business_name, prompt_hash, content_hash, created),
+            )
+            for section in sections or []:
+                if section["content"] is None:
+                    continue
+                conn.execute(
+                    "INSERT INTO document_sections "
+                    "(doc_id, number, title, request_key, content_hash, prompt_tokens, output_tokens) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (doc_id, section["number"], section["title"], section["key"], _put_blob(conn, section["content"]),
+                     section["prompt_tokens"], section["output_tokens"]),
+                )
+            self.sections.index_document(conn, doc_id, content)
+        if self.state is not None:
+            document = {
+                "id": doc_id, "type": doc_type, "business_name": business_name, "prompt_hash": prompt_hash,
+                "content_hash": content_hash, "created": created, "content": content,
+            }
+            self.state.set(f"document:{doc_id}", json.dumps(document), ttl=SHARED_DOCUMENT_TTL_SECONDS)
+        return doc_id
+
+    def get(self, doc_id):
+        """
+        Fetch a document with its content.
+
+        Args:
+            doc_id (str): Document ID returned by `save`.
+
+        Returns:
+            dict: id, type, business_name, prompt_hash, content_hash, created and content, or None if unknown
+            (on this host and, with a shared state, to every host).
+        """
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT d.id, d.doc_type, d.business_name, d.prompt_hash, d.content_hash, d.created, b.codec, b.data "
+                "FROM documents d JOIN blobs b ON b.hash = d.content_hash WHERE d.id = ?",
+                (doc_id,),
+            ).fetchone()
+        if row is None:
+            # Saved by a replica on another host
+            shared = self.state.get(f"document:{doc_id}") if self.state is not None else None
+            return json.loads(shared) if shared is not None else None
+        return {
+            "id": row["id"],
+            "type": row["doc_type"],
+            "business_name": row["business_name"],
+            "prompt_hash": row["prompt_hash"],
+            "content_hash": row["content_hash"],
+            "created": row["created"],
+            "content": _decompress(row["codec"], row["data"]).decode(),
+        }
+
+    def get_sections(self, doc_id):
+        """
+        Fetch the per-section outputs stored with a sectioned document.
+
+        Args:
+            doc_id (str): Document ID returned by `save`.
+
+        Returns:
+            list: Dicts with number, title, key, content, prompt_tokens and output_tokens, in section
+            order (the outline is number 0); empty if the document was not generated by section.
+        """
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT s.number, s.title, s.request_key, s.prompt_tokens, s.output_tokens, b.codec, b.data "
+                "FROM document_sections s JOIN blobs b ON b.hash = s.content_hash WHERE s.doc_id = ? "
+                "ORDER BY s.number",
+                (doc_id,),
+            ).fetchall()
+        return [
+            {
+                "number": row["number"],
+                "title": row["title"],
+                "key": row["request_key"],
+                "content": _decompress(row["codec"], row["data"]).decode(),
+                "prompt_tokens": row["prompt_tokens"],
+                "output_tokens": row["output_tokens"],
+            }
+            for row in rows
+        ]
+
+    def list(self, doc_type=None, business_name=None, prompt_hash=None, limit=20, offset=0):
+        """
+        List document metadata (without content), newest first.
+
+        Args:
+            doc_type (str, optional): Only documents of this type.
+            business_name (str, optional): Only documents about this business.
+            prompt_hash (str, optional): Only documents produced by this prompt.
+            limit (int, optional): Maximum number of documents.
+            offset (int, optional): Number of documents to skip.
+
+        Returns:
+            list: Dicts with id, type, business_name, prompt_hash, content_hash and created.
+        """
+        filters, params = [], []
+        for column, value in (("doc_type", doc_type), ("business_name", business_name), ("prompt_hash", prompt_hash)):
+            if value is not None:
+                filters.append(f"{column} = ?")
+                params.append(value)
+        where = f"WHERE {' AND '.join(filters)}" if filters else ""
+        with self._connect() as conn:
+            rows = conn.execute(
+                f"SELECT id, doc_type, business_name, prompt_hash, content_hash, created FROM documents {where} "
+                "ORDER BY created DESC LIMIT ? OFFSET ?",
+                (*params, limit, offset),
+            ).fetchall()
+        return [
+            {
+                "id": row["id"],
+                "type": row["doc_type"],
+                "business_name": row["business_name"],
+                "prompt_hash": row["prompt_hash"],
+                "content_hash": row["content_hash"],
+                "created": row["created"],
+            }
+            for row in rows
+        ]
+
+
+# Function to open the process-wide document store the first time a document is saved or read
+@functools.cache
+def get_document_store():
+    """
+    Return the document store shared by every Streamlit session of the process.
+
+    Opening it indexes the documents stored before the section index existed, so this happens on
+    first use rather than at import. Documents are only copied to the shared state when it spans hosts.
+
+    Returns:
+        DocumentStore: The process-wide document store.
+    """
+    shared_state = get_shared_state()
+    return DocumentStore(state=shared_state if shared_state.distributed else None)
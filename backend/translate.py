@@ -0,0 +1,225 @@
+import hashlib
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from backend.cache import get_response_cache
+from backend.gemini import generate_gemini, generate_gemini_response, request_key
+from backend.langchain import Prompt
+from backend.metrics import metrics
+from backend.ratelimit import estimate_tokens
+from backend.search import HEADING_PATTERN
+
+# Language documents are generated in when they are translated afterwards (the `language` of the templates)
+CANONICAL_LANGUAGE = os.environ.get("STARTUPDOC_CANONICAL_LANGUAGE", "English")
+# Upper bound on concurrent section translations for one document
+TRANSLATION_WORKERS = int(os.environ.get("STARTUPDOC_TRANSLATION_WORKERS", 6))
+# Document type of translation requests, which the router sends to the cheaper model first
+TRANSLATION_DOCUMENT_TYPE = "translation"
+# Translations may need several times the tokens of the source (e.g. Devanagari script)
+MAX_TRANSLATION_OUTPUT_TOKENS = 8192
+
+TRANSLATION_TEMPLATE = """Translate the following section of a document from {source_language} into {language}.
+Keep the Markdown structure (headings, lists, tables and emphasis), numbers, amounts, dates, names of
+people, companies and products exactly as they are. Return only the translated section.
+
+{section}"""
+
+
+# Function to pick the language the templates are filled in with
+def prompt_language(language, translate):
+    """
+    Return the language a document is generated in.
+
+    Args:
+        language (str): Language the reader asked for.
+        translate (bool): Whether the document is generated once in CANONICAL_LANGUAGE and translated.
+
+    Returns:
+        str: CANONICAL_LANGUAGE when translating, `language` otherwise.
+    """
+    return CANONICAL_LANGUAGE if translate else language
+
+
+# Function to identify the translation of a document for caching
+def translation_key(content, language):
+    """
+    Return the cache key of a document translated into a language.
+
+    Args:
+        content (str): The document in CANONICAL_LANGUAGE.
+        language (str): Target language.
+
+    Returns:
+        str: SHA-256 hex digest of the document and language.
+    """
+    payload = json.dumps(["translation", CANONICAL_LANGUAGE, language, content])
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+# Function to identify a translated generation before the canonical document exists
+def translated_request_key(context, prompt, language):
+    """
+    Return the key of a request generated in CANONICAL_LANGUAGE and translated into `language`.
+
+    Args:
+        context (str): Context for the prompt.
+        prompt (str): Prompt crafted in CANONICAL_LANGUAGE.
+        language (str): Target language.
+
+    Returns:
+        str: SHA-256 hex digest, distinct per target language (for job de-duplication and the document store).
+    """
+    return hashlib.sha256(json.dumps([request_key(context, prompt), language]).encode()).hexdigest()
+
+
+# Function to rank heading styles, shallowest first: "#" to "######", then "**1. Title**", then "1. **Title**"
+def _heading_level(match):
+    marker = match.group(0).lstrip()
+    if marker.startswith("#"):
+        return len(marker) - len(marker.lstrip("#"))
+    return 7 if marker.startswith("**") else 8
+
+
+def split_sections(content):
+    """
+    Split a markdown document at the headings of its sections.
+
+    Sections start at the shallowest heading style used at least twice (e.g. "## 1. Market" or
+    "**1. Market**"), so a document title or numbered bold list items inside sections do not
+    split the document any further.
+
+    Args:
+        content (str): Markdown document.
+
+    Returns:
+        list: Sections (the text before the first heading included), which join back into `content`.
+    """
+    matches = list(HEADING_PATTERN.finditer(content))
+    levels = [_heading_level(match) for match in matches]
+    level = min((level for level in set(levels) if levels.count(level) > 1), default=None)
+    starts = [match.start() for match, match_level in zip(matches, levels) if match_level == level]
+    bounds = sorted({0, len(content), *starts})
+    return [content[start:end] for start, end in zip(bounds, bounds[1:])]
+
+
+def _translate_section(section, language):
+    text = section.strip()
+    if not text:
+        return section
+    prompt = Prompt(
+        TRANSLATION_TEMPLATE.format(source_language=CANONICAL_LANGUAGE, language=language, section=text),
+        document_type=TRANSLATION_DOCUMENT_TYPE,
+        max_output_tokens=min(MAX_TRANSLATION_OUTPUT_TOKENS, 4 * estimate_tokens(text) + 256),
+    )
+    # Sections are cached like any other request, so sections shared by two versions are translated once
+    translated = generate_gemini_response("", prompt)["content"].strip()
+    # The whitespace around the section keeps the translated sections apart when they are joined
+    return section[:len(section) - len(section.lstrip())] + translated + section[len(section.rstrip()):]
+
+
+def stream_translation(content, language, max_workers=TRANSLATION_WORKERS):
+    """
+    Translate a document section by section, running the sections concurrently.
+
+    Whole translations are cached per (document, language), and each section request goes through
+    the response cache, so translating a document again, or a new version of it, only calls the
+    model for sections that changed.
+
+    Args:
+        content (str): Markdown document in CANONICAL_LANGUAGE.
+        language (str): Target language.
+        max_workers (int, optional): Maximum number of section requests in flight at once.
+
+    Yields:
+        str: The translated sections in document order, each as soon as it (and every section
+        before it) is translated.
+
+    Raises:
+        AllModelsFailed: If a section could not be translated (chained to the last model's error).
+    """
+    if language == CANONICAL_LANGUAGE or not content.strip():
+        yield content
+        return
+    key = translation_key(content, language)
+    cached = get_response_cache().get(key)
+    if cached is not None:
+        metrics.count("translation_cache_hits", language=language)
+        yield cached
+        return
+
+    sections = split_sections(content)
+    translated = []
+    with metrics.span("translate", language=language) as attributes:
+        attributes["sections"] = len(sections)
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(sections)))) as executor:
+            futures = [executor.submit(_translate_section, section, language) for section in sections]
+            try:
+                # Waiting on the futures in submission order keeps the output in document order
+                for future in futures:
+                    translated.append(future.result())
+                    yield translated[-1]
+            finally:
+                for future in futures:
+                    future.cancel()
+    get_response_cache().set(key, "".join(translated))
+
+
+def translate_document(content, language, max_workers=TRANSLATION_WORKERS):
+    """
+    Translate a document (see `stream_translation`).
+
+    Args:
+        content (str): Markdown document in CANONICAL_LANGUAGE.
+        language (str): Target language.
+        max_workers (int, optional): Maximum number of section requests in flight at once.
+
+    Returns:
+        str: The translated document.
+
+    Raises:
+        AllModelsFailed: If a section could not be translated (chained to the last model's error).
+    """
+    return "".join(stream_translation(content, language, max_workers))
+
+
+# Function to look up a translation without calling the model
+def cached_translation(context, prompt, language):
+    """
+    Return the cached translation of a request's document, if both were generated before.
+
+    Args:
+        context (str): Context for the prompt.
+        prompt (str): Prompt crafted in CANONICAL_LANGUAGE.
+        language (str): Target language.
+
+    Returns:
+        str: The translated document, or None if the document or its translation is not cached.
+    """
+    canonical = get_response_cache().get(request_key(context, prompt))
+    if canonical is None:
+        return None
+    if language == CANONICAL_LANGUAGE:
+        return canonical
+    return get_response_cache().get(translation_key(canonical, language))
+
+
+def stream_translated(context, prompt, language):
+    """
+    Generate a document once in CANONICAL_LANGUAGE and stream its translation into `language`.
+
+    The canonical document is served from the response cache when any language was generated
+    before, so each further language only costs the translation.
+
+    Args:
+        context (str): Context for the prompt.
+        prompt (str): Prompt crafted in CANONICAL_LANGUAGE (see `prompt_language`).
+        language (str): Target language.
+
+    Yields:
+        str: The translated sections in document order.
+
+    Raises:
+        AllModelsFailed: If the generation or a translation failed.
+    """
+    yield from stream_translation(generate_gemini(context, prompt), language)
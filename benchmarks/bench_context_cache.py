@@ -0,0 +1,97 @@
+"""
+Benchmark of explicit context caching on repeated-context workloads.
+
+Generates the investor pack in two tones for several companies with a large shared context,
+against the stub model backend (which emulates context caching and charges input processing time
+for uncached input tokens), once with the context cache enabled and once without. Reports input
+tokens processed (uncached), input tokens served from cached contexts and time to first token.
+
+Run from the repository root:
+    python -m benchmarks.bench_context_cache
+    python -m benchmarks.bench_context_cache --companies 5 --context-tokens 20000
+"""
+import argparse
+import os
+import time
+
+# The response cache and client-side throttling would hide the effect (set before importing backend)
+os.environ.setdefault("STARTUPDOC_BACKEND", "stub")
+os.environ.setdefault("STARTUPDOC_CACHE_PATH", "")
+os.environ.setdefault("STARTUPDOC_CACHE_MAX_ENTRIES", "0")
+os.environ.setdefault("STARTUPDOC_REQUESTS_PER_MINUTE", "100000000")
+os.environ.setdefault("STARTUPDOC_TOKENS_PER_MINUTE", "100000000000")
+os.environ.setdefault("STARTUPDOC_STUB_FIRST_TOKEN_SECONDS", "0.05")
+os.environ.setdefault("STARTUPDOC_STUB_TOKENS_PER_SECOND", "20000")
+
+import backend.gemini  # noqa: E402
+from backend.batch import INVESTOR_PACK  # noqa: E402
+from backend.cache import ContextCache  # noqa: E402
+from backend.langchain import build_context, craft_prompt  # noqa: E402
+
+TONES = ["formal", "inspirational"]
+SAMPLE_SENTENCE = (
+    "Acme {n} reconciles payments across banks for small businesses, with open banking connectors, "
+    "real-time matching and audit trails that replace spreadsheet-based month-end closing. "
+)
+
+
+def make_inputs(company, context_tokens):
+    # Long research notes make up most of the context, like pasted market studies or data rooms
+    notes = SAMPLE_SENTENCE.format(n=company) * (context_tokens * 4 // len(SAMPLE_SENTENCE))
+    return {
+        "business_name": f"Acme {company}",
+        "startup_domain": "FinTech",
+        "target_market": notes,
+    }
+
+
+def run(companies, context_tokens):
+    first_token, input_tokens, cached_tokens = [], 0, 0
+    for company in range(companies):
+        # A context budget above the notes' size keeps them intact
+        context = build_context(make_inputs(company, context_tokens), field_token_budget=context_tokens * 2)
+        for tone in TONES:
+            for document_type in INVESTOR_PACK:
+                prompt = craft_prompt("Write the document.", document_type, "English", tone)
+                start = time.perf_counter()
+                chunks = backend.gemini.stream_gemini(context, prompt)
+                next(chunks)
+                first_token.append(time.perf_counter() - start)
+                for _ in chunks:
+                    pass
+    for usage in backend.gemini.token_usage().values():
+        input_tokens += usage["input_tokens"] - usage["cached_input_tokens"]
+        cached_tokens += usage["cached_input_tokens"]
+    first_token.sort()
+    return {
+        "requests": len(first_token),
+        "uncached_input_tokens": input_tokens,
+        "cached_input_tokens": cached_tokens,
+        "ttft_p50": first_token[len(first_token) // 2],
+        "ttft_p95": first_token[min(len(first_token) - 1, int(round(0.95 * (len(first_token) - 1))))],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--companies", type=int, default=3)
+    parser.add_argument("--context-tokens", type=int, default=40_000)
+    args = parser.parse_args()
+
+    results = {}
+    for name, enabled in (("uncached", False), ("context cache", True)):
+        backend.gemini.context_cache = ContextCache(enabled=enabled)
+        backend.gemini._token_usage.clear()
+        results[name] = run(args.companies, args.context_tokens)
+        result = results[name]
+        print(f"{name:<14}: {result['requests']} requests, {result['uncached_input_tokens']:,} input tokens processed, "
+              f"{result['cached_input_tokens']:,} from cache, time to first token p50 {result['ttft_p50'] * 1000:.0f} ms "
+              f"p95 {result['ttft_p95'] * 1000:.0f} ms")
+        print(f"{'':<16}{backend.gemini.context_cache.stats()}")
+    baseline, cached = results["uncached"], results["context cache"]
+    print(f"Input tokens processed: -{1 - cached['uncached_input_tokens'] / baseline['uncached_input_tokens']:.0%}, "
+          f"time to first token p50: -{1 - cached['ttft_p50'] / baseline['ttft_p50']:.0%}")
+
+
+if __name__ == "__main__":
+    main()
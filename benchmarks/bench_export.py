@@ -0,0 +1,85 @@
+"""
+Benchmark of document export to DOCX, PDF and PPTX.
+
+Renders a long generated document to every available format, in the calling process and through
+the export process pool, then again from the export cache. While rendering, a heartbeat thread
+ticks every millisecond; its longest stall shows how long other threads of the process (e.g.
+Streamlit sessions) would be held up by the render.
+
+Run from the repository root:
+    python -m benchmarks.bench_export
+    python -m benchmarks.bench_export --sections 40 --repeats 5
+"""
+import argparse
+import threading
+import time
+
+from backend.export import ExportCache, available_formats, render_export
+
+SECTION = """## {n}. Market Opportunity
+
+Small businesses **lose 12 hours a month** reconciling payments by hand; *Acme* automates it.
+
+- Open banking connectors for 40 banks
+  - Real-time matching with audit trails
+- Pricing from $49 per month
+1. Pilot with 20 accountants
+2. Launch in three regions
+
+| Segment | Customers | Revenue |
+|---|---|---|
+| Retail | 1,200 | $0.7M |
+"""
+
+
+# Function to measure the longest stall of a thread ticking every millisecond while `work` runs
+def longest_stall(work):
+    stop, stalls = threading.Event(), [0.0]
+
+    def heartbeat():
+        last = time.perf_counter()
+        while not stop.is_set():
+            time.sleep(0.001)
+            now = time.perf_counter()
+            stalls[0] = max(stalls[0], now - last)
+            last = now
+
+    thread = threading.Thread(target=heartbeat)
+    thread.start()
+    start = time.perf_counter()
+    work()
+    elapsed = time.perf_counter() - start
+    stop.set()
+    thread.join()
+    return elapsed, stalls[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sections", type=int, default=20)
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    content = "# Business Plan\n\n" + "\n".join(SECTION.format(n=n + 1) for n in range(args.sections))
+    cache = ExportCache(path="")
+    print(f"Document: {len(content):,} characters, {args.sections} sections")
+    for export_format in available_formats():
+        cache.get(content + "\nwarm-up", export_format)  # Starts the pool and imports the library in a worker
+        render_export(content, export_format)
+        for name, render in (
+            ("in process", lambda: render_export(content, export_format, "Business Plan")),
+            ("process pool", lambda: cache.get(content + f"\n{time.perf_counter()}", export_format, "Business Plan")),
+        ):
+            runs = [longest_stall(render) for _ in range(args.repeats)]
+            print(f"{export_format:<5} {name:<13}: render {min(elapsed for elapsed, _ in runs) * 1000:7.1f} ms  "
+                  f"longest stall of other threads {max(stall for _, stall in runs) * 1000:6.1f} ms")
+        cache.get(content, export_format, "Business Plan")
+        start = time.perf_counter()
+        for _ in range(1000):
+            cache.get(content, export_format, "Business Plan")
+        print(f"{export_format:<5} {'cached':<13}: {(time.perf_counter() - start) * 1000:7.3f} µs per download")
+    print(cache.stats())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+Import-time profile and startup budget check.
+
+Imports each entry point in a fresh interpreter with `python -X importtime`, several times, and
+compares the best cumulative import time (the least disturbed by other load on the machine) against
+the budgets tracked in import_budget.json.
+The app's own imports (everything app.py imports, Streamlit excluded) are measured after Streamlit
+is loaded, so the budget covers what this repository controls. Exits with status 1 when an entry
+point is over budget and lists its heaviest imports.
+
+Run from the repository root:
+    python -m benchmarks.bench_import_time
+    python -m benchmarks.bench_import_time --runs 9 --update   # re-baseline after an intended change
+"""
+import argparse
+import ast
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+BUDGET_PATH = os.path.join(os.path.dirname(__file__), "import_budget.json")
+# Head room applied to the measured time when the budgets are re-baselined (relative, and at least
+# an absolute margin so small budgets do not trip on timer noise)
+BUDGET_HEADROOM = 1.5
+BUDGET_MIN_HEADROOM_MS = 25
+
+
+# Function to list the modules app.py imports at the top level
+def app_imports(path="app.py"):
+    with open(path) as f:
+        tree = ast.parse(f.read())
+    modules = []
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            modules += [alias.name for alias in node.names]
+        elif isinstance(node, ast.ImportFrom) and node.level == 0:
+            modules.append(node.module)
+    return [module for module in dict.fromkeys(modules) if module.split(".")[0] != "streamlit"]
+
+
+def entry_points():
+    # name -> (modules imported first and not counted, modules measured)
+    return {
+        "streamlit": ([], ["streamlit"]),
+        "app imports": (["streamlit"], app_imports()),
+        "backend.cli": ([], ["backend.cli"]),
+        "backend.api": ([], ["backend.api"]),
+    }
+
+
+def profile(preload, modules):
+    """
+    Import modules in a fresh interpreter and parse its `-X importtime` report.
+
+    Args:
+        preload (list): Modules imported first, whose time is not counted.
+        modules (list): Modules whose import time is measured.
+
+    Returns:
+        tuple: Total cumulative import time of `modules` in ms, and a dict of the cumulative time
+        (ms) of every module imported on their behalf.
+    """
+    code = "".join(f"import {module}\n" for module in preload + modules)
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code], capture_output=True, text=True, check=True,
+        # Offline backend, so no entry point can reach for credentials while importing
+        env={**os.environ, "STARTUPDOC_BACKEND": "stub"},
+    )
+    lines = [line for line in result.stderr.splitlines() if line.startswith("import time:") and "|" in line][1:]
+    # A module is reported after everything it imports, so interpreter startup (which ends with `site`)
+    # and the preload end at the last top-level line of one of them
+    start = 0
+    for i, line in enumerate(lines):
+        if line.split("|")[2][1:] in ("site", *preload):
+            start = i + 1
+    total, modules_ms = 0.0, {}
+    for line in lines[start:]:
+        _, cumulative, name = line.split("|")
+        milliseconds = int(cumulative) / 1000
+        modules_ms[name.strip()] = milliseconds
+        if not name.startswith("  ", 1):  # Top-level imports (nested ones are part of their parent's time)
+            total += milliseconds
+    return total, modules_ms
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--update", action="store_true", help="rewrite the budgets from this run's timings")
+    args = parser.parse_args()
+
+    budgets = {}
+    if os.path.exists(BUDGET_PATH):
+        with open(BUDGET_PATH) as f:
+            budgets = json.load(f)
+
+    over_budget, timings = False, {}
+    for name, (preload, modules) in entry_points().items():
+        runs = [profile(preload, modules) for _ in range(args.runs)]
+        best_total, best_modules = min(runs, key=lambda run: run[0])
+        timings[name] = best_total
+        budget = budgets.get(name)
+        status = "no budget" if budget is None else ("ok" if best_total <= budget else "OVER BUDGET")
+        print(f"{name:<12}: best {best_total:7.1f} ms  median {statistics.median(total for total, _ in runs):7.1f} ms  "
+              f"budget {budget or '-':>5} ms  {status}")
+        if budget is not None and best_total > budget:
+            over_budget = True
+            heaviest = sorted(best_modules.items(), key=lambda item: -item[1])[:10]
+            for module, milliseconds in heaviest:
+                print(f"    {milliseconds:7.1f} ms  {module}")
+
+    if args.update:
+        with open(BUDGET_PATH, "w") as f:
+            json.dump({
+                name: round(max(best * BUDGET_HEADROOM, best + BUDGET_MIN_HEADROOM_MS))
+                for name, best in timings.items()
+            }, f, indent=2)
+            f.write("\n")
+        print(f"Budgets written to {BUDGET_PATH}")
+        return 0
+    return 1 if over_budget else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,216 @@
+"""
+End-to-end benchmark of the prompt -> generate -> render -> download pipeline.
+
+Runs every document type at several input sizes against the stub model backend (no API calls),
+then simulates concurrent sessions, and reports p50/p95/p99 latency per stage, throughput and
+peak memory. Results are written as JSON so runs on different commits can be compared.
+
+Run from the repository root:
+    python -m benchmarks.bench_pipeline
+    python -m benchmarks.bench_pipeline --sessions 16 --compare benchmarks/results/<old commit>.json
+"""
+import argparse
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import time
+import tracemalloc
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+# Benchmark the stub model with caching and client-side throttling out of the way (set before importing backend)
+os.environ.setdefault("STARTUPDOC_BACKEND", "stub")
+os.environ.setdefault("STARTUPDOC_CACHE_PATH", "")
+os.environ.setdefault("STARTUPDOC_CACHE_MAX_ENTRIES", "0")
+os.environ.setdefault("STARTUPDOC_REQUESTS_PER_MINUTE", "100000000")
+os.environ.setdefault("STARTUPDOC_TOKENS_PER_MINUTE", "100000000000")
+os.environ.setdefault("STARTUPDOC_STUB_FIRST_TOKEN_SECONDS", "0.05")
+os.environ.setdefault("STARTUPDOC_STUB_TOKENS_PER_SECOND", "20000")
+
+from backend.export import encode_document  # noqa: E402
+from backend.gemini import generate_gemini_response  # noqa: E402
+from backend.langchain import DOCUMENT_TITLES, build_context, craft_prompt  # noqa: E402
+
+try:
+    import markdown
+except ImportError:  # Rendering is skipped (and reported as null) without the markdown package
+    markdown = None
+
+STAGES = ["craft_prompt", "generate", "render", "download", "total"]
+# Earlier names of stages, so results of older commits still compare
+STAGE_ALIASES = {"download": "download_link"}
+
+# Repetitions of a sample sentence per input field
+INPUT_SIZES = {"small": 1, "medium": 10, "large": 100}
+SAMPLE_FIELDS = {
+    "business_name": "Acme Analytics",
+    "startup_domain": "FinTech",
+    "target_market": "Small and medium businesses that reconcile payments across several banks by hand.",
+    "competitors": "Legacy accounting suites and spreadsheet-based consultants with slow onboarding.",
+    "market_trends": "Open banking APIs and real-time payments are making automated reconciliation viable.",
+    "revenue_projections": "Subscription revenue growing from $0.5M in year one to $6M in year three.",
+}
+
+
+def make_inputs(size):
+    repeat = INPUT_SIZES[size]
+    return {key: value if key in ("business_name", "startup_domain") else " ".join([value] * repeat)
+            for key, value in SAMPLE_FIELDS.items()}
+
+
+def run_pipeline(document_type, user_inputs):
+    timings = {}
+    start = time.perf_counter()
+
+    context = build_context(user_inputs)
+    prompt = craft_prompt(DOCUMENT_TITLES[document_type], document_type, "English", "formal")
+    timings["craft_prompt"] = time.perf_counter() - start
+
+    stage = time.perf_counter()
+    content = generate_gemini_response(context, prompt)["content"]
+    timings["generate"] = time.perf_counter() - stage
+
+    stage = time.perf_counter()
+    if markdown is not None:
+        markdown.markdown(content)
+        timings["render"] = time.perf_counter() - stage
+    else:
+        timings["render"] = None
+
+    stage = time.perf_counter()
+    encode_document(uuid.uuid4().hex, content)
+    timings["download"] = time.perf_counter() - stage
+
+    timings["total"] = time.perf_counter() - start
+    return timings
+
+
+def percentiles(values):
+    values = sorted(value for value in values if value is not None)
+    if not values:
+        return None
+
+    def rank(pct):
+        return values[min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))]
+
+    return {"p50": rank(50), "p95": rank(95), "p99": rank(99), "mean": sum(values) / len(values), "n": len(values)}
+
+
+def summarize(runs):
+    return {stage: percentiles([run[stage] for run in runs]) for stage in STAGES}
+
+
+def bench_latency(iterations):
+    results = {}
+    for document_type in DOCUMENT_TITLES:
+        results[document_type] = {}
+        for size in INPUT_SIZES:
+            user_inputs = make_inputs(size)
+            results[document_type][size] = summarize([run_pipeline(document_type, user_inputs) for _ in range(iterations)])
+    return results
+
+
+def bench_throughput(sessions, requests_per_session):
+    rng = random.Random(0)
+    workload = [
+        (rng.choice(list(DOCUMENT_TITLES)), rng.choice(list(INPUT_SIZES)))
+        for _ in range(sessions * requests_per_session)
+    ]
+
+    def session(jobs):
+        return [run_pipeline(document_type, make_inputs(size)) for document_type, size in jobs]
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=sessions) as executor:
+        runs = [run for batch in executor.map(session, [workload[i::sessions] for i in range(sessions)]) for run in batch]
+    wall_time = time.perf_counter() - start
+    return {
+        "sessions": sessions,
+        "requests": len(runs),
+        "wall_time": wall_time,
+        "documents_per_second": len(runs) / wall_time,
+        "latency": summarize(runs),
+    }
+
+
+def bench_memory():
+    tracemalloc.start()
+    for document_type in DOCUMENT_TITLES:
+        run_pipeline(document_type, make_inputs("large"))
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    # ru_maxrss is reported in kilobytes on Linux and bytes on macOS
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * (1 if sys.platform == "darwin" else 1024)
+    return {"traced_peak_bytes": peak, "max_rss_bytes": max_rss}
+
+
+def current_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def compare(result, baseline):
+    print(f"\nComparison with {baseline.get('commit', 'baseline')}:")
+    rows = [("throughput docs/s", baseline["throughput"]["documents_per_second"], result["throughput"]["documents_per_second"])]
+    for pct in ("p50", "p95", "p99"):
+        for stage in STAGES:
+            latency = baseline["throughput"]["latency"]
+            old = (latency.get(stage) or latency.get(STAGE_ALIASES.get(stage)) or {}).get(pct)
+            new = (result["throughput"]["latency"].get(stage) or {}).get(pct)
+            if old is not None and new is not None:
+                rows.append((f"{stage} {pct} s", old, new))
+    rows.append(("traced peak bytes", baseline["memory"]["traced_peak_bytes"], result["memory"]["traced_peak_bytes"]))
+    for name, old, new in rows:
+        change = (new - old) / old * 100 if old else 0.0
+        print(f"  {name:<24} {old:>14.6g} -> {new:<14.6g} ({change:+.1f}%)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=5, help="runs per document type and input size")
+    parser.add_argument("--sessions", type=int, default=8, help="concurrent simulated sessions")
+    parser.add_argument("--requests-per-session", type=int, default=10)
+    parser.add_argument("--output", help="JSON results path (default: benchmarks/results/<commit>.json)")
+    parser.add_argument("--compare", help="previous JSON results to compare against")
+    args = parser.parse_args()
+
+    result = {
+        "commit": current_commit(),
+        "timestamp": time.time(),
+        "config": {**vars(args), "backend": os.environ["STARTUPDOC_BACKEND"],
+                   "stub_first_token_seconds": float(os.environ["STARTUPDOC_STUB_FIRST_TOKEN_SECONDS"]),
+                   "stub_tokens_per_second": float(os.environ["STARTUPDOC_STUB_TOKENS_PER_SECOND"])},
+        "latency": bench_latency(args.iterations),
+        "throughput": bench_throughput(args.sessions, args.requests_per_session),
+        "memory": bench_memory(),
+    }
+
+    output = args.output or os.path.join("benchmarks", "results", f"{result['commit']}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(result, f, indent=2)
+
+    throughput = result["throughput"]
+    print("Latency per document type (total, input size large):")
+    for document_type, sizes in result["latency"].items():
+        total = sizes["large"]["total"]
+        print(f"  {document_type:<24} p50 {total['p50'] * 1000:8.1f} ms  p95 {total['p95'] * 1000:8.1f} ms  "
+              f"p99 {total['p99'] * 1000:8.1f} ms")
+    print(f"Throughput: {throughput['documents_per_second']:.1f} documents/s with {throughput['sessions']} sessions")
+    print(f"Peak traced memory: {result['memory']['traced_peak_bytes'] / 1024:.0f} KiB")
+    print(f"Results written to {output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(result, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""
+Micro-benchmark of the per-request setup overhead before any model call is made.
+
+Compares the old behaviour (rebuilding the template dicts, PromptTemplate and GenerativeModel
+on every request) with the process-wide template registry and pooled model clients.
+
+Run from the repository root (needs a Gemini API key configured; no API request is sent):
+    python -m benchmarks.bench_request_overhead
+"""
+import timeit
+
+import google.generativeai as genai
+from langchain.prompts import PromptTemplate
+
+from backend.gemini import MODEL_NAME, get_model_backend
+from backend.langchain import TEMPLATES, TONE_STYLES, craft_prompt
+
+ITERATIONS = 2000
+
+
+def per_call_setup(document_type, tone):
+    # Mirrors the original code path: fresh dict copies, template parsing and model client per request
+    tone_styles = dict(TONE_STYLES)
+    templates = dict(TEMPLATES)
+    tone_styles.get(tone, tone_styles["Neutral"])
+    prompt_template = PromptTemplate(
+        input_variables=["query", "language", "tone"],
+        template=templates.get(document_type, templates["business_plan"]).strip(),
+    )
+    prompt = prompt_template.format(query="Business Plan", language="English", tone=tone)
+    genai.GenerativeModel(MODEL_NAME)
+    return prompt
+
+
+def registry_setup(document_type, tone):
+    prompt = craft_prompt("Business Plan", document_type, "English", tone)
+    get_model_backend()
+    return prompt
+
+
+def main():
+    for name, func in [("per-call construction", per_call_setup), ("registry + model pool", registry_setup)]:
+        func("business_plan", "formal")  # Warm up: first-use client configuration is not per-request overhead
+        seconds = timeit.timeit(lambda: func("business_plan", "formal"), number=ITERATIONS)
+        print(f"{name:>24}: {seconds / ITERATIONS * 1e6:8.1f} µs/request")
+
+
+if __name__ == "__main__":
+    main()
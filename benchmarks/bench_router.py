@@ -0,0 +1,94 @@
+"""
+Benchmark of model routing with hedging and fallback against slow and failing models.
+
+Emulates a primary model with a slow tail (a few calls take seconds longer) or with transient
+failures, and a faster secondary model, using the stub backend. Sends the same requests with the
+primary model alone and through a route that hedges with and falls back to the secondary model,
+and reports latency percentiles, failed requests and how the router spread the calls.
+
+Run from the repository root:
+    python -m benchmarks.bench_router
+    python -m benchmarks.bench_router --requests 400 --concurrency 16
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Stub models, no caching or throttling, and one attempt per model so failures reach the router
+# (set before importing backend)
+os.environ.setdefault("STARTUPDOC_BACKEND", "stub")
+os.environ.setdefault("STARTUPDOC_CACHE_PATH", "")
+os.environ.setdefault("STARTUPDOC_CACHE_MAX_ENTRIES", "0")
+os.environ.setdefault("STARTUPDOC_CONTEXT_CACHE", "0")
+os.environ.setdefault("STARTUPDOC_REQUESTS_PER_MINUTE", "100000000")
+os.environ.setdefault("STARTUPDOC_TOKENS_PER_MINUTE", "100000000000")
+os.environ.setdefault("STARTUPDOC_STUB_TOKENS_PER_SECOND", "0")
+os.environ.setdefault("STARTUPDOC_MAX_ATTEMPTS", "1")
+os.environ.setdefault("STARTUPDOC_ROUTER_MIN_HEDGE_SECONDS", "0.05")
+
+import backend.gemini  # noqa: E402
+import backend.models  # noqa: E402
+from backend.router import FLASH_MODEL, PRO_MODEL, ModelRouter  # noqa: E402
+
+SCENARIOS = {
+    "slow tail": {
+        PRO_MODEL: {"first_token_seconds": 0.2, "slow_rate": 0.04, "slow_seconds": 2.0},
+        FLASH_MODEL: {"first_token_seconds": 0.1},
+    },
+    "failing primary": {
+        PRO_MODEL: {"first_token_seconds": 0.2, "failure_rate": 0.3},
+        FLASH_MODEL: {"first_token_seconds": 0.1},
+    },
+}
+ROUTES = {
+    "primary only": {"*": [{"models": [PRO_MODEL]}]},
+    "routed": {"*": [{"models": [PRO_MODEL, FLASH_MODEL], "hedge_after": "auto"}]},
+}
+
+
+def percentile(values, pct):
+    return values[min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))]
+
+
+def run(requests, concurrency):
+    def request(n):
+        start = time.perf_counter()
+        try:
+            backend.gemini.generate_gemini_response("", f"Write update {n} of the quarter.")
+        except Exception:
+            return None
+        return time.perf_counter() - start
+
+    with ThreadPoolExecutor(concurrency) as executor:
+        latencies = list(executor.map(request, range(requests)))
+    return sorted(latency for latency in latencies if latency is not None), latencies.count(None)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    args = parser.parse_args()
+
+    for scenario, stub_models in SCENARIOS.items():
+        print(f"{scenario}:")
+        for name, routes in ROUTES.items():
+            # Fresh stub backends with this scenario's behaviour, and a router without history
+            backend.models.STUB_MODELS.clear()
+            backend.models.STUB_MODELS.update(stub_models)
+            backend.models._backend_pool.clear()
+            backend.gemini.model_router = ModelRouter(routes)
+            latencies, failures = run(args.requests, args.concurrency)
+            spread = ", ".join(
+                f"{model}: {stats['wins']} answered/{stats['calls']} calls, {stats['hedges']} hedged"
+                for model, stats in backend.gemini.model_router.stats().items()
+            )
+            print(f"  {name:<13}: p50 {percentile(latencies, 50) * 1000:6.0f} ms  "
+                  f"p95 {percentile(latencies, 95) * 1000:6.0f} ms  p99 {percentile(latencies, 99) * 1000:6.0f} ms  "
+                  f"failed {failures}/{args.requests}")
+            print(f"  {'':<15}{spread}")
+
+
+if __name__ == "__main__":
+    main()
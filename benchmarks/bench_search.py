@@ -0,0 +1,107 @@
+"""
+Benchmark of full-text and similarity search over document sections.
+
+Fills a temporary document store with synthetic documents (100k sections by default), then
+reports p50/p95/p99 query latency for `SectionIndex.search` and `SectionIndex.similar`.
+
+Run from the repository root:
+    python -m benchmarks.bench_search
+    python -m benchmarks.bench_search --sections 20000 --queries 200
+"""
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+import time
+import uuid
+
+from backend.langchain import DOCUMENT_TITLES, TEMPLATE_SECTIONS
+from backend.store import DocumentStore
+
+# Synthetic vocabulary with a Zipf-like word frequency distribution, like natural text
+SYLLABLES = "ba co de fi gu ha jo ki lu ma ne po qui ra se ti vo wa xe yu zo".split()
+VOCABULARY_SIZE = 20_000
+
+
+def make_vocabulary(rng):
+    words = sorted({"".join(rng.choices(SYLLABLES, k=rng.randint(2, 4))) for _ in range(VOCABULARY_SIZE * 2)})
+    rng.shuffle(words)
+    words = words[:VOCABULARY_SIZE]
+    cumulative, total = [], 0.0
+    for rank in range(1, len(words) + 1):
+        total += 1.0 / rank
+        cumulative.append(total)
+    return words, cumulative
+
+
+def fill_store(store, sections, sections_per_document, rng, vocabulary):
+    words, cumulative = vocabulary
+    documents = sections // sections_per_document
+    conn = sqlite3.connect(store.path)
+    with conn:
+        for _ in range(documents):
+            document_type = rng.choice(list(DOCUMENT_TITLES))
+            titles = [section["title"] for section in TEMPLATE_SECTIONS[document_type]["sections"]]
+            content = "\n\n".join(
+                f"## {number}. {titles[(number - 1) % len(titles)]}\n\n" + " ".join(rng.choices(words, cum_weights=cumulative, k=120))
+                for number in range(1, sections_per_document + 1)
+            )
+            doc_id = uuid.uuid4().hex
+            conn.execute(
+                "INSERT INTO blobs (hash, codec, size, data) VALUES (?, 'raw', ?, ?)",
+                (doc_id, len(content), content.encode()),
+            )
+            conn.execute(
+                "INSERT INTO documents (id, doc_type, business_name, prompt_hash, content_hash, created) "
+                "VALUES (?, ?, ?, NULL, ?, ?)",
+                (doc_id, DOCUMENT_TITLES[document_type], f"Startup {rng.randrange(1000)}", doc_id, time.time()),
+            )
+            store.sections.index_document(conn, doc_id, content)
+    conn.close()
+    return documents
+
+
+def timed(func, queries):
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        func(query)
+        latencies.append(time.perf_counter() - start)
+    latencies.sort()
+    return {pct: latencies[min(len(latencies) - 1, int(round(pct / 100 * (len(latencies) - 1))))] for pct in (50, 95, 99)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sections", type=int, default=100_000)
+    parser.add_argument("--sections-per-document", type=int, default=5)
+    parser.add_argument("--queries", type=int, default=100)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    with tempfile.TemporaryDirectory() as directory:
+        store = DocumentStore(os.path.join(directory, "documents.sqlite3"))
+        start = time.perf_counter()
+        vocabulary = make_vocabulary(rng)
+        words, cumulative = vocabulary
+        documents = fill_store(store, args.sections, args.sections_per_document, rng, vocabulary)
+        print(f"Indexed {documents * args.sections_per_document:,} sections ({documents:,} documents) "
+              f"in {time.perf_counter() - start:.1f}s")
+
+        queries = [" ".join(rng.choices(words, cum_weights=cumulative, k=3)) for _ in range(args.queries)]
+        passages = [" ".join(rng.choices(words, cum_weights=cumulative, k=60)) for _ in range(args.queries)]
+        doc_type = DOCUMENT_TITLES["business_plan"]
+        for name, func, inputs in (
+            ("full-text search", lambda query: store.sections.search(query, limit=10), queries),
+            ("  + type filter", lambda query: store.sections.search(query, limit=10, doc_type=doc_type), queries),
+            ("similarity search", lambda text: store.sections.similar(text, limit=10), passages),
+            ("  + type filter", lambda text: store.sections.similar(text, limit=10, doc_type=doc_type), passages),
+        ):
+            latency = timed(func, inputs)
+            print(f"{name:<18}: p50 {latency[50] * 1000:6.1f} ms  p95 {latency[95] * 1000:6.1f} ms  "
+                  f"p99 {latency[99] * 1000:6.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Benchmark of the localization fast path: one generation translated into other languages.
+
+Generates the same business plan in several languages, first natively (every language is a full
+generation by the routed model) and then by generating it once in the canonical language and
+translating it section by section. Uses the stub backend: the document model streams the whole
+document, while the translation model answers with about a section's worth of tokens, as a real
+translation would. Reports latency, model calls, output tokens and estimated cost per language.
+
+Run from the repository root:
+    python -m benchmarks.bench_translate
+    python -m benchmarks.bench_translate --languages English Hindi Spanish French German
+"""
+import argparse
+import json
+import os
+import time
+
+# Stub models without caching or throttling across runs (set before importing backend); the
+# canonical document has 6 sections of about 500 tokens
+os.environ.setdefault("STARTUPDOC_BACKEND", "stub")
+os.environ.setdefault("STARTUPDOC_CACHE_PATH", "")
+os.environ.setdefault("STARTUPDOC_CONTEXT_CACHE", "0")
+os.environ.setdefault("STARTUPDOC_REQUESTS_PER_MINUTE", "100000000")
+os.environ.setdefault("STARTUPDOC_TOKENS_PER_MINUTE", "100000000000")
+os.environ.setdefault("STARTUPDOC_STUB_FIRST_TOKEN_SECONDS", "0.3")
+os.environ.setdefault("STARTUPDOC_STUB_TOKENS_PER_SECOND", "1000")
+os.environ.setdefault("STARTUPDOC_STUB_OUTPUT_TOKENS", "3000")
+os.environ.setdefault("STARTUPDOC_STUB_MODELS", json.dumps({"gemini-1.5-flash-latest": {"output_tokens": 600}}))
+
+from backend.batch import generate_batch  # noqa: E402
+from backend.gemini import token_usage  # noqa: E402
+from backend.router import model_router  # noqa: E402
+
+INPUTS = {
+    "business_name": "Acme",
+    "startup_domain": "FinTech",
+    "target_market": "Small businesses reconciling payments by hand",
+    "revenue_model": "Subscriptions from $49 per month",
+}
+
+
+# Function to total the model calls, output tokens and cost recorded so far
+def usage_totals():
+    usage = token_usage().values()
+    return {
+        "calls": sum(values["requests"] for values in usage),
+        "output_tokens": sum(values["output_tokens"] for values in usage),
+        "cost": sum(stats["cost"] for stats in model_router.stats().values()),
+    }
+
+
+def run(name, languages, translate):
+    print(f"{name}:")
+    totals = {"latency": 0.0, "calls": 0, "output_tokens": 0, "cost": 0.0}
+    # Different inputs per mode, so the translated run cannot reuse the native run's documents
+    inputs = {**INPUTS, "business_name": f"{INPUTS['business_name']} ({name})"}
+    for language in languages:
+        before = usage_totals()
+        start = time.perf_counter()
+        result = generate_batch(inputs, ["business_plan"], language, "formal", translate=translate)["results"][0]
+        latency = time.perf_counter() - start
+        after = usage_totals()
+        spent = {key: after[key] - before[key] for key in after}
+        totals["latency"] += latency
+        for key, value in spent.items():
+            totals[key] += value
+        status = f"failed: {result['error']}" if result["error"] else f"{len(result['content']):,} characters"
+        print(f"  {language:<9}: {latency * 1000:6.0f} ms  {spent['calls']:2d} model calls  "
+              f"{spent['output_tokens']:6,} output tokens  ${spent['cost']:.4f}  ({status})")
+    print(f"  {'total':<9}: {totals['latency'] * 1000:6.0f} ms  {totals['calls']:2d} model calls  "
+          f"{totals['output_tokens']:6,} output tokens  ${totals['cost']:.4f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--languages", nargs="+", default=["English", "Hindi", "Spanish"])
+    args = parser.parse_args()
+
+    run("native generation", args.languages, translate=False)
+    run("generate once, translate", args.languages, translate=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""
+Multi-process load test of the state shared by worker processes.
+
+Starts N worker processes against the stub backend, all sharing one state (SQLite and file locks
+on this host, or with --redis a Redis-compatible server), response cache and rate limiter, like
+several Streamlit replicas or API workers. Each worker keeps a fixed number of requests in flight,
+so without contention on the shared state, aggregate throughput grows linearly with N. Then checks
+that the shared rate limit holds for all workers together, and that identical requests sent by
+every worker reach the model once.
+
+Run from the repository root:
+    python -m benchmarks.bench_workers
+    python -m benchmarks.bench_workers --workers 1 2 4 8 --duration 10 --redis
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Stub model with a fixed latency (no output pacing), set before importing backend
+STUB_ENV = {
+    "STARTUPDOC_BACKEND": "stub",
+    "STARTUPDOC_STUB_FIRST_TOKEN_SECONDS": "0.2",
+    "STARTUPDOC_STUB_TOKENS_PER_SECOND": "0",
+    "STARTUPDOC_STUB_OUTPUT_TOKENS": "400",
+    "STARTUPDOC_CONTEXT_CACHE": "0",
+}
+
+
+def worker(args):
+    # Runs in each worker process: sends requests from `concurrency` threads until the deadline
+    import backend.gemini
+
+    time.sleep(max(0.0, args.start_at - time.time()))
+    deadline = args.start_at + args.duration
+    latencies, finished = [], [0.0]
+
+    def loop(thread):
+        n = 0
+        while time.time() < deadline:
+            prompt = (f"Request {n} of all workers." if args.shared_prompts
+                      else f"Request {n} of thread {thread} in worker {args.worker_id}.")
+            start = time.perf_counter()
+            backend.gemini.generate_gemini_response("Write a short shareholder update.\n", prompt)
+            latencies.append(time.perf_counter() - start)
+            finished[0] = max(finished[0], time.time())
+            n += 1
+
+    with ThreadPoolExecutor(args.concurrency) as executor:
+        list(executor.map(loop, range(args.concurrency)))
+    usage = backend.gemini.token_usage()
+    print(json.dumps({
+        "requests": len(latencies),
+        "model_calls": sum(values["requests"] for values in usage.values()),
+        "latency_p50": sorted(latencies)[len(latencies) // 2] if latencies else None,
+        "last_finished": finished[0],
+    }))
+
+
+def run_workers(workers, args, env, shared_prompts=False):
+    start_at = time.time() + 2.0  # Lets every worker finish importing before the clock starts
+    command = [sys.executable, "-m", "benchmarks.bench_workers", "--worker", "--start-at", str(start_at),
+               "--duration", str(args.duration), "--concurrency", str(args.concurrency)]
+    if shared_prompts:
+        command.append("--shared-prompts")
+    processes = [
+        subprocess.Popen(command + ["--worker-id", str(i)], env=env, stdout=subprocess.PIPE, text=True)
+        for i in range(workers)
+    ]
+    results = [json.loads(process.communicate()[0]) for process in processes]
+    return {
+        "requests": sum(result["requests"] for result in results),
+        "model_calls": sum(result["model_calls"] for result in results),
+        "throughput": sum(result["requests"] for result in results) / args.duration,
+        "latency_p50": max(result["latency_p50"] or 0 for result in results),
+        # Requests started before the deadline may finish after it (e.g. after waiting for the rate limit)
+        "elapsed": max(result["last_finished"] for result in results) - start_at,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--concurrency", type=int, default=4, help="requests in flight per worker")
+    parser.add_argument("--duration", type=float, default=5.0)
+    parser.add_argument("--requests-per-minute", type=int, default=300, help="shared quota checked at the end")
+    parser.add_argument("--redis", action="store_true", help="share state through a local Redis stand-in (fakeredis)")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--worker-id", type=int, default=0, help=argparse.SUPPRESS)
+    parser.add_argument("--start-at", type=float, default=0.0, help=argparse.SUPPRESS)
+    parser.add_argument("--shared-prompts", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.worker:
+        return worker(args)
+
+    server = None
+    directory = tempfile.mkdtemp(prefix="startupdoc-workers-")
+    env = {**os.environ, **STUB_ENV,
+           "STARTUPDOC_STATE_URL": os.path.join(directory, "state.sqlite3"),
+           "STARTUPDOC_REQUESTS_PER_MINUTE": "100000000", "STARTUPDOC_TOKENS_PER_MINUTE": "100000000000"}
+    if args.redis:
+        from fakeredis import TcpFakeServer
+
+        server = TcpFakeServer(("127.0.0.1", 0), server_type="redis")
+        host, port = server.server_address
+        ThreadPoolExecutor(1).submit(server.serve_forever)
+        env["STARTUPDOC_STATE_URL"] = f"redis://{host}:{port}/0"
+    print(f"Shared state: {env['STARTUPDOC_STATE_URL']}, {args.concurrency} requests in flight per worker, "
+          f"{float(STUB_ENV['STARTUPDOC_STUB_FIRST_TOKEN_SECONDS']) * 1000:.0f} ms per model call")
+
+    baseline = None
+    for workers in args.workers:
+        # A fresh response cache per run, so every request is a miss that reaches the model
+        run_env = {**env, "STARTUPDOC_CACHE_PATH": os.path.join(directory, f"responses-{workers}.sqlite3")}
+        result = run_workers(workers, args, run_env)
+        baseline = baseline or result["throughput"] / workers
+        print(f"{workers} workers: {result['throughput']:7.1f} requests/s  "
+              f"({result['throughput'] / (baseline * workers):.0%} of linear)  p50 {result['latency_p50'] * 1000:.0f} ms")
+
+    workers = max(args.workers)
+    limited_env = {**env, "STARTUPDOC_REQUESTS_PER_MINUTE": str(args.requests_per_minute),
+                   "STARTUPDOC_CACHE_PATH": os.path.join(directory, "responses-limited.sqlite3")}
+    result = run_workers(workers, args, limited_env)
+    # The bucket starts full (a minute of quota) and refills at the per-minute rate
+    allowed = args.requests_per_minute * (1 + result["elapsed"] / 60)
+    print(f"Quota of {args.requests_per_minute} requests/minute, {workers} workers: {result['model_calls']} model calls "
+          f"in {result['elapsed']:.1f}s (the shared quota allows {allowed:.0f}; per-worker quotas would allow "
+          f"{allowed * workers:.0f})")
+
+    shared_env = {**env, "STARTUPDOC_CACHE_PATH": os.path.join(directory, "responses-shared.sqlite3")}
+    result = run_workers(workers, args, shared_env, shared_prompts=True)
+    print(f"Identical requests from {workers} workers: {result['requests']} requests, "
+          f"{result['model_calls']} model calls")
+    if server is not None:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+import hmac
+import os
+
+import streamlit as st
+from backend.cache import get_response_cache
+from backend.gemini import backend_stats, token_usage
+from backend.metrics import metrics
+from backend.router import model_router
+
+
+# Page Configuration
+st.set_page_config(page_title="📊 StartupDOC Admin", layout="wide", page_icon="📊")
+
+# Operations of the generation hot path, in pipeline order
+SPAN_TITLES = {
+    "craft_prompt": "Craft Prompt",
+    "model_ttft": "Model · Time to First Token",
+    "model_call": "Model · Total",
+    "post_process": "Post-processing",
+    "render": "Render",
+}
+WINDOWS = {"Last minute": 60, "Last 5 minutes": 300, "Last 15 minutes": 900, "Last hour": 3600}
+
+
+# Function to read the token unlocking this page: STARTUPDOC_ADMIN_TOKEN, or `token` under [admin] in
+# .streamlit/secrets.toml
+def admin_token():
+    token = os.environ.get("STARTUPDOC_ADMIN_TOKEN")
+    if token:
+        return token
+    try:
+        return st.secrets["admin"]["token"]
+    except (KeyError, FileNotFoundError):
+        return None
+
+
+# Function to stop the page unless the visitor holds the admin token
+def require_admin():
+    token = admin_token()
+    if not token:
+        st.error("The admin page is disabled. Set `STARTUPDOC_ADMIN_TOKEN` (or `token` under `[admin]` in the secrets) to enable it.")
+        st.stop()
+    if not st.session_state.get("admin_unlocked"):
+        entered = st.text_input("🔑 Admin token", type="password")
+        if not entered:
+            st.stop()
+        if not hmac.compare_digest(entered.encode(), token.encode()):
+            st.error("Wrong admin token.")
+            st.stop()
+        st.session_state.admin_unlocked = True
+        st.rerun()
+
+
+# Function to format a latency in seconds for display
+def format_latency(seconds):
+    if seconds is None:
+        return "-"
+    return f"{seconds * 1000:.1f} ms" if seconds < 1 else f"{seconds:.2f} s"
+
+
+require_admin()
+
+st.markdown("# 📊 Generation Metrics")
+st.caption("Live latency, throughput and errors of this server process, per document type and model.")
+
+columns = st.columns([3, 1])
+window_name = columns[0].radio("Window", list(WINDOWS), index=1, horizontal=True)
+columns[1].button("🔄 Refresh")
+window = WINDOWS[window_name]
+
+rows = [row for row in metrics.summary(window) if row["requests"]]
+if not rows:
+    st.info("No requests recorded in this window yet.")
+for name in dict.fromkeys([*SPAN_TITLES, *(row["name"] for row in rows)]):
+    span_rows = [row for row in rows if row["name"] == name]
+    if not span_rows:
+        continue
+    st.markdown(f"### {SPAN_TITLES.get(name, name)}")
+    st.table([
+        {
+            "Document Type": row["labels"].get("document_type", "-"),
+            "Model": row["labels"].get("model", "-"),
+            "Requests": row["requests"],
+            "Errors": row["errors"],
+            "p50": format_latency(row["p50"]),
+            "p95": format_latency(row["p95"]),
+            "Throughput (per min)": round(row["throughput"], 2),
+        }
+        for row in span_rows
+    ])
+
+# Token usage since the process started
+usage = token_usage()
+if usage:
+    st.markdown("### 🔢 Token Usage")
+    st.table([
+        {
+            "Document Type": document_type,
+            "Requests": values["requests"],
+            "Input Tokens": values["input_tokens"],
+            "Cached Input Tokens": values["cached_input_tokens"],
+            "Output Tokens": values["output_tokens"],
+        }
+        for document_type, values in sorted(usage.items())
+    ])
+
+# How requests were spread over the models of their routes
+routing = model_router.stats()
+if routing:
+    st.markdown("### 🔀 Model Routing")
+    st.table([
+        {
+            "Model": model,
+            "Calls": values["calls"],
+            "Answered First": values["wins"],
+            "Hedged Onto": values["hedges"],
+            "Error Rate": f"{values['error_rate']:.0%}",
+            "Generate p95": format_latency(values["generate_p95"]),
+            "Stream TTFT p95": format_latency(values["stream_p95"]),
+            "Estimated Cost (USD)": round(values["cost"], 4),
+        }
+        for model, values in routing.items()
+    ])
+
+# Throttling, retries and cache behaviour
+st.markdown("### ⚙️ Client and Caches")
+client = {**backend_stats(), **{f"response_cache_{name}": value for name, value in get_response_cache().stats().items()}}
+st.table([{"Metric": name.replace("_", " ").capitalize(), "Value": value} for name, value in client.items()])
@@ -0,0 +1,17 @@
+import os
+import tempfile
+
+# The backend opens its process-wide stores when imported: keep them in a scratch directory, and
+# serve every model call from the stub backend (set before any test imports backend)
+TEST_DIRECTORY = tempfile.mkdtemp(prefix="startupdoc-tests-")
+os.environ.update({
+    "STARTUPDOC_BACKEND": "stub",
+    "STARTUPDOC_CACHE_PATH": "",
+    "STARTUPDOC_CONTEXT_CACHE": "0",
+    "STARTUPDOC_JOBS_PATH": os.path.join(TEST_DIRECTORY, "jobs.sqlite3"),
+    "STARTUPDOC_STATE_URL": os.path.join(TEST_DIRECTORY, "state.sqlite3"),
+    "STARTUPDOC_STORE_PATH": os.path.join(TEST_DIRECTORY, "documents.sqlite3"),
+    "STARTUPDOC_EXPORT_CACHE_PATH": os.path.join(TEST_DIRECTORY, "exports"),
+    "STARTUPDOC_STUB_FIRST_TOKEN_SECONDS": "0.01",
+    "STARTUPDOC_STUB_TOKENS_PER_SECOND": "0",
+})
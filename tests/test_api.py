@@ -0,0 +1,57 @@
+import pytest
+from starlette.testclient import TestClient
+
+from backend.api import app
+
+
+@pytest.fixture(scope="module")
+def client():
+    with TestClient(app) as client:
+        yield client
+
+
+@pytest.mark.parametrize("body", [
+    "not json",
+    "[]",
+    '{"format": "docx"}',
+    '{"content": 5, "format": "docx"}',
+    '{"content": "# Plan", "format": "odt"}',
+    '{"content": "# Plan", "format": "docx", "title": 5}',
+    '{"content": "# Plan", "format": "docx", "title": ["Plan"]}',
+])
+def test_malformed_export_is_rejected(client, body):
+    response = client.post("/export", content=body, headers={"content-type": "application/json"})
+
+    assert response.status_code == 400
+    assert response.json()["error"]
+
+
+@pytest.mark.parametrize("path", ["/documents", "/documents/stream", "/batch"])
+@pytest.mark.parametrize("body", [
+    "not json",
+    "[]",
+    '{"document_type": "pitch_deck"}',
+    '{"inputs": {"business_name": "Acme"}, "document_type": "unknown"}',
+    '{"inputs": {"business_name": "Acme"}, "document_type": "pitch_deck", "translate": "false"}',
+])
+def test_malformed_job_is_rejected(client, path, body):
+    response = client.post(path, content=body, headers={"content-type": "application/json"})
+
+    assert response.status_code == 400
+    assert response.json()["error"]
+
+
+@pytest.mark.parametrize("path", ["/documents", "/documents/stream"])
+def test_single_document_endpoints_reject_several_types(client, path):
+    job = {"inputs": {"business_name": "Acme"}, "document_types": ["business_plan", "pitch_deck"]}
+    response = client.post(path, json=job)
+
+    assert response.status_code == 400
+    assert "/batch" in response.json()["error"]
+
+
+def test_valid_job_is_generated(client):
+    response = client.post("/documents", json={"inputs": {"business_name": "Acme"}, "document_type": "pitch_deck"})
+
+    assert response.status_code == 200
+    assert response.json()["document_type"] == "pitch_deck" and response.json()["content"]
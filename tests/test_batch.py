@@ -0,0 +1,53 @@
+import pytest
+
+from backend.batch import DEFAULT_LANGUAGE, DEFAULT_TONE, parse_job
+
+INPUTS = {"business_name": "Acme Analytics", "startup_domain": "FinTech"}
+
+
+def test_defaults_are_filled_in():
+    job = parse_job({"inputs": INPUTS, "document_type": "pitch_deck"})
+
+    assert job == {
+        "inputs": INPUTS,
+        "document_types": ["pitch_deck"],
+        "language": DEFAULT_LANGUAGE,
+        "tone": DEFAULT_TONE,
+        "translate": False,
+    }
+
+
+def test_settings_are_normalized():
+    job = parse_job({
+        "inputs": {"business_name": "Acme", "team_size": 12},
+        "document_types": ["business_plan", "pitch_deck"],
+        "language": "French",
+        "tone": "Casual",
+        "translate": True,
+    })
+
+    assert job["inputs"] == {"business_name": "Acme", "team_size": "12"}
+    assert job["document_types"] == ["business_plan", "pitch_deck"]
+    assert (job["language"], job["tone"], job["translate"]) == ("French", "casual", True)
+    assert parse_job({"inputs": INPUTS, "document_types": "pitch_deck"})["document_types"] == ["pitch_deck"]
+
+
+@pytest.mark.parametrize("spec, message", [
+    ([], "must be a mapping"),
+    ("business_plan", "must be a mapping"),
+    ({"document_type": "business_plan"}, "'inputs'"),
+    ({"inputs": {}, "document_type": "business_plan"}, "'inputs'"),
+    ({"inputs": ["Acme"], "document_type": "business_plan"}, "'inputs'"),
+    ({"inputs": INPUTS}, "must be strings"),
+    ({"inputs": INPUTS, "document_types": []}, "must be strings"),
+    ({"inputs": INPUTS, "document_types": ["pitch_deck", 3]}, "must be strings"),
+    ({"inputs": INPUTS, "document_types": {"pitch_deck": True}}, "must be strings"),
+    ({"inputs": INPUTS, "document_type": "Pitch Deck 🎯"}, "Unknown document types"),
+    ({"inputs": INPUTS, "document_type": "pitch_deck", "language": ["French"]}, "'language'"),
+    ({"inputs": INPUTS, "document_type": "pitch_deck", "tone": None}, "'tone'"),
+    ({"inputs": INPUTS, "document_type": "pitch_deck", "translate": "false"}, "'translate'"),
+    ({"inputs": INPUTS, "document_type": "pitch_deck", "translate": 1}, "'translate'"),
+])
+def test_malformed_jobs_are_rejected(spec, message):
+    with pytest.raises(ValueError, match=message):
+        parse_job(spec)
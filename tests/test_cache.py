@@ -0,0 +1,112 @@
+import time
+
+from backend.cache import ContextCache, ResponseCache, make_cache_key
+from backend.models import ModelBackend, StubBackend
+
+PREFIX = "Company context. " * 50
+
+
+class PlainBackend(ModelBackend):
+    # A backend without explicit context caching
+    name = "plain"
+
+    def generate(self, contents, cache=None):
+        return {"content": contents}
+
+    def stream(self, contents, cache=None):
+        yield contents
+
+
+def test_cache_key_depends_on_prompt_model_and_config():
+    key = make_cache_key("prompt", "model", {"temperature": 0.2})
+
+    assert key == make_cache_key("prompt", "model", {"temperature": 0.2})
+    assert key != make_cache_key("prompt", "other model", {"temperature": 0.2})
+    assert key != make_cache_key("prompt", "model", {"temperature": 0.7})
+    assert make_cache_key("prompt", "model") == make_cache_key("prompt", "model", {})
+
+
+def test_memory_tier_evicts_the_least_recently_used_entry():
+    cache = ResponseCache(path=None, max_entries=2)
+    cache.set("a", "A")
+    cache.set("b", "B")
+    assert cache.get("a") == "A"
+    cache.set("c", "C")
+
+    assert cache.get("b") is None
+    assert cache.get("a") == "A" and cache.get("c") == "C"
+    assert cache.stats()["memory_entries"] == 2
+
+
+def test_expired_entries_are_misses(tmp_path):
+    cache = ResponseCache(path=str(tmp_path / "responses.sqlite3"), ttl=0.05)
+    cache.set("a", "A")
+    assert cache.get("a") == "A"
+    time.sleep(0.1)
+
+    assert cache.get("a") is None
+    stats = cache.stats()
+    assert stats["hits"] == 1 and stats["misses"] == 1
+
+
+def test_disk_tier_is_shared_between_caches(tmp_path):
+    path = str(tmp_path / "responses.sqlite3")
+    ResponseCache(path=path).set("a", "A")
+
+    # Another worker process opening the same file starts with an empty memory tier
+    other = ResponseCache(path=path)
+    assert other.get("a") == "A"
+    assert other.get("a") == "A"
+    stats = other.stats()
+    assert stats["hits"] == 2 and stats["disk_hits"] == 1 and stats["misses"] == 0
+
+
+def test_disk_tier_evicts_the_least_recently_accessed_entries(tmp_path):
+    path = str(tmp_path / "responses.sqlite3")
+    cache = ResponseCache(path=path, max_entries=1, max_disk_bytes=256 * 1024)
+    cache.set("first", "x" * 100_000)
+    cache.set("second", "x" * 100_000)
+    cache.get("first")
+    cache.set("third", "x" * 100_000)
+
+    reader = ResponseCache(path=path)
+    assert reader.get("second") is None
+    assert reader.get("first") is not None and reader.get("third") is not None
+
+
+def test_context_cache_uploads_a_prefix_once_it_is_reused():
+    backend = StubBackend(model_name="context-reuse", min_cache_tokens=0)
+    cache = ContextCache(min_uses=2, enabled=True)
+
+    assert cache.resolve(backend, [PREFIX]) == (None, None)
+    handle, prefix = cache.resolve(backend, [PREFIX])
+    assert handle is not None and prefix == PREFIX
+    assert cache.resolve(backend, [PREFIX]) == (handle, PREFIX)
+    assert backend.generate("## 1. Market", cache=handle)["cached_tokens"] > 0
+
+    stats = cache.stats()
+    assert stats["context_caches_created"] == 1
+    assert stats["context_cache_hits"] == 1 and stats["context_cache_misses"] == 2
+    cache.clear()
+
+
+def test_context_cache_evicts_the_least_recently_used_prefix():
+    backend = StubBackend(model_name="context-evict", min_cache_tokens=0)
+    cache = ContextCache(min_uses=1, max_entries=1, enabled=True)
+    first, _ = cache.resolve(backend, ["first " + PREFIX])
+    second, _ = cache.resolve(backend, ["second " + PREFIX])
+
+    assert first is not None and second is not None
+    assert cache.stats()["context_caches_evicted"] == 1
+    assert cache.stats()["context_cache_entries"] == 1
+    # The evicted prefix is deleted from the backend as well
+    assert first not in StubBackend._caches and second in StubBackend._caches
+    cache.clear()
+
+
+def test_context_cache_skips_backends_and_prefixes_it_cannot_cache():
+    cache = ContextCache(min_uses=1, enabled=True)
+
+    assert cache.resolve(PlainBackend(), [PREFIX]) == (None, None)
+    assert cache.resolve(StubBackend(model_name="context-small", min_cache_tokens=10**6), [PREFIX]) == (None, None)
+    assert cache.stats()["context_caches_created"] == 0
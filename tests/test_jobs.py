@@ -0,0 +1,126 @@
+import os
+import signal
+import subprocess
+import sys
+import time
+
+from backend.jobs import CANCELLED, DONE, FAILED, FINISHED_STATUSES, RUNNING, JobQueue
+from backend.models import StubBackend
+
+# Streams 2000 tokens at 100 tokens per second: about 20 seconds, unless cancelled
+SLOW_STUB = StubBackend(first_token_seconds=0.0, tokens_per_second=100, output_tokens=2000)
+FAST_STUB = StubBackend(first_token_seconds=0.0, tokens_per_second=0, output_tokens=100)
+
+
+# Function to poll a job until it matches a condition
+def wait_for(queue, job_id, condition, timeout=10):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = queue.get(job_id)
+        if condition(job):
+            return job
+        time.sleep(0.02)
+    raise AssertionError(f"job {job_id} still {queue.get(job_id)['status']} after {timeout}s")
+
+
+def test_same_key_joins_the_active_job(tmp_path):
+    queue = JobQueue(str(tmp_path / "jobs.sqlite3"), max_workers=2)
+    job_id = queue.submit(SLOW_STUB.stream, "## 1. Market", key="request")
+
+    assert queue.submit(SLOW_STUB.stream, "## 1. Market", key="request") == job_id
+    assert queue.find_active("request") == job_id
+    assert queue.submit(FAST_STUB.generate, "## 1. Market", key="other") != job_id
+    queue.cancel(job_id)
+
+
+def test_finished_job_is_not_joined(tmp_path):
+    queue = JobQueue(str(tmp_path / "jobs.sqlite3"))
+    job_id = queue.submit(lambda prompt: FAST_STUB.generate(prompt)["content"], "## 1. Market", key="request")
+    job = wait_for(queue, job_id, lambda job: job["status"] in FINISHED_STATUSES)
+
+    assert job["status"] == DONE and job["content"]
+    assert queue.find_active("request") is None
+    assert queue.submit(FAST_STUB.stream, "## 1. Market", key="request") != job_id
+
+
+def test_cancel_stops_a_running_job(tmp_path):
+    queue = JobQueue(str(tmp_path / "jobs.sqlite3"))
+    job_id = queue.submit(SLOW_STUB.stream, "## 1. Market", key="request")
+    wait_for(queue, job_id, lambda job: job["status"] == RUNNING and job["content"])
+
+    assert queue.cancel(job_id)
+    assert not queue.cancel(job_id)
+    assert queue.find_active("request") is None
+    # The worker notices the cancellation at its next flush and stops streaming
+    start = time.monotonic()
+    while queue._futures.get(job_id) is not None and time.monotonic() - start < 5:
+        time.sleep(0.02)
+    assert job_id not in queue._futures
+    partial = queue.get(job_id)
+    assert partial["status"] == CANCELLED
+    time.sleep(0.5)
+    assert queue.get(job_id)["content"] == partial["content"]
+
+
+def test_cancel_a_queued_job(tmp_path):
+    queue = JobQueue(str(tmp_path / "jobs.sqlite3"), max_workers=1)
+    running = queue.submit(SLOW_STUB.stream, "## 1. Market")
+    queued = queue.submit(FAST_STUB.stream, "## 1. Market")
+
+    assert queue.cancel(queued)
+    assert queued not in queue._futures
+    wait_for(queue, running, lambda job: job["status"] == RUNNING)
+    queue.cancel(running)
+    wait_for(queue, running, lambda job: running not in queue._futures)
+    job = queue.get(queued)
+    assert job["status"] == CANCELLED and job["started"] is None and job["content"] == ""
+
+
+def test_failing_generation_fails_the_job(tmp_path):
+    queue = JobQueue(str(tmp_path / "jobs.sqlite3"))
+    failing = StubBackend(first_token_seconds=0.0, failure_rate=1.0)
+    job_id = queue.submit(failing.stream, "## 1. Market")
+    job = wait_for(queue, job_id, lambda job: job["status"] in FINISHED_STATUSES)
+
+    assert job["status"] == FAILED and "simulated failure" in job["error"]
+
+
+def test_jobs_of_an_exited_worker_fail(tmp_path):
+    path = str(tmp_path / "jobs.sqlite3")
+    # Another worker process submits a long job and dies without finishing it
+    worker = subprocess.Popen(
+        [sys.executable, "-c", (
+            "import sys, time\n"
+            "from backend.jobs import JobQueue\n"
+            "from backend.models import StubBackend\n"
+            "stub = StubBackend(first_token_seconds=0.0, tokens_per_second=100, output_tokens=2000)\n"
+            "print(JobQueue(sys.argv[1]).submit(stub.stream, '## 1. Market', key='request'), flush=True)\n"
+            "time.sleep(60)\n"
+        ), path],
+        stdout=subprocess.PIPE,
+        text=True,
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    )
+    try:
+        job_id = worker.stdout.readline().strip()
+        queue = JobQueue(path)
+        assert queue.find_active("request") == job_id
+    finally:
+        worker.send_signal(signal.SIGKILL)
+        worker.wait()
+        worker.stdout.close()
+
+    # The next process opening the store marks the orphaned job as failed, so it is not joined forever
+    queue = JobQueue(path)
+    job = queue.get(job_id)
+    assert job["status"] == FAILED and job["error"] == "The worker running this job exited."
+    assert queue.find_active("request") is None
+
+
+def test_cancel_before_the_worker_claims_the_job(tmp_path):
+    queue = JobQueue(str(tmp_path / "jobs.sqlite3"))
+    job_id = queue.submit(FAST_STUB.stream, "## 1. Market")
+    queue.cancel(job_id)
+
+    wait_for(queue, job_id, lambda job: job_id not in queue._futures)
+    assert queue.get(job_id)["status"] == CANCELLED
@@ -0,0 +1,90 @@
+import pytest
+
+from backend.langchain import (
+    FIELD_TOKEN_BUDGET,
+    MAX_OUTPUT_TOKENS,
+    OUTLINE_MAX_OUTPUT_TOKENS,
+    SECTION_MAX_OUTPUT_TOKENS,
+    build_context,
+    compact_field,
+    craft_outline_prompt,
+    craft_prompt,
+    craft_section_prompt,
+    get_template_sections,
+)
+from backend.ratelimit import estimate_tokens
+
+LONG_FIELD = "Our customers reconcile payments across several banks by hand. " * 200
+
+
+def test_whitespace_is_normalized():
+    assert compact_field("  Acme \t  Analytics \n\n\n\n  FinTech   ") == "Acme Analytics\n\nFinTech"
+    assert compact_field(42) == "42"
+
+
+def test_short_fields_are_kept_whole():
+    value = "Small and medium businesses."
+
+    assert compact_field(value, token_budget=estimate_tokens(value)) == value
+
+
+def test_long_fields_are_truncated_at_a_word_boundary():
+    compacted = compact_field(LONG_FIELD, token_budget=50)
+
+    assert compacted.endswith(" [...]")
+    kept = compacted[:-len(" [...]")]
+    assert LONG_FIELD.startswith(kept) and LONG_FIELD[len(kept)] == " "
+    assert estimate_tokens(kept) <= 50
+    assert estimate_tokens(compact_field(LONG_FIELD)) <= FIELD_TOKEN_BUDGET + 2
+
+
+def test_long_fields_can_be_summarized():
+    calls = []
+
+    def summarize(text, token_budget):
+        calls.append((text, token_budget))
+        return "Manual multi-bank reconciliation."
+
+    assert compact_field(LONG_FIELD, token_budget=50, summarize=summarize) == "Manual multi-bank reconciliation."
+    assert calls == [(LONG_FIELD.strip(), 50)]
+    assert compact_field("Short.", token_budget=50, summarize=summarize) == "Short."
+    assert len(calls) == 1
+
+
+def test_context_applies_the_budget_to_every_field():
+    context = build_context({"business_name": "Acme", "target_market": LONG_FIELD, "competitors": LONG_FIELD}, 50)
+    lines = context.splitlines()
+
+    assert lines[0] == "Business Name: Acme"
+    assert [line.split(":")[0] for line in lines] == ["Business Name", "Target Market", "Competitors"]
+    assert all(estimate_tokens(line) <= 60 for line in lines)
+
+
+@pytest.mark.parametrize("document_type", list(MAX_OUTPUT_TOKENS))
+def test_prompt_carries_its_budgets(document_type):
+    prompt = craft_prompt("Acme Analytics", document_type, "English", "Formal")
+
+    assert "Acme Analytics" in prompt and "{" not in prompt
+    assert prompt.tokens == estimate_tokens(prompt)
+    assert prompt.max_output_tokens == MAX_OUTPUT_TOKENS[document_type]
+    # The static prefix is the same for every request of the type
+    other = craft_prompt("Globex", document_type, "French", "Casual")
+    assert prompt[:prompt.static_length] == other[:other.static_length] and prompt.static_length > 0
+    # Template indentation is not sent
+    assert not any(line.startswith(" ") for line in prompt.splitlines())
+
+
+def test_unknown_types_use_the_business_plan_budget():
+    prompt = craft_prompt("Acme", "unknown_type", "English", "Formal")
+
+    assert prompt.max_output_tokens == MAX_OUTPUT_TOKENS["business_plan"]
+
+
+def test_outline_and_section_prompts_are_capped():
+    section = get_template_sections("pitch_deck")["sections"][0]
+    outline = craft_outline_prompt("Acme", "pitch_deck", "English", "Formal")
+    section_prompt = craft_section_prompt("Acme", "pitch_deck", section, "- Key facts", "English", "Formal")
+
+    assert outline.max_output_tokens == min(OUTLINE_MAX_OUTPUT_TOKENS, MAX_OUTPUT_TOKENS["pitch_deck"])
+    assert section_prompt.max_output_tokens == min(SECTION_MAX_OUTPUT_TOKENS, MAX_OUTPUT_TOKENS["pitch_deck"])
+    assert f"## 1. {section['title']}" in section_prompt and "- Key facts" in section_prompt
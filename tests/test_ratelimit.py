@@ -0,0 +1,128 @@
+import threading
+import time
+
+import pytest
+
+from backend.ratelimit import RateLimiter, RetryPolicy, SingleFlight, TokenBucket
+
+
+def test_bucket_refills_at_its_rate():
+    bucket = TokenBucket(per_minute=600, capacity=2)
+
+    assert bucket.reserve() == 0.0
+    assert bucket.reserve() == 0.0
+    # Empty: the next token arrives after 60 / 600 seconds
+    assert bucket.reserve() == pytest.approx(0.1, abs=0.01)
+    time.sleep(0.3)
+    assert bucket.reserve() == 0.0
+
+
+def test_bucket_caps_reservations_at_its_capacity():
+    bucket = TokenBucket(per_minute=60, capacity=10)
+
+    # A request larger than the bucket waits for a full bucket rather than forever
+    assert bucket.reserve(1000) == 0.0
+    assert bucket.reserve(1000) == pytest.approx(10.0, abs=0.1)
+
+
+def test_limiter_counts_throttled_requests():
+    limiter = RateLimiter(requests_per_minute=60, tokens_per_minute=1200)
+
+    # The first request empties the token bucket; the second waits for its refill
+    assert limiter.acquire(tokens=1200) == 0.0
+    assert limiter.acquire(tokens=10) == pytest.approx(0.5, abs=0.05)
+    assert limiter.stats() == {"queue_depth": 0, "throttled": 1}
+
+
+def test_retry_policy_retries_transient_errors():
+    attempts = []
+
+    def flaky():
+        attempts.append(None)
+        if len(attempts) < 3:
+            raise ConnectionError("try again")
+        return "done"
+
+    policy = RetryPolicy((ConnectionError,), max_attempts=4, base_delay=0.001)
+    assert policy.call(flaky) == "done"
+    assert len(attempts) == 3
+    assert policy.stats() == {"retries": 2, "retries_exhausted": 0}
+
+
+def test_retry_policy_gives_up_after_the_last_attempt():
+    policy = RetryPolicy((ConnectionError,), max_attempts=3, base_delay=0.001)
+
+    def failing():
+        raise ConnectionError("down")
+
+    with pytest.raises(ConnectionError):
+        policy.call(failing)
+    assert policy.stats() == {"retries": 2, "retries_exhausted": 1}
+
+
+def test_retry_policy_does_not_retry_other_errors():
+    attempts = []
+
+    def invalid():
+        attempts.append(None)
+        raise ValueError("bad request")
+
+    policy = RetryPolicy((ConnectionError,), base_delay=0.001)
+    with pytest.raises(ValueError):
+        policy.call(invalid)
+    assert len(attempts) == 1
+    assert policy.stats() == {"retries": 0, "retries_exhausted": 0}
+
+
+# Function to run `flight.do` from several threads at once and collect what each one got
+def run_concurrently(flight, func, callers=5):
+    outcomes = []
+    started = threading.Barrier(callers)
+
+    def caller():
+        started.wait()
+        try:
+            outcomes.append(flight.do("key", func))
+        except Exception as e:
+            outcomes.append(e)
+
+    threads = [threading.Thread(target=caller) for _ in range(callers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=10)
+    return outcomes
+
+
+def test_single_flight_shares_one_result():
+    calls = []
+
+    def slow():
+        calls.append(None)
+        time.sleep(0.2)
+        return object()
+
+    flight = SingleFlight()
+    outcomes = run_concurrently(flight, slow)
+
+    assert len(calls) == 1
+    assert len(outcomes) == 5 and all(outcome is outcomes[0] for outcome in outcomes)
+    assert flight.stats() == {"coalesced": 4, "in_flight": 0}
+
+
+def test_single_flight_shares_one_exception():
+    calls = []
+
+    def failing():
+        calls.append(None)
+        time.sleep(0.2)
+        raise RuntimeError("upstream failed")
+
+    flight = SingleFlight()
+    outcomes = run_concurrently(flight, failing)
+
+    assert len(calls) == 1
+    assert len(outcomes) == 5 and all(outcome is outcomes[0] for outcome in outcomes)
+    assert isinstance(outcomes[0], RuntimeError)
+    # The key is free again once the call finished
+    assert flight.do("key", lambda: "next") == "next"
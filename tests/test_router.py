@@ -0,0 +1,102 @@
+import threading
+import time
+
+import pytest
+
+from backend.models import StubBackend
+from backend.router import ROUTER_MIN_SAMPLES, AllModelsFailed, ModelRouter
+
+PROMPT = "## 1. Market"
+
+
+# Function to build a router over stub models, and the attempt sending PROMPT to them
+def stub_router(hedge_after=None, **models):
+    backends = {name: StubBackend(name, tokens_per_second=0, **settings) for name, settings in models.items()}
+    router = ModelRouter(routes={"*": [{"models": list(backends), "hedge_after": hedge_after}]}, prices={}, threads=4)
+    calls = []
+
+    def attempt(model):
+        calls.append(model)
+        return backends[model].generate(PROMPT)["content"]
+
+    return router, attempt, calls
+
+
+def test_first_model_answers():
+    router, attempt, calls = stub_router(primary={"first_token_seconds": 0.0}, secondary={"first_token_seconds": 0.0})
+
+    model, answer = router.call("business_plan", 100, attempt)
+
+    assert model == "primary" and answer
+    assert calls == ["primary"]
+    assert router.stats()["primary"]["wins"] == 1
+
+
+def test_slow_model_is_hedged():
+    router, attempt, calls = stub_router(
+        hedge_after=0.05, primary={"first_token_seconds": 1.0}, secondary={"first_token_seconds": 0.0}
+    )
+    discarded = threading.Event()
+
+    start = time.perf_counter()
+    model, answer = router.call("business_plan", 100, attempt, discard=lambda answer: discarded.set())
+
+    assert model == "secondary" and answer
+    assert time.perf_counter() - start < 0.5
+    assert calls == ["primary", "secondary"]
+    stats = router.stats()
+    assert stats["secondary"]["hedges"] == 1 and stats["secondary"]["wins"] == 1
+    # The losing answer is handed to `discard` once the slow model finishes
+    assert discarded.wait(2)
+
+
+def test_no_hedging_without_a_delay():
+    router, attempt, calls = stub_router(primary={"first_token_seconds": 0.2}, secondary={"first_token_seconds": 0.0})
+
+    assert router.call("business_plan", 100, attempt)[0] == "primary"
+    assert calls == ["primary"]
+
+
+def test_failed_model_falls_back():
+    router, attempt, calls = stub_router(
+        primary={"first_token_seconds": 0.0, "failure_rate": 1.0}, secondary={"first_token_seconds": 0.0}
+    )
+
+    assert router.call("business_plan", 100, attempt)[0] == "secondary"
+    assert calls == ["primary", "secondary"]
+    assert router.stats()["primary"]["errors"] == 1
+
+
+def test_unacceptable_answer_falls_back():
+    router, attempt, calls = stub_router(primary={"first_token_seconds": 0.0}, secondary={"first_token_seconds": 0.0})
+
+    model, _ = router.call("business_plan", 100, attempt, acceptable=lambda answer: calls[-1] != "primary")
+
+    assert model == "secondary"
+    assert router.stats()["primary"]["errors"] == 1
+
+
+def test_every_model_failing_raises():
+    router, attempt, calls = stub_router(
+        primary={"first_token_seconds": 0.0, "failure_rate": 1.0},
+        secondary={"first_token_seconds": 0.0, "failure_rate": 1.0},
+    )
+
+    with pytest.raises(AllModelsFailed) as error:
+        router.call("business_plan", 100, attempt)
+
+    assert calls == ["primary", "secondary"]
+    assert isinstance(error.value.__cause__, RuntimeError)
+
+
+def test_failing_model_is_tried_last():
+    router, attempt, calls = stub_router(
+        primary={"first_token_seconds": 0.0, "failure_rate": 1.0}, secondary={"first_token_seconds": 0.0}
+    )
+    for _ in range(ROUTER_MIN_SAMPLES):
+        router.call("business_plan", 100, attempt)
+
+    assert router.models("business_plan", 100) == ["secondary", "primary"]
+    calls.clear()
+    assert router.call("business_plan", 100, attempt)[0] == "secondary"
+    assert calls == ["secondary"]
@@ -0,0 +1,61 @@
+import sqlite3
+
+from backend.search import days_ago, split_sections
+from backend.store import DocumentStore
+
+PLAN = "## 1. Market Analysis\n\nDemand for reusable rocket parts grows with small satellite launches.\n"
+DECK = "## 1. Problem\n\nSmall satellite operators wait months for a rocket launch slot.\n"
+OLD_PLAN = "## 1. Market Analysis\n\nRocket launch prices fell as reusable boosters entered the market.\n"
+
+
+# Function to fill a store with two recent documents of different types and one plan from last year
+def filled_store(tmp_path):
+    path = str(tmp_path / "documents.sqlite3")
+    store = DocumentStore(path)
+    ids = {
+        "plan": store.save("Business Plan 🏢", PLAN, business_name="Acme"),
+        "deck": store.save("Pitch Deck 🎤", DECK, business_name="Acme"),
+        "old": store.save("Business Plan 🏢", OLD_PLAN, business_name="Acme"),
+    }
+    with sqlite3.connect(path) as conn:
+        for table in ("documents", "sections"):
+            column = "id" if table == "documents" else "doc_id"
+            conn.execute(f"UPDATE {table} SET created = ? WHERE {column} = ?", (days_ago(365), ids["old"]))
+    return store, ids
+
+
+def test_split_sections_keeps_short_sections_with_the_previous_one():
+    sections = split_sections("Preamble text.\n\n## 1. Summary\n\n" + "word " * 20 + "\n\n## 2. Note\n\nShort.")
+
+    assert [title for title, _ in sections] == ["Introduction", "1. Summary"]
+    assert sections[1][1].endswith("Short.")
+
+
+def test_search_filters_by_type(tmp_path):
+    store, ids = filled_store(tmp_path)
+
+    assert {result["doc_id"] for result in store.sections.search("rocket launch")} == set(ids.values())
+    plans = store.sections.search("rocket launch", doc_type="Business Plan 🏢")
+    assert {result["doc_id"] for result in plans} == {ids["plan"], ids["old"]}
+    assert all(result["type"] == "Business Plan 🏢" for result in plans)
+    assert store.sections.search("rocket launch", doc_type="Executive Summary 📝") == []
+
+
+def test_search_filters_by_date(tmp_path):
+    store, ids = filled_store(tmp_path)
+
+    recent = store.sections.search("rocket launch", since=days_ago(30))
+    assert {result["doc_id"] for result in recent} == {ids["plan"], ids["deck"]}
+    recent_plans = store.sections.search("rocket launch", doc_type="Business Plan 🏢", since=days_ago(30))
+    assert [result["doc_id"] for result in recent_plans] == [ids["plan"]]
+
+
+def test_similar_sections_are_filtered_by_type_and_date(tmp_path):
+    store, ids = filled_store(tmp_path)
+
+    best = store.sections.similar(DECK)
+    assert best[0]["doc_id"] == ids["deck"] and best[0]["score"] > 0.99
+    assert store.sections.similar(DECK, doc_type="Pitch Deck 🎤")[0]["doc_id"] == ids["deck"]
+    assert ids["deck"] not in {result["doc_id"] for result in store.sections.similar(DECK, doc_type="Business Plan 🏢")}
+    assert store.sections.similar(OLD_PLAN)[0]["doc_id"] == ids["old"]
+    assert ids["old"] not in {result["doc_id"] for result in store.sections.similar(OLD_PLAN, since=days_ago(30))}
@@ -0,0 +1,58 @@
+from backend.sections import assemble_sections, generate_sections, reuse_stats
+
+USER_INPUTS = {
+    "business_name": "Acme Analytics",
+    "startup_domain": "FinTech",
+    "target_market": "Small and medium businesses that reconcile payments across several banks by hand.",
+    "competitors": "Legacy accounting suites and spreadsheet-based consultants with slow onboarding.",
+    "market_trends": "Open banking APIs and real-time payments are making automated reconciliation viable.",
+    "revenue_model": "Monthly subscription per connected bank account.",
+    "cost_structure": "Cloud hosting, bank API fees and a sales team.",
+    "funding_needed": "$2M seed round for 18 months of runway.",
+}
+
+
+# Function to generate a business plan by section, optionally from a previous version
+def business_plan(user_inputs, previous=None):
+    return list(generate_sections(user_inputs, "Acme Analytics", "business_plan", "English", "formal", previous))
+
+
+def test_sections_come_in_document_order():
+    results = business_plan(USER_INPUTS)
+
+    assert [result["number"] for result in results] == list(range(len(results)))
+    assert results[0]["title"] == "Outline"
+    assert all(result["content"] and result["error"] is None and not result["reused"] for result in results)
+    document = assemble_sections(results)
+    assert results[0]["content"] not in document
+    assert all(result["content"] in document for result in results[1:])
+
+
+def test_unchanged_inputs_reuse_every_section():
+    first = business_plan(USER_INPUTS)
+    second = business_plan(USER_INPUTS, previous=first)
+
+    assert all(result["reused"] for result in second)
+    assert [result["content"] for result in second] == [result["content"] for result in first]
+    assert reuse_stats(second)["sections_generated"] == 0
+
+
+def test_an_edit_regenerates_only_the_sections_using_the_field():
+    first = business_plan(USER_INPUTS)
+    edited = business_plan({**USER_INPUTS, "competitors": "Two venture-backed reconciliation startups."}, previous=first)
+
+    # The outline sees every input; the competitors field feeds sections 2 and 3 of a business plan
+    regenerated = [result["number"] for result in edited if not result["reused"]]
+    assert regenerated == [0, 2, 3]
+    for before, after in zip(first, edited):
+        assert (after["key"] == before["key"]) == after["reused"]
+    stats = reuse_stats(edited)
+    assert stats["sections_reused"] == 4 and stats["sections_generated"] == 3
+
+
+def test_failed_sections_are_not_reused():
+    first = business_plan(USER_INPUTS)
+    first[4] = {**first[4], "content": None, "error": "quota exceeded"}
+    second = business_plan(USER_INPUTS, previous=first)
+
+    assert [result["number"] for result in second if not result["reused"]] == [4]
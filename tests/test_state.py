@@ -0,0 +1,99 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+from backend.state import LocalState, LockTimeout
+
+REPOSITORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# A bucket refilling so slowly that it does not refill during a test
+RATE, CAPACITY = 0.001, 20
+
+TAKE_TOKENS = """
+import sys
+from backend.state import LocalState
+state = LocalState(sys.argv[1])
+for _ in range(15):
+    print(state.take_tokens("bucket", 1, {rate}, {capacity}))
+""".format(rate=RATE, capacity=CAPACITY)
+
+HOLD_LOCK = """
+import sys
+from backend.state import LocalState
+state = LocalState(sys.argv[1])
+token = state.acquire("lock", timeout=5)
+print("locked" if token else "timed out", flush=True)
+sys.stdin.readline()
+if token:
+    state.release("lock", token)
+    print("released", flush=True)
+sys.stdin.readline()
+"""
+
+
+# Function to run a snippet in another worker process
+def worker(code, path):
+    return subprocess.Popen(
+        [sys.executable, "-c", code, path],
+        stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True, cwd=REPOSITORY,
+    )
+
+
+def test_token_bucket_is_shared_across_processes(tmp_path):
+    path = str(tmp_path / "state.sqlite3")
+    LocalState(path)
+    workers = [worker(TAKE_TOKENS, path) for _ in range(2)]
+    waits = sorted(float(line) for process in workers for line in process.communicate()[0].split())
+
+    # 30 tokens taken from a bucket of 20: every update counted once, so the last 10 go into debt
+    assert all(process.returncode == 0 for process in workers)
+    assert waits[:CAPACITY] == [0.0] * CAPACITY
+    assert waits[CAPACITY:] == pytest.approx([debt / RATE for debt in range(1, 11)], rel=0.01)
+    assert LocalState(path).take_tokens("bucket", 1, RATE, CAPACITY) == pytest.approx(11 / RATE, rel=0.01)
+
+
+def test_lock_is_exclusive_across_processes(tmp_path):
+    path = str(tmp_path / "state.sqlite3")
+    state = LocalState(path)
+    holder = worker(HOLD_LOCK, path)
+    try:
+        assert holder.stdout.readline().strip() == "locked"
+        assert state.acquire("lock", timeout=0) is None
+        assert state.acquire("lock", timeout=0.2) is None
+        with pytest.raises(LockTimeout):
+            with state.lock("lock", timeout=0):
+                pass
+        # Other locks are independent
+        other = state.acquire("other", timeout=0)
+        assert other is not None
+        state.release("other", other)
+
+        holder.stdin.write("\n")
+        holder.stdin.flush()
+        assert holder.stdout.readline().strip() == "released"
+        token = state.acquire("lock", timeout=1)
+        assert token is not None
+    finally:
+        holder.kill()
+        holder.communicate()
+
+    # Held here now: another process has to wait for it
+    contender = worker(HOLD_LOCK.replace("timeout=5", "timeout=0.2"), path)
+    assert contender.communicate("\n\n")[0].split() == ["timed", "out"]
+    assert contender.returncode == 0
+    state.release("lock", token)
+
+
+def test_lock_of_an_exited_process_is_released(tmp_path):
+    path = str(tmp_path / "state.sqlite3")
+    state = LocalState(path)
+    holder = worker(HOLD_LOCK, path)
+    assert holder.stdout.readline().strip() == "locked"
+
+    holder.kill()
+    holder.communicate()
+
+    token = state.acquire("lock", timeout=1)
+    assert token is not None
+    state.release("lock", token)
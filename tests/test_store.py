@@ -0,0 +1,68 @@
+import sqlite3
+
+from backend.state import LocalState
+from backend.store import DocumentStore
+
+PLAN = (
+    "## 1. Executive Summary\n\nAcme sells reusable rocket parts to small launch providers.\n\n"
+    "## 2. Market Analysis\n\nThe small launch market grows with every satellite constellation.\n"
+)
+SECTIONS = [
+    {"number": 1, "title": "Executive Summary", "key": "k1", "content": PLAN.split("## 2.")[0],
+     "prompt_tokens": 120, "output_tokens": 30},
+    {"number": 2, "title": "Market Analysis", "key": "k2", "content": "## 2." + PLAN.split("## 2.")[1],
+     "prompt_tokens": 130, "output_tokens": 25},
+]
+
+
+def test_saved_document_round_trips(tmp_path):
+    store = DocumentStore(str(tmp_path / "documents.sqlite3"))
+    doc_id = store.save("Business Plan 🏢", PLAN, business_name="Acme", prompt_hash="hash", sections=SECTIONS)
+
+    document = store.get(doc_id)
+    assert document["content"] == PLAN
+    assert (document["type"], document["business_name"], document["prompt_hash"]) == ("Business Plan 🏢", "Acme", "hash")
+    assert store.get_sections(doc_id) == SECTIONS
+    assert [entry["id"] for entry in store.list(business_name="Acme")] == [doc_id]
+    assert store.list(doc_type="Pitch Deck 🎤") == []
+    assert store.get("unknown") is None
+
+
+def test_identical_texts_are_stored_once(tmp_path):
+    path = str(tmp_path / "documents.sqlite3")
+    store = DocumentStore(path)
+    first = store.save("Business Plan 🏢", PLAN, sections=SECTIONS)
+    second = store.save("Business Plan 🏢", PLAN, sections=SECTIONS)
+
+    assert first != second
+    assert store.get(first)["content_hash"] == store.get(second)["content_hash"]
+    with sqlite3.connect(path) as conn:
+        # One blob for the document and one per section, however many versions reuse them
+        assert conn.execute("SELECT COUNT(*) FROM blobs").fetchone()[0] == 1 + len(SECTIONS)
+        assert conn.execute("SELECT COUNT(*) FROM documents").fetchone()[0] == 2
+
+
+def test_opening_the_store_indexes_unindexed_documents(tmp_path):
+    path = str(tmp_path / "documents.sqlite3")
+    doc_id = DocumentStore(path).save("Business Plan 🏢", PLAN)
+    # As if the document had been stored before the section index existed
+    with sqlite3.connect(path) as conn:
+        for table in ("sections", "sections_fts", "section_vectors", "section_buckets"):
+            conn.execute(f"DELETE FROM {table}")
+
+    store = DocumentStore(path)
+    results = store.sections.search("rocket parts")
+    assert [result["doc_id"] for result in results] == [doc_id]
+    assert results[0]["title"] == "1. Executive Summary"
+    # Indexed documents are not indexed again by the next open
+    DocumentStore(path)
+    assert len(store.sections.search("launch")) == 2
+
+
+def test_documents_of_other_hosts_are_read_from_the_shared_state(tmp_path):
+    state = LocalState(str(tmp_path / "state.sqlite3"))
+    doc_id = DocumentStore(str(tmp_path / "host-a.sqlite3"), state=state).save("Business Plan 🏢", PLAN)
+
+    other_host = DocumentStore(str(tmp_path / "host-b.sqlite3"), state=state)
+    assert other_host.get(doc_id)["content"] == PLAN
+    assert DocumentStore(str(tmp_path / "host-c.sqlite3")).get(doc_id) is None
@@ -0,0 +1,72 @@
+import pytest
+
+import backend.translate as translate
+from backend.translate import CANONICAL_LANGUAGE, split_sections, translate_document
+
+DOCUMENT = (
+    "# Acme Analytics Business Plan\n\n"
+    "## 1. Executive Summary\n\nAcme automates payment reconciliation.\n\n"
+    "**Key points:**\n\n1. **Speed**: minutes instead of days\n2. **Accuracy**: no typing errors\n\n"
+    "## 2. Market Analysis\n\nSmall businesses with several bank accounts.\n"
+)
+
+
+@pytest.mark.parametrize("content, sections", [
+    # "##" is used twice: the "#" title and the bold list items inside sections do not split
+    (DOCUMENT, [
+        DOCUMENT[:DOCUMENT.index("\n## 1.")],
+        DOCUMENT[DOCUMENT.index("\n## 1."):DOCUMENT.index("\n## 2.")],
+        DOCUMENT[DOCUMENT.index("\n## 2."):],
+    ]),
+    ("**1. Market**\nText\n**2. Team**\nMore", ["**1. Market**\nText\n", "**2. Team**\nMore"]),
+    ("Intro\n1. **Market**\nText\n2. **Team**\nMore", ["Intro\n", "1. **Market**\nText\n", "2. **Team**\nMore"]),
+    # A single heading of each style is not a section structure
+    ("# Title\n\nOne paragraph.", ["# Title\n\nOne paragraph."]),
+    ("No headings at all.", ["No headings at all."]),
+])
+def test_sections_split_at_the_shallowest_repeated_heading(content, sections):
+    assert split_sections(content) == sections
+    assert "".join(split_sections(content)) == content
+
+
+# Function to count the section requests reaching the model (rather than the response cache)
+@pytest.fixture
+def model_calls(monkeypatch):
+    calls = []
+    generate = translate.generate_gemini_response
+
+    def counting_generate(context, prompt):
+        response = generate(context, prompt)
+        if not response["cached"]:
+            calls.append(prompt)
+        return response
+
+    monkeypatch.setattr(translate, "generate_gemini_response", counting_generate)
+    return calls
+
+
+def test_canonical_language_is_not_translated(model_calls):
+    assert translate_document(DOCUMENT, CANONICAL_LANGUAGE) == DOCUMENT
+    assert model_calls == []
+
+
+def test_translations_are_cached_per_language(model_calls):
+    content = DOCUMENT.replace("Acme", "Initech")
+    french = translate_document(content, "French")
+    assert len(model_calls) == len(split_sections(content))
+
+    assert translate_document(content, "French") == french
+    assert len(model_calls) == len(split_sections(content))
+    # Another language is a separate translation
+    translate_document(content, "German")
+    assert len(model_calls) == 2 * len(split_sections(content))
+
+
+def test_new_version_only_translates_changed_sections(model_calls):
+    content = DOCUMENT.replace("Acme", "Globex")
+    translate_document(content, "Spanish")
+    del model_calls[:]
+
+    edited = content.replace("several bank accounts", "a dozen bank accounts")
+    translate_document(edited, "Spanish")
+    assert len(model_calls) == 1 and "a dozen bank accounts" in model_calls[0]